@@ -0,0 +1,188 @@
+"""
+Registry queries affected by a git diff.
+
+Maps files changed since a git ref to registry entries and expands them to
+their downstream dependents, so a smoke run can cover only what a change
+can break:
+
+- a query file or smoke test maps to its registry entry;
+- a lending template or chain config maps to every query rendered from it;
+- a registry file maps to the entries whose JSON differs from the ref.
+
+Dependents are found on the same graph the DAG scheduler uses (declared
+``dependencies`` plus references found in the SQL).
+"""
+
+import json
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Any
+
+from scripts.registry import REPO_ROOT, Registry
+from scripts.sql_references import effective_dependencies
+
+# Files under the watched directories that cannot change a query result.
+_IGNORED = ("queries/table_sizes.json",)
+
+
+@dataclass
+class AffectedSet:
+    """Queries touched by a diff and everything downstream of them."""
+
+    base: str
+    changed_files: list[str]
+    direct: dict[str, list[str]] = field(default_factory=dict)
+    downstream: set[str] = field(default_factory=set)
+    unmatched: list[str] = field(default_factory=list)
+
+    @property
+    def names(self) -> set[str]:
+        return set(self.direct) | self.downstream
+
+
+def _git(*args: str) -> str:
+    try:
+        out = subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise ValueError(f"git {' '.join(args)} failed: {e}") from e
+    if out.returncode != 0:
+        raise ValueError(f"git {' '.join(args)} failed: {out.stderr.strip()}")
+    return out.stdout
+
+
+def changed_files(ref: str) -> tuple[str, list[str]]:
+    """
+    Files changed between the merge base of ``ref`` and the working tree.
+
+    Committed, staged, unstaged and untracked changes all count, so a
+    branch can be checked before committing.
+
+    Returns:
+        Tuple of (merge-base commit, sorted repo-relative paths).
+
+    Raises:
+        ValueError: If ``ref`` cannot be resolved or git is unavailable.
+    """
+    base = _git("merge-base", ref, "HEAD").strip()
+    files = set(_git("diff", "--name-only", base).splitlines())
+    files.update(_git("ls-files", "--others", "--exclude-standard").splitlines())
+    return base, sorted(f for f in files if f)
+
+
+def _registry_at(base: str, path: str) -> dict[str, dict[str, Any]]:
+    try:
+        text = _git("show", f"{base}:{path}")
+    except ValueError:
+        return {}
+    return {q["name"]: q for q in json.loads(text).get("queries", [])}
+
+
+def _template_outputs(registry: Registry) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    """Registry names rendered from each template and from each chain config."""
+    from scripts.chain_templates import CHAINS_DIR, available_chains, load_chain_config, output_path
+
+    by_file = {q["file"]: q["name"] for q in registry.queries}
+    by_template: dict[str, list[str]] = {}
+    by_config: dict[str, list[str]] = {}
+    for chain in available_chains():
+        config = load_chain_config(chain)
+        config_path = str((CHAINS_DIR / f"{chain}.json").relative_to(REPO_ROOT))
+        for template in config.get("templates", []):
+            name = by_file.get(str(output_path(config, template).relative_to(REPO_ROOT)))
+            if name:
+                by_template.setdefault(template, []).append(name)
+                by_config.setdefault(config_path, []).append(name)
+    return by_template, by_config
+
+
+def map_changes(files: list[str], registry: Registry, base: str | None = None) -> tuple[dict[str, list[str]], list[str]]:
+    """
+    Map changed paths to registry entries.
+
+    Args:
+        files: Repo-relative changed paths.
+        registry: Current registry.
+        base: Commit to diff registry files against (changed registry files
+            are ignored without it).
+
+    Returns:
+        Tuple of (query name -> changed paths that hit it, changed paths under
+        ``queries/`` or ``tests/`` that hit nothing).
+    """
+    by_path: dict[str, list[str]] = {}
+    for query in registry.queries:
+        for key in ("file", "smoke_test"):
+            if query.get(key):
+                by_path.setdefault(query[key], []).append(query["name"])
+    by_template, by_config = _template_outputs(registry)
+    registry_files = {q["_registry_file"] for q in registry.queries}
+
+    direct: dict[str, list[str]] = {}
+    unmatched = []
+    for path in files:
+        parts = PurePosixPath(path).parts
+        if not parts or parts[0] not in ("queries", "tests") or path in _IGNORED:
+            continue
+        names: list[str] = list(by_path.get(path, []))
+        if path in by_config:
+            names.extend(by_config[path])
+        elif len(parts) >= 3 and parts[1] == "templates" and path.endswith(".sql"):
+            names.extend(by_template.get(PurePosixPath(path).stem, []))
+        elif path in registry_files and base is not None:
+            before = _registry_at(base, path)
+            for query in registry.queries:
+                current = {k: v for k, v in query.items() if not k.startswith("_")}
+                if query["_registry_file"] == path and before.get(query["name"]) != current:
+                    names.append(query["name"])
+        if names:
+            for name in names:
+                direct.setdefault(name, []).append(path)
+        elif path not in registry_files:
+            unmatched.append(path)
+    return direct, unmatched
+
+
+def downstream_of(graph: dict[str, list[str]], names: set[str]) -> set[str]:
+    """Transitive dependents of ``names`` in a name -> upstreams graph (excluding ``names``)."""
+    dependents: dict[str, list[str]] = {}
+    for name, upstreams in graph.items():
+        for upstream in upstreams:
+            dependents.setdefault(upstream, []).append(name)
+    seen: set[str] = set()
+    stack = list(names)
+    while stack:
+        for dependent in dependents.get(stack.pop(), []):
+            if dependent not in seen:
+                seen.add(dependent)
+                stack.append(dependent)
+    return seen - names
+
+
+def affected_since(ref: str, registry: Registry) -> AffectedSet:
+    """
+    Queries a change since ``ref`` can affect.
+
+    Raises:
+        ValueError: If git cannot diff against ``ref``.
+    """
+    base, files = changed_files(ref)
+    direct, unmatched = map_changes(files, registry, base)
+    return AffectedSet(
+        base=base,
+        changed_files=files,
+        direct=direct,
+        downstream=downstream_of(effective_dependencies(registry), set(direct)),
+        unmatched=unmatched,
+    )
+
+
+def print_affected(affected: AffectedSet, ref: str) -> None:
+    """Summarize what a diff maps to."""
+    print(f"\nChanged since {ref} ({affected.base[:10]}): {len(affected.changed_files)} file(s)")
+    for name in sorted(affected.direct):
+        print(f"  [changed]    {name} <- {', '.join(affected.direct[name])}")
+    for name in sorted(affected.downstream):
+        print(f"  [downstream] {name}")
+    for path in affected.unmatched:
+        print(f"  [unmatched]  {path}")
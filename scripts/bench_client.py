@@ -0,0 +1,284 @@
+"""
+Offline benchmarks for the Dune client.
+
+Runs N executions against ``scripts.mock_dune`` at one or more concurrency
+levels and reports executions/s, HTTP requests/s, end-to-end latency
+percentiles and peak memory for each client mode:
+
+- ``threads``: ``dune_client.execute_sql`` on a thread pool.
+- ``async``: ``dune_async.AsyncDuneClient`` with ``max_in_flight`` set to the concurrency.
+- ``stream``: ``dune_client.stream_sql`` collected into a ``ColumnarResult``.
+
+The mock server runs in a child process by default, so its CPU and memory
+are not attributed to the client.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from scripts.dune_client import DuneSession, ExecutionResult, PollStrategy, RetryPolicy, execute_sql, stream_sql
+from scripts.mock_dune import MockConfig, MockDuneServer, add_config_arguments, config_from_args
+
+MODES = ("threads", "async", "stream")
+
+BENCH_SQL = "SELECT * FROM bench"
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of ``values`` (``q`` in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class BenchResult:
+    """Measurements of one mode at one concurrency level."""
+
+    mode: str
+    concurrency: int
+    executions: int
+    succeeded: int
+    wall_seconds: float
+    http_requests: int
+    bytes_received: int
+    p50_ms: float | None
+    p90_ms: float | None
+    p99_ms: float | None
+    max_ms: float | None
+    peak_traced_mb: float | None
+    max_rss_mb: float
+
+    @property
+    def executions_per_second(self) -> float:
+        return self.executions / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.http_requests / self.wall_seconds if self.wall_seconds else 0.0
+
+
+def _run_threads(session: DuneSession, poll: PollStrategy, n: int, concurrency: int) -> list[ExecutionResult]:
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        futures = [pool.submit(execute_sql, BENCH_SQL, session=session, poll=poll) for _ in range(n)]
+        return [f.result() for f in futures]
+
+
+def _run_async(session: DuneSession, poll: PollStrategy, n: int, concurrency: int) -> list[ExecutionResult]:
+    from scripts.dune_async import AsyncDuneClient, ExecutionJob
+
+    async def _main() -> list[ExecutionResult]:
+        async with AsyncDuneClient(session, poll, max_in_flight=concurrency) as client:
+            results = await client.gather(ExecutionJob(str(i), sql=BENCH_SQL) for i in range(n))
+            return list(results.values())
+
+    return asyncio.run(_main())
+
+
+def _run_stream(
+    session: DuneSession, poll: PollStrategy, n: int, concurrency: int, page_size: int
+) -> list[ExecutionResult]:
+    def one() -> ExecutionResult:
+        return stream_sql(BENCH_SQL, session=session, poll=poll, page_size=page_size).collect_columnar()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        futures = [pool.submit(one) for _ in range(n)]
+        return [f.result() for f in futures]
+
+
+def run_benchmark(
+    server: MockDuneServer,
+    mode: str,
+    executions: int,
+    concurrency: int,
+    poll: PollStrategy | None = None,
+    page_size: int = 10_000,
+    trace_memory: bool = False,
+) -> BenchResult:
+    """
+    Execute ``executions`` queries against a running mock server.
+
+    Latency is submit to last result byte per execution; request counts
+    come from the server.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+    poll = poll or PollStrategy(initial_interval=0.01, max_interval=0.25)
+    session = DuneSession(
+        api_key="mock",
+        base_url=server.base_url,
+        pool_size=max(concurrency, 1),
+        retry=RetryPolicy(backoff_seconds=0.01),
+    )
+    before = server.stats()["total_requests"]
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if mode == "threads":
+            results = _run_threads(session, poll, executions, concurrency)
+        elif mode == "async":
+            results = _run_async(session, poll, executions, concurrency)
+        else:
+            results = _run_stream(session, poll, executions, concurrency, page_size)
+        wall = time.perf_counter() - start
+    finally:
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+        session.close()
+    requests = server.stats()["total_requests"] - before - 1
+
+    # Stream results report submit-to-completion; timing.total_ms adds the page downloads.
+    latencies = [
+        float(r.timing.total_ms if r.timing is not None and r.timing.total_ms is not None else r.execution_time_ms)
+        for r in results
+        if r.success and r.execution_time_ms is not None
+    ]
+    return BenchResult(
+        mode=mode,
+        concurrency=concurrency,
+        executions=executions,
+        succeeded=sum(1 for r in results if r.success),
+        wall_seconds=wall,
+        http_requests=requests,
+        bytes_received=sum(r.timing.bytes_received for r in results if r.timing is not None),
+        p50_ms=percentile(latencies, 50),
+        p90_ms=percentile(latencies, 90),
+        p99_ms=percentile(latencies, 99),
+        max_ms=max(latencies) if latencies else None,
+        peak_traced_mb=peak / 2**20 if peak is not None else None,
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10),
+    )
+
+
+def print_benchmarks(results: list[BenchResult]) -> None:
+    """Print one row per mode and concurrency level."""
+
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value:,.0f}"
+
+    headers = ["Mode", "Conc", "OK", "Exec/s", "Req/s", "p50 ms", "p90 ms", "p99 ms", "Max ms", "MB recv", "Peak MB", "RSS MB"]
+    widths = [8, 5, 9, 8, 8, 8, 8, 8, 8, 8, 8, 8]
+    header_row = " | ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(header_row)
+    print("-" * len(header_row))
+    for r in results:
+        values = [
+            r.mode,
+            str(r.concurrency),
+            f"{r.succeeded}/{r.executions}",
+            f"{r.executions_per_second:,.1f}",
+            f"{r.requests_per_second:,.0f}",
+            ms(r.p50_ms),
+            ms(r.p90_ms),
+            ms(r.p99_ms),
+            ms(r.max_ms),
+            f"{r.bytes_received / 2**20:,.1f}",
+            "-" if r.peak_traced_mb is None else f"{r.peak_traced_mb:,.1f}",
+            f"{r.max_rss_mb:,.0f}",
+        ]
+        print(" | ".join(v.ljust(w) for v, w in zip(values, widths)))
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Dune client against a local mock API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.bench_client --executions 200 --concurrency 1,8,32
+  python -m scripts.bench_client --mode async --executions 2000 --concurrency 200 --queue 1 --execution 2
+  python -m scripts.bench_client --mode stream --executions 20 --rows 200000 --row-width 64 --memory
+  python -m scripts.bench_client --failure-rate 0.05 --http-error-rate 0.02 --json bench.json
+        """,
+    )
+    parser.add_argument(
+        "--mode",
+        action="append",
+        choices=MODES,
+        help="Client mode to benchmark (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--executions",
+        "-n",
+        type=int,
+        default=100,
+        help="Executions per benchmark (default: 100)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default="1,8,32",
+        help="Comma-separated concurrency levels (default: 1,8,32)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=10_000,
+        help="Rows per page in stream mode (default: 10000)",
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Track peak Python allocations with tracemalloc (slows the client down)",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run the mock server on a thread of this process instead of a child process",
+    )
+    parser.add_argument(
+        "--json",
+        metavar="FILE",
+        help="Also write the results as JSON",
+    )
+    add_config_arguments(parser)
+
+    args = parser.parse_args()
+    try:
+        levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    except ValueError:
+        print(f"Error: invalid --concurrency '{args.concurrency}'")
+        return 1
+    config: MockConfig = config_from_args(args)
+    modes = args.mode or list(MODES)
+
+    results = []
+    with MockDuneServer(config, process=not args.in_process) as server:
+        print(f"Mock API at {server.base_url}: {config}\n")
+        for mode in modes:
+            for level in levels:
+                result = run_benchmark(
+                    server, mode, args.executions, level, page_size=args.page_size, trace_memory=args.memory
+                )
+                print(f"  {mode} x{level}: {result.executions_per_second:,.1f} exec/s", flush=True)
+                results.append(result)
+
+    print()
+    print_benchmarks(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"config": asdict(config), "results": [asdict(r) for r in results]},
+                f,
+                indent=2,
+            )
+    return 0 if all(r.succeeded == r.executions for r in results) or config.failure_rate > 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
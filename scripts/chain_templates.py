@@ -0,0 +1,329 @@
+"""
+Chain-variant rendering for the lending query stack.
+
+The ethereum and base lending queries are rendered from one template per
+query under ``queries/templates/lending/`` plus a per-chain config under
+``queries/chains/<chain>.json`` (schemas, ``blockchain`` filter value,
+placeholder prefix, start date and window constants). Templates reference
+config constants as ``${name}``; any other ``$`` (e.g. JSON paths) is left
+alone, as are Dune ``{{parameters}}``.
+
+Rendered SQL is cached by a hash of template text + constants, in memory
+and under ``.cache/rendered/``, so re-rendering every variant is cheap. The
+disk cache is capped in size and evicts least recently used files.
+Upstream ``query_<NAME_ID>`` placeholders are resolved to Dune IDs where the
+registry has them, matching the committed query files.
+
+Adding a chain means adding ``queries/chains/<chain>.json`` and rendering.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import Any
+
+from scripts.registry import REPO_ROOT, get_registry
+from scripts.sql_references import placeholder_table
+
+TEMPLATES_DIR = REPO_ROOT / "queries" / "templates"
+CHAINS_DIR = REPO_ROOT / "queries" / "chains"
+DEFAULT_RENDER_CACHE_DIR = REPO_ROOT / ".cache" / "rendered"
+
+TEMPLATE_FAMILY = "lending"
+
+_VARIABLE = re.compile(r"\$\{(\w+)\}")
+
+
+def available_chains() -> list[str]:
+    """Chains with a config under ``queries/chains/``."""
+    return sorted(path.stem for path in CHAINS_DIR.glob("*.json"))
+
+
+def load_chain_config(chain: str) -> dict[str, Any]:
+    """
+    Load one chain's render config.
+
+    Raises:
+        FileNotFoundError: If the chain has no config file.
+    """
+    path = CHAINS_DIR / f"{chain}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Chain config not found: {path}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_template(name: str) -> str:
+    """Read a template by query name (e.g. ``lending_loop_detection``)."""
+    path = TEMPLATES_DIR / TEMPLATE_FAMILY / f"{name}.sql"
+    if not path.exists():
+        raise FileNotFoundError(f"Template not found: {path}")
+    with open(path) as f:
+        return f.read()
+
+
+def render_template(template: str, constants: dict[str, Any]) -> str:
+    """
+    Substitute ``${name}`` variables.
+
+    Raises:
+        KeyError: If the template uses a variable missing from ``constants``.
+    """
+
+    def replace(match: re.Match) -> str:
+        key = match.group(1)
+        if key not in constants:
+            raise KeyError(f"Template variable '{key}' is not set in the chain config")
+        return str(constants[key])
+
+    return _VARIABLE.sub(replace, template)
+
+
+def render_key(template: str, constants: dict[str, Any]) -> str:
+    """Cache key for a template rendered with a set of constants."""
+    material = json.dumps({"template": template, "constants": constants}, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TemplateRenderer:
+    """
+    Renders templates with an in-memory and on-disk cache.
+
+    Args:
+        cache_dir: Directory for rendered SQL (None disables the disk cache).
+        max_bytes: Size cap of the disk cache; least recently used files are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | str | None = DEFAULT_RENDER_CACHE_DIR,
+        max_bytes: int = 64 * 1024**2,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_bytes = max_bytes
+        self._memory: dict[str, str] = {}
+        self._templates: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _template(self, name: str) -> str:
+        with self._lock:
+            if name not in self._templates:
+                self._templates[name] = load_template(name)
+            return self._templates[name]
+
+    def render(self, name: str, constants: dict[str, Any]) -> str:
+        """Render template ``name`` with ``constants``, reusing cached output."""
+        template = self._template(name)
+        key = render_key(template, constants)
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self.hits += 1
+        if cached is not None:
+            return cached
+
+        path = self.cache_dir / f"{key}.sql" if self.cache_dir else None
+        sql = None
+        if path is not None:
+            # evict() may remove the file at any point; a vanished file is a miss.
+            try:
+                with open(path) as f:
+                    sql = f.read()
+                # Touch mtime so eviction sees this file as recently used.
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        if sql is not None:
+            with self._lock:
+                self.hits += 1
+        else:
+            sql = render_template(template, constants)
+            with self._lock:
+                self.misses += 1
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp, "w") as f:
+                    f.write(sql)
+                os.replace(tmp, path)
+                self.evict()
+
+        with self._lock:
+            self._memory[key] = sql
+        return sql
+
+    def evict(self) -> int:
+        """Remove least recently used rendered files until under ``max_bytes``."""
+        if self.cache_dir is None:
+            return 0
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.cache_dir.glob("*.sql"):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            return removed
+
+    def render_chain(
+        self,
+        config: dict[str, Any],
+        overrides: dict[str, Any] | None = None,
+        resolve_ids: bool = True,
+    ) -> dict[str, str]:
+        """
+        Render every template a chain config lists.
+
+        Args:
+            config: Chain config from ``load_chain_config``.
+            overrides: Constants replacing the config values (e.g. for a sweep).
+            resolve_ids: Replace ``query_<NAME_ID>`` placeholders with known Dune IDs.
+
+        Returns:
+            Template name -> rendered SQL.
+        """
+        constants = {**config.get("constants", {}), **(overrides or {})}
+        table = placeholder_table(get_registry()) if resolve_ids else None
+        rendered = {}
+        for name in config.get("templates", []):
+            sql = self.render(name, constants)
+            rendered[name] = table.resolve(sql) if table else sql
+        return rendered
+
+
+_default_renderer: TemplateRenderer | None = None
+
+
+def get_renderer() -> TemplateRenderer:
+    """Shared renderer for the process."""
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = TemplateRenderer()
+    return _default_renderer
+
+
+def output_path(config: dict[str, Any], name: str) -> Path:
+    """Where a chain's rendered query file lives."""
+    return REPO_ROOT / config["output_dir"] / f"{name}.sql"
+
+
+def check_chain(chain: str, renderer: TemplateRenderer | None = None) -> list[str]:
+    """
+    Compare rendered SQL with the committed query files.
+
+    Returns:
+        Repo-relative paths of files that are missing or differ.
+    """
+    config = load_chain_config(chain)
+    stale = []
+    for name, sql in (renderer or get_renderer()).render_chain(config).items():
+        path = output_path(config, name)
+        if not path.exists() or path.read_text() != sql:
+            stale.append(str(path.relative_to(REPO_ROOT)))
+    return stale
+
+
+def write_chain(chain: str, renderer: TemplateRenderer | None = None) -> list[str]:
+    """
+    Write a chain's rendered queries to its ``output_dir``.
+
+    Returns:
+        Repo-relative paths of files that changed.
+    """
+    config = load_chain_config(chain)
+    written = []
+    for name, sql in (renderer or get_renderer()).render_chain(config).items():
+        path = output_path(config, name)
+        if path.exists() and path.read_text() == sql:
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(sql)
+        written.append(str(path.relative_to(REPO_ROOT)))
+    return written
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Render chain variants of the lending queries from templates",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.chain_templates --check
+  python -m scripts.chain_templates --chain base
+  python -m scripts.chain_templates --chain ethereum --print lending_loop_detection
+        """,
+    )
+    parser.add_argument(
+        "--chain",
+        action="append",
+        help="Chain to render (repeatable, default: every config in queries/chains)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report query files that differ from their rendered template",
+    )
+    parser.add_argument(
+        "--print",
+        dest="print_name",
+        metavar="NAME",
+        help="Print one rendered query instead of writing files",
+    )
+
+    args = parser.parse_args()
+    chains = args.chain or available_chains()
+    renderer = get_renderer()
+
+    try:
+        if args.print_name:
+            for chain in chains:
+                rendered = renderer.render_chain(load_chain_config(chain))
+                if args.print_name not in rendered:
+                    print(f"Error: '{args.print_name}' is not rendered for {chain}")
+                    return 1
+                print(rendered[args.print_name])
+            return 0
+
+        if args.check:
+            stale = [path for chain in chains for path in check_chain(chain, renderer)]
+            if stale:
+                print(f"[X] {len(stale)} file(s) out of date with their templates:")
+                for path in stale:
+                    print(f"  - {path}")
+                return 1
+            print(f"[+] All rendered queries up to date ({', '.join(chains)})")
+            return 0
+
+        for chain in chains:
+            written = write_chain(chain, renderer)
+            print(f"{chain}: {len(written)} file(s) updated")
+            for path in written:
+                print(f"  {path}")
+    except (FileNotFoundError, KeyError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
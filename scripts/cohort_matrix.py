@@ -0,0 +1,509 @@
+"""
+Dense score band x cohort matrices for ``bitcoin_human_factor_cohort_matrix``.
+
+The query returns one row per non-empty (day, score_band, cohort) cell, so
+consumers have to zero-fill the 10 x 8 grid of every day themselves.
+``CohortMatrix`` does this once on the client. It keeps each additive
+measure as a zero-filled ``days x 10 x 8`` NumPy array:
+
+- ``tx_count``
+- ``btc_volume``
+- ``total_fee_btc``
+- ``score_sum``
+- ``tx_with_address_reuse``
+- ``tx_with_output_mismatch``
+
+The query's averages and percentages are derived from these arrays on
+demand.
+
+Rows are placed with the precomputed ``BAND_INDEX``/``COHORT_INDEX`` maps (or
+the ``*_order`` columns), one vectorized scatter per batch. A result can be
+added whole or streamed page by page. Days can be appended or replaced
+incrementally as the query refreshes, and the matrix round-trips through a
+compressed ``.npz`` payload (``save``/``load``, ``to_bytes``/``from_bytes``).
+"""
+
+import argparse
+import datetime
+import io
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from scripts.columnar import ColumnarTable, as_columnar
+from scripts.dune_client import ExecutionResult
+from scripts.registry import REPO_ROOT, get_registry
+from scripts.tx_features import COHORTS, SCORE_BANDS
+
+QUERY_NAME = "bitcoin_human_factor_cohort_matrix"
+DEFAULT_MATRIX_PATH = REPO_ROOT / ".cache" / "cohort_matrix.npz"
+
+BAND_INDEX = {band: i for i, band in enumerate(SCORE_BANDS)}
+COHORT_INDEX = {cohort: i for i, cohort in enumerate(COHORTS)}
+
+# Additive measures: result column -> stored array. score_sum is rebuilt
+# from avg_score * tx_count.
+COUNT_METRICS = ("tx_count", "score_sum", "tx_with_address_reuse", "tx_with_output_mismatch")
+SUM_METRICS = ("btc_volume", "total_fee_btc")
+METRICS = COUNT_METRICS + SUM_METRICS
+
+# Columns of the query result, in its order.
+RESULT_COLUMNS = [
+    "day",
+    "score_band",
+    "score_band_order",
+    "cohort",
+    "cohort_order",
+    "tx_count",
+    "btc_volume",
+    "avg_score",
+    "avg_fee_btc",
+    "total_fee_btc",
+    "tx_with_address_reuse",
+    "tx_with_output_mismatch",
+    "pct_address_reuse",
+]
+
+_FORMAT_VERSION = 1
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+Rows = ExecutionResult | ColumnarTable | pd.DataFrame | list[dict[str, Any]]
+
+
+def _as_columns(rows: Rows) -> dict[str, np.ndarray]:
+    """Column arrays of a result, columnar table, DataFrame or row dicts (numeric nulls as 0)."""
+    if isinstance(rows, pd.DataFrame):
+        return {c: rows[c].to_numpy() for c in rows.columns}
+    if isinstance(rows, ExecutionResult):
+        rows = as_columnar(rows)
+    elif isinstance(rows, list):
+        rows = ColumnarTable.from_rows(rows)
+    columns = {}
+    for name in rows.columns:
+        values, nulls = rows.data[name], rows.nulls[name]
+        if values.dtype.kind == "f" and nulls.any():
+            values = np.where(nulls, 0.0, values)
+        columns[name] = values
+    return columns
+
+
+def day_numbers(values: np.ndarray) -> np.ndarray:
+    """Days since 1970-01-01 of dates, datetimes or Dune date/timestamp strings."""
+    values = np.asarray(values)
+    if values.dtype.kind != "M":
+        # '2026-01-02 00:00:00.000 UTC' and datetime.date both start with the ISO date.
+        values = values.astype("U10")
+    return (values.astype("datetime64[D]") - _EPOCH).astype(np.int64)
+
+
+def _axis_index(columns: dict[str, np.ndarray], order: str, label: str, index: dict[str, int]) -> np.ndarray:
+    """0-based band or cohort positions, from the ``*_order`` column when present."""
+    if order in columns:
+        positions = np.asarray(columns[order], dtype=np.int64) - 1
+    elif label in columns:
+        positions = pd.Index(list(index)).get_indexer(np.asarray(columns[label], dtype=object))
+    else:
+        raise ValueError(f"Rows need a {order} or {label} column")
+    bad = (positions < 0) | (positions >= len(index))
+    if bad.any():
+        source = columns[order] if order in columns else columns[label]
+        raise ValueError(f"Unknown {label} values: {sorted(set(map(str, np.asarray(source)[bad])))[:5]}")
+    return positions
+
+
+class CohortMatrix:
+    """
+    Zero-filled ``days x 10 x 8`` arrays of the cohort matrix measures.
+
+    Days form a contiguous calendar range, so days without transactions are
+    zero slices too. Storage grows geometrically along the day axis, so
+    appending day after day is amortized O(1) per cell.
+
+    Attributes:
+        start: First day, or ``None`` while empty.
+    """
+
+    bands = SCORE_BANDS
+    cohorts = COHORTS
+
+    def __init__(self) -> None:
+        self.start: datetime.date | None = None
+        self._start = 0
+        self._length = 0
+        self._data = {m: self._empty(m, 0) for m in METRICS}
+
+    @staticmethod
+    def _empty(metric: str, days: int) -> np.ndarray:
+        dtype = np.int64 if metric in COUNT_METRICS else np.float64
+        return np.zeros((days, len(SCORE_BANDS), len(COHORTS)), dtype=dtype)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        """The ``days x bands x cohorts`` array of one measure (a view; do not resize)."""
+        if metric not in METRICS:
+            raise KeyError(f"Unknown metric '{metric}', expected one of: {', '.join(METRICS)}")
+        return self._data[metric][: self._length]
+
+    @property
+    def end(self) -> datetime.date | None:
+        """Last day, or ``None`` while empty."""
+        if not self._length:
+            return None
+        return self.start + datetime.timedelta(days=self._length - 1)
+
+    @property
+    def days(self) -> np.ndarray:
+        """``datetime64[D]`` labels of the day axis."""
+        return _EPOCH + np.arange(self._start, self._start + self._length)
+
+    def day_index(self, day: datetime.date | str) -> int:
+        """Position of ``day`` on the day axis."""
+        position = int(day_numbers(np.array([str(day)]))[0]) - self._start
+        if not self._length or not 0 <= position < self._length:
+            raise KeyError(f"{day} is outside {self.start} .. {self.end}")
+        return position
+
+    def _cover(self, first: int, last: int) -> None:
+        """Extend the day axis to include days ``first`` .. ``last``."""
+        if not self._length:
+            self._start = first
+        lead = max(self._start - first, 0)
+        needed = max(self._start + self._length, last + 1) - (self._start - lead)
+        capacity = len(self._data[METRICS[0]])
+        if lead or needed > capacity:
+            capacity = max(needed, 2 * capacity) if not lead else needed
+            for metric, array in self._data.items():
+                grown = self._empty(metric, capacity)
+                grown[lead : lead + self._length] = array[: self._length]
+                self._data[metric] = grown
+        self._start -= lead
+        self._length = needed
+        self.start = (_EPOCH + self._start).item()
+
+    def add(self, rows: Rows) -> int:
+        """
+        Add result rows into their cells, growing the day axis as needed.
+
+        Cells are summed, so consecutive pages of one result can be added in
+        any order. Use ``replace`` to refresh days that are already present.
+
+        Returns:
+            Number of rows added.
+
+        Raises:
+            ValueError: If a band or cohort is unknown or columns are missing.
+        """
+        return self._add_columns(_as_columns(rows))
+
+    def _add_columns(self, columns: dict[str, np.ndarray]) -> int:
+        if not columns or not len(next(iter(columns.values()))):
+            return 0
+        missing = [c for c in ("day", "tx_count") if c not in columns]
+        if missing:
+            raise ValueError(f"Rows are missing columns: {missing}")
+        days = day_numbers(columns["day"])
+        band = _axis_index(columns, "score_band_order", "score_band", BAND_INDEX)
+        cohort = _axis_index(columns, "cohort_order", "cohort", COHORT_INDEX)
+        first, last = int(days.min()), int(days.max())
+        self._cover(first, last)
+
+        tx_count = np.asarray(columns["tx_count"], dtype=np.float64)
+        values = {
+            "tx_count": tx_count,
+            "score_sum": np.asarray(columns.get("avg_score", np.zeros(len(days))), dtype=np.float64) * tx_count,
+        }
+        for metric in ("tx_with_address_reuse", "tx_with_output_mismatch", *SUM_METRICS):
+            if metric in columns:
+                values[metric] = np.nan_to_num(np.asarray(columns[metric], dtype=np.float64))
+
+        # One bincount per measure over just the days this batch touches.
+        cells = len(SCORE_BANDS) * len(COHORTS)
+        flat = ((days - first) * len(SCORE_BANDS) + band) * len(COHORTS) + cohort
+        span = slice(first - self._start, last - self._start + 1)
+        for metric, weights in values.items():
+            sums = np.bincount(flat, weights=weights, minlength=(last - first + 1) * cells)
+            target = self._data[metric][span]
+            if metric in COUNT_METRICS:
+                sums = np.rint(sums).astype(np.int64)
+            target += sums.reshape(target.shape)
+        return len(days)
+
+    def replace(self, rows: Rows) -> int:
+        """
+        Overwrite the days present in ``rows`` with their cells.
+
+        Meant for incremental refreshes. Pass every row of a refreshed day in
+        one call; days absent from ``rows`` are kept.
+
+        Returns:
+            Number of rows added.
+        """
+        columns = _as_columns(rows)
+        if "day" in columns and len(columns["day"]) and self._length:
+            present = np.unique(day_numbers(columns["day"])) - self._start
+            present = present[(present >= 0) & (present < self._length)]
+            for array in self._data.values():
+                array[present] = 0
+        return self._add_columns(columns)
+
+    def update(self, other: "CohortMatrix") -> None:
+        """Overwrite the days ``other`` covers with its cells, growing as needed."""
+        if not len(other):
+            return
+        self._cover(other._start, other._start + other._length - 1)
+        offset = other._start - self._start
+        for metric, array in self._data.items():
+            array[offset : offset + other._length] = other[metric]
+
+    @classmethod
+    def from_result(cls, rows: Rows) -> "CohortMatrix":
+        """Build a matrix from one whole result."""
+        matrix = cls()
+        matrix.add(rows)
+        return matrix
+
+    @classmethod
+    def from_stream(cls, batches: Iterable[list[dict[str, Any]]]) -> "CohortMatrix":
+        """Build a matrix from result pages (e.g. a ``ResultStream``), one page in memory at a time."""
+        matrix = cls()
+        for batch in batches:
+            matrix.add(batch)
+        return matrix
+
+    def _ratio(self, numerator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+        count = self["tx_count"]
+        out = np.full(count.shape, np.nan)
+        np.divide(numerator * scale, count, out=out, where=count > 0)
+        return out
+
+    def avg_score(self) -> np.ndarray:
+        """``avg_score`` per cell (NaN where there are no transactions)."""
+        return self._ratio(self["score_sum"])
+
+    def avg_fee_btc(self) -> np.ndarray:
+        """``avg_fee_btc`` per cell (NaN where there are no transactions)."""
+        return self._ratio(self["total_fee_btc"])
+
+    def pct_address_reuse(self) -> np.ndarray:
+        """``pct_address_reuse`` per cell, rounded to 2 decimals (NaN where there are no transactions)."""
+        return np.round(self._ratio(self["tx_with_address_reuse"], 100.0), 2)
+
+    def window(self, start: datetime.date | str | None = None, end: datetime.date | str | None = None) -> "CohortMatrix":
+        """Copy of the days between ``start`` and ``end`` (inclusive, clipped to the matrix)."""
+        lo = 0 if start is None else max(int(day_numbers(np.array([str(start)]))[0]) - self._start, 0)
+        hi = self._length if end is None else min(int(day_numbers(np.array([str(end)]))[0]) - self._start + 1, self._length)
+        window = type(self)()
+        if hi > lo:
+            window._start, window._length = self._start + lo, hi - lo
+            window._data = {m: a[lo:hi].copy() for m, a in self._data.items()}
+            window.start = (_EPOCH + window._start).item()
+        return window
+
+    def to_frame(self, include_empty: bool = True) -> pd.DataFrame:
+        """
+        Long rows in the query's column order, ordered by day, band and cohort.
+
+        With ``include_empty`` every cell is a row (the dashboard brief's
+        zero-fill); otherwise only non-empty cells, like the query itself.
+        """
+        shape = (self._length, len(SCORE_BANDS), len(COHORTS))
+        day, band, cohort = (a.ravel() for a in np.indices(shape))
+        keep = slice(None) if include_empty else self["tx_count"].ravel() > 0
+        frame = pd.DataFrame(
+            {
+                "day": self.days[day],
+                "score_band": np.asarray(SCORE_BANDS, dtype=object)[band],
+                "score_band_order": band + 1,
+                "cohort": np.asarray(COHORTS, dtype=object)[cohort],
+                "cohort_order": cohort + 1,
+                "tx_count": self["tx_count"].ravel(),
+                "btc_volume": self["btc_volume"].ravel(),
+                "avg_score": self.avg_score().ravel(),
+                "avg_fee_btc": self.avg_fee_btc().ravel(),
+                "total_fee_btc": self["total_fee_btc"].ravel(),
+                "tx_with_address_reuse": self["tx_with_address_reuse"].ravel(),
+                "tx_with_output_mismatch": self["tx_with_output_mismatch"].ravel(),
+                "pct_address_reuse": self.pct_address_reuse().ravel(),
+            },
+            columns=RESULT_COLUMNS,
+        )
+        return frame[keep].reset_index(drop=True)
+
+    def to_bytes(self) -> bytes:
+        """
+        Compressed ``.npz`` payload.
+
+        Counts are stored in the smallest unsigned integer type that holds
+        them, and all arrays are deflated, so mostly-empty grids cost little.
+        """
+        arrays: dict[str, np.ndarray] = {
+            "version": np.array(_FORMAT_VERSION),
+            "start": np.array(self._start, dtype=np.int64),
+            "bands": np.array(SCORE_BANDS),
+            "cohorts": np.array(COHORTS),
+        }
+        for metric in METRICS:
+            array = self[metric]
+            if metric in COUNT_METRICS and (not array.size or array.min() >= 0):
+                array = array.astype(np.min_scalar_type(int(array.max()) if array.size else 0))
+            arrays[metric] = array
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "CohortMatrix":
+        """
+        Rebuild a matrix from ``to_bytes`` output.
+
+        Raises:
+            ValueError: If the payload is from another format version or uses
+                different band/cohort labels.
+        """
+        with np.load(io.BytesIO(payload), allow_pickle=False) as arrays:
+            if int(arrays["version"]) != _FORMAT_VERSION:
+                raise ValueError(f"Unsupported cohort matrix format version {int(arrays['version'])}")
+            if list(arrays["bands"]) != SCORE_BANDS or list(arrays["cohorts"]) != COHORTS:
+                raise ValueError("Cohort matrix was built with different score bands or cohorts")
+            matrix = cls()
+            matrix._data = {m: arrays[m].astype(np.int64 if m in COUNT_METRICS else np.float64) for m in METRICS}
+            matrix._length = len(matrix._data["tx_count"])
+            matrix._start = int(arrays["start"])
+        if matrix._length:
+            matrix.start = (_EPOCH + matrix._start).item()
+        return matrix
+
+    def save(self, path: Path | str) -> int:
+        """Write ``to_bytes`` to ``path`` atomically; returns bytes written."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = self.to_bytes()
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_bytes(payload)
+        tmp.replace(path)
+        return len(payload)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "CohortMatrix":
+        """Read a matrix written by ``save``."""
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+def _print_matrix(matrix: CohortMatrix) -> None:
+    counts = matrix["tx_count"].sum(axis=0)
+    short = [c.split(" ")[0] for c in COHORTS]
+    print(f"\n{'band':>7} " + " ".join(f"{c:>10}" for c in short))
+    for label, row in zip(SCORE_BANDS, counts):
+        print(f"{label:>7} " + " ".join(f"{v:>10,}" for v in row))
+
+
+def main() -> int:
+    """CLI entry point."""
+    from scripts.result_export import DEFAULT_DATA_DIR, load
+
+    parser = argparse.ArgumentParser(
+        description="Build and inspect dense score band x cohort matrices",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.cohort_matrix update
+  python -m scripts.cohort_matrix update --from-export --output matrix.npz
+  python -m scripts.cohort_matrix show --start 2026-01-01 --end 2026-01-31
+
+update streams the latest bitcoin_human_factor_cohort_matrix result page by
+page (or reads its Parquet export) and replaces the days it covers in the
+matrix file, creating the file on first use.
+        """,
+    )
+    parser.add_argument(
+        "--matrix",
+        default=str(DEFAULT_MATRIX_PATH),
+        help="Matrix file (default: .cache/cohort_matrix.npz)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="Add the latest result's days to the matrix")
+    update_parser.add_argument(
+        "--from-export",
+        action="store_true",
+        help="Read the Parquet export instead of the Dune API",
+    )
+    update_parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Run the query instead of reading its latest result",
+    )
+    update_parser.add_argument(
+        "--max-age-hours",
+        type=int,
+        default=8,
+        help="Oldest acceptable cached result (default: 8)",
+    )
+    update_parser.add_argument("--output", help="Write to this file instead of --matrix")
+    update_parser.add_argument(
+        "--data-dir",
+        default=str(DEFAULT_DATA_DIR),
+        help="Export data directory for --from-export (default: .cache/data)",
+    )
+
+    show_parser = subparsers.add_parser("show", help="Summarize a matrix file")
+    show_parser.add_argument("--start", help="First day (YYYY-MM-DD)")
+    show_parser.add_argument("--end", help="Last day (YYYY-MM-DD)")
+
+    args = parser.parse_args()
+    path = Path(args.matrix)
+
+    if args.command == "show":
+        try:
+            matrix = CohortMatrix.load(path).window(args.start, args.end)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+        if not len(matrix):
+            print("Matrix is empty for that range")
+            return 0
+        occupied = int((matrix["tx_count"] > 0).sum())
+        print(f"{path}: {matrix.start} .. {matrix.end} ({len(matrix):,} days)")
+        print(f"  {int(matrix['tx_count'].sum()):,} transactions, {occupied:,}/{matrix['tx_count'].size:,} cells non-empty")
+        _print_matrix(matrix)
+        return 0
+
+    try:
+        matrix = CohortMatrix.load(path) if path.exists() else CohortMatrix()
+        before = len(matrix)
+        if args.from_export:
+            fresh = CohortMatrix()
+            rows = fresh.add(load(QUERY_NAME, data_dir=args.data_dir).to_pandas())
+        else:
+            from scripts.dune_client import stream_latest_result, stream_query
+
+            query_id = get_registry().id_map.get(QUERY_NAME)
+            if not query_id:
+                raise ValueError(f"Query '{QUERY_NAME}' has no dune_query_id")
+            if args.execute:
+                stream = stream_query(query_id)
+            else:
+                stream = stream_latest_result(query_id, max_age_hours=args.max_age_hours)
+            # Pages can split a day, so the result is gathered before replacing days.
+            fresh = CohortMatrix.from_stream(stream)
+            if not stream.success:
+                raise ValueError(stream.error or f"Execution ended in {stream.state}")
+            rows = stream.rows_fetched
+        matrix.update(fresh)
+        written = matrix.save(args.output or path)
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{rows:,} rows -> {args.output or path}: {matrix.start} .. {matrix.end} ({len(matrix):,} days, {len(matrix) - before:+,}), {written:,} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
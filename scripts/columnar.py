@@ -0,0 +1,264 @@
+"""
+Columnar backing store for query results.
+
+``ColumnarTable`` keeps one typed NumPy array per column plus a boolean null
+mask, instead of a dict per row. ``ColumnarResult`` is an ``ExecutionResult``
+backed by such a table that only builds row dicts when ``rows`` is accessed,
+so existing callers keep working while new code can operate on whole columns.
+"""
+
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+import numpy as np
+
+from scripts.dune_client import ExecutionResult, ExecutionTiming
+
+
+def _infer_array(values: list[Any]) -> tuple[np.ndarray | None, np.ndarray]:
+    """
+    Convert one chunk of a column to (typed values, null mask).
+
+    Returns ``None`` for the values when the chunk is entirely null, so the
+    dtype can be decided from the other chunks.
+    """
+    raw = np.empty(len(values), dtype=object)
+    raw[:] = values
+    mask = np.equal(raw, None)
+    present = raw[~mask]
+    if len(present) == 0:
+        return None, mask
+
+    types = set(map(type, present))
+    if types <= {bool}:
+        dtype: Any = bool
+    elif types <= {int}:
+        dtype = np.int64
+    elif types <= {int, float}:
+        dtype = np.float64
+    else:
+        return raw, mask
+
+    try:
+        typed = present.astype(dtype)
+    except OverflowError:
+        # Integers beyond int64 (e.g. raw uint256 amounts) stay as Python ints.
+        return raw, mask
+    if not mask.any():
+        return typed, mask
+    arr = np.full(len(values), _fill_value(np.dtype(dtype)), dtype=dtype)
+    arr[~mask] = typed
+    return arr, mask
+
+
+def _fill_value(dtype: np.dtype) -> Any:
+    if dtype == np.float64:
+        return np.nan
+    if dtype == object:
+        return None
+    return dtype.type(0)
+
+
+class _ColumnBuilder:
+    """Accumulates typed chunks for one column."""
+
+    def __init__(self) -> None:
+        self.chunks: list[tuple[np.ndarray | None, np.ndarray]] = []
+
+    def append(self, values: list[Any]) -> None:
+        self.chunks.append(_infer_array(values))
+
+    def finish(self) -> tuple[np.ndarray, np.ndarray]:
+        typed = [arr.dtype for arr, _ in self.chunks if arr is not None]
+        if not typed:
+            dtype = np.dtype(object)
+        elif any(dt == object for dt in typed):
+            dtype = np.dtype(object)
+        elif any(dt == bool for dt in typed) and not all(dt == bool for dt in typed):
+            dtype = np.dtype(object)
+        else:
+            dtype = np.result_type(*typed)
+
+        parts = []
+        for arr, mask in self.chunks:
+            if arr is None:
+                arr = np.full(len(mask), _fill_value(dtype), dtype=dtype)
+            parts.append(arr.astype(dtype, copy=False))
+        masks = [mask for _, mask in self.chunks]
+        if not parts:
+            return np.empty(0, dtype=dtype), np.empty(0, dtype=bool)
+        return np.concatenate(parts), np.concatenate(masks)
+
+
+class ColumnarTable:
+    """
+    Column-oriented result set.
+
+    Attributes:
+        columns: Column names in result order.
+        data: Column name -> values array (int64, float64, bool or object).
+        nulls: Column name -> boolean null mask (True where the value is null).
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        data: dict[str, np.ndarray],
+        nulls: dict[str, np.ndarray],
+    ):
+        self.columns = list(columns)
+        self.data = data
+        self.nulls = nulls
+
+    def __len__(self) -> int:
+        if not self.columns:
+            return 0
+        return len(self.data[self.columns[0]])
+
+    @classmethod
+    def from_batches(
+        cls,
+        batches: Iterable[list[dict[str, Any]]],
+        columns: list[str] | None = None,
+    ) -> "ColumnarTable":
+        """Build a table from row-dict batches, converting each batch as it arrives."""
+        builders: dict[str, _ColumnBuilder] = {}
+        order: list[str] = list(columns) if columns is not None else []
+        for batch in batches:
+            if not batch:
+                continue
+            if columns is None and not order:
+                order = list(batch[0].keys())
+            for col in order:
+                builders.setdefault(col, _ColumnBuilder()).append([row.get(col) for row in batch])
+
+        data: dict[str, np.ndarray] = {}
+        nulls: dict[str, np.ndarray] = {}
+        for col in order:
+            builder = builders.get(col)
+            if builder is None:
+                data[col], nulls[col] = np.empty(0, dtype=object), np.empty(0, dtype=bool)
+            else:
+                data[col], nulls[col] = builder.finish()
+        return cls(order, data, nulls)
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: list[dict[str, Any]],
+        columns: list[str] | None = None,
+    ) -> "ColumnarTable":
+        """Build a table from a list of row dicts."""
+        return cls.from_batches([rows], columns)
+
+    def column(self, name: str) -> np.ndarray:
+        """Values of one column (null slots hold NaN/0/None depending on dtype)."""
+        return self.data[name]
+
+    def iter_rows(self) -> Iterator[dict[str, Any]]:
+        """Yield row dicts with nulls restored as ``None``."""
+        cols = [
+            (name, self.data[name].tolist(), self.nulls[name].tolist())
+            for name in self.columns
+        ]
+        for i in range(len(self)):
+            yield {name: (None if mask[i] else values[i]) for name, values, mask in cols}
+
+    def to_rows(self) -> list[dict[str, Any]]:
+        """Materialize all rows as dicts."""
+        return list(self.iter_rows())
+
+    def to_pandas(self) -> Any:
+        """Convert to a pandas DataFrame (nullable dtypes where needed)."""
+        import pandas as pd
+
+        frame = {}
+        for name in self.columns:
+            values, mask = self.data[name], self.nulls[name]
+            if values.dtype == np.int64 and mask.any():
+                frame[name] = pd.arrays.IntegerArray(values, mask)
+            elif values.dtype == bool and mask.any():
+                frame[name] = pd.arrays.BooleanArray(values, mask)
+            else:
+                frame[name] = values
+        return pd.DataFrame(frame, columns=self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by value arrays and masks (object payloads excluded)."""
+        return sum(self.data[c].nbytes + self.nulls[c].nbytes for c in self.columns)
+
+
+class ColumnarResult(ExecutionResult):
+    """ExecutionResult backed by a ColumnarTable; ``rows`` is built on first access."""
+
+    def __init__(
+        self,
+        table: ColumnarTable,
+        success: bool = True,
+        execution_id: str | None = None,
+        state: str = "QUERY_STATE_COMPLETED",
+        error: str | None = None,
+        execution_time_ms: int | None = None,
+        cached: bool = False,
+        credits: float | None = None,
+        timing: ExecutionTiming | None = None,
+    ):
+        self.table = table
+        self._rows: list[dict[str, Any]] | None = None
+        super().__init__(
+            success=success,
+            execution_id=execution_id,
+            state=state,
+            rows=None,  # type: ignore[arg-type]
+            columns=table.columns,
+            row_count=len(table),
+            error=error,
+            execution_time_ms=execution_time_ms,
+            cached=cached,
+            credits=credits,
+            timing=timing,
+        )
+
+    @property  # type: ignore[override]
+    def rows(self) -> list[dict[str, Any]]:
+        if self._rows is None:
+            self._rows = self.table.to_rows()
+        return self._rows
+
+    @rows.setter
+    def rows(self, value: list[dict[str, Any]] | None) -> None:
+        # Set by the dataclass __init__; None keeps the lazy table-backed rows.
+        if value is not None:
+            self._rows = value
+
+    def __repr__(self) -> str:
+        return (
+            f"ColumnarResult(success={self.success!r}, execution_id={self.execution_id!r}, "
+            f"state={self.state!r}, columns={self.columns!r}, row_count={self.row_count!r}, "
+            f"error={self.error!r}, execution_time_ms={self.execution_time_ms!r})"
+        )
+
+
+def as_columnar(result: ExecutionResult) -> ColumnarTable:
+    """Return the columnar form of any ExecutionResult (no copy if already columnar)."""
+    if isinstance(result, ColumnarResult):
+        return result.table
+    return ColumnarTable.from_rows(result.rows, result.columns)
+
+
+def to_columnar_result(result: ExecutionResult) -> ColumnarResult:
+    """Convert a row-based ExecutionResult into a ColumnarResult."""
+    if isinstance(result, ColumnarResult):
+        return result
+    return ColumnarResult(
+        ColumnarTable.from_rows(result.rows, result.columns),
+        success=result.success,
+        execution_id=result.execution_id,
+        state=result.state,
+        error=result.error,
+        execution_time_ms=result.execution_time_ms,
+        cached=result.cached,
+        credits=result.credits,
+        timing=result.timing,
+    )
@@ -0,0 +1,511 @@
+"""
+Static scan-cost analysis for registered queries.
+
+Finds every source table a query reads (chain tables such as
+``bitcoin.inputs``, decoded ``*_evt_*`` tables and ``query_<id>`` results),
+checks whether each read is bounded by a filter on a partition column that
+the engine can prune on, and estimates the scanned volume from the
+table-size catalog in ``queries/table_sizes.json``.
+
+A filter prunes only if it gives the partition column a lower bound, the
+column is compared bare (``block_date >= ...``, not
+``CAST(date_trunc('day', block_time) AS DATE) >= ...``) and the bound is a
+constant expression. Conjuncts are split on top-level ``AND`` only; a
+conjunct with a top-level ``OR`` bounds the column only if every branch
+does. Bounds taken from another relation, such as
+``CROSS JOIN checkpoint c ... >= c.cutoff_day``, depend on dynamic filtering
+and are reported separately.
+"""
+
+import datetime
+import fnmatch
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from scripts.registry import REPO_ROOT
+
+DEFAULT_CATALOG_PATH = REPO_ROOT / "queries" / "table_sizes.json"
+
+# Partition filter status of one table read, best first.
+PRUNED = "pruned"
+DYNAMIC = "dynamic"
+WRAPPED = "wrapped"
+UNFILTERED = "unfiltered"
+UNPARTITIONED = "unpartitioned"
+UNKNOWN = "unknown"
+
+_STATUS_RANK = {PRUNED: 0, DYNAMIC: 1, WRAPPED: 2, UNFILTERED: 3}
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+_CTE_NAME = re.compile(r"(?:\bWITH\b|,)\s*([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+_NOT_ALIAS = (
+    "ON|WHERE|CROSS|LEFT|RIGHT|INNER|FULL|OUTER|JOIN|GROUP|ORDER|UNION|"
+    "LIMIT|USING|HAVING|WINDOW|EXCEPT|INTERSECT"
+)
+_SOURCE_REF = re.compile(
+    r"\b(?:FROM|JOIN)\s+(query_<[A-Z0-9_]+>|[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)"
+    rf"(?:\s+(?:AS\s+)?(?!(?:{_NOT_ALIAS})\b)([A-Za-z_]\w*))?",
+    re.IGNORECASE,
+)
+_QUERY_REF = re.compile(r"query_(?:\d+|<[A-Z0-9_]+>)")
+
+_CLAUSE_START = re.compile(r"\b(?:WHERE|ON)\b", re.IGNORECASE)
+_CLAUSE_END = re.compile(
+    r"\b(?:WHERE|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|EXCEPT|INTERSECT|WINDOW|"
+    r"(?:(?:LEFT|RIGHT|FULL)\s+(?:OUTER\s+)?|INNER\s+|CROSS\s+)?JOIN)\b",
+    re.IGNORECASE,
+)
+_SET_OPERATION = re.compile(r"\b(?:UNION|EXCEPT|INTERSECT)\b", re.IGNORECASE)
+_AND = re.compile(r"\bAND\b", re.IGNORECASE)
+_OR = re.compile(r"\bOR\b", re.IGNORECASE)
+_BETWEEN = re.compile(r"\bBETWEEN\b", re.IGNORECASE)
+_COMPARISON = re.compile(r">=|<=|<>|!=|=|>|<|\bBETWEEN\b|\bIN\b", re.IGNORECASE)
+
+_DYNAMIC_BOUND = re.compile(r"\bSELECT\b|\b[A-Za-z_]\w*\.[A-Za-z_]\w*", re.IGNORECASE)
+_INTERVAL = re.compile(r"INTERVAL\s+'(\d+)'\s+(MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)", re.IGNORECASE)
+_DATE_LITERAL = re.compile(r"\b(?:DATE|TIMESTAMP)\s+'(\d{4}-\d{2}-\d{2})", re.IGNORECASE)
+_NOW = re.compile(r"\b(?:CURRENT_DATE|CURRENT_TIMESTAMP|NOW\s*\()", re.IGNORECASE)
+
+_UNIT_DAYS = {"MINUTE": 1 / 1440, "HOUR": 1 / 24, "DAY": 1, "WEEK": 7, "MONTH": 30, "YEAR": 365}
+
+
+def mask_sql(sql: str) -> str:
+    """
+    Blank out string contents and comments, keeping every character offset.
+
+    Structural scans (parentheses, keywords) run on the masked text while the
+    original text is still available at the same positions.
+    """
+
+    def blank(match: re.Match) -> str:
+        text = match.group(0)
+        if text.startswith("'"):
+            return "'" + " " * (len(text) - 2) + "'"
+        return re.sub(r"[^\n]", " ", text)
+
+    return _LITERALS.sub(blank, sql)
+
+
+def _depths(masked: str) -> list[int]:
+    """Parenthesis depth at each character (an opening paren has the outer depth)."""
+    depths = []
+    depth = 0
+    for ch in masked:
+        if ch == ")":
+            depth -= 1
+        depths.append(depth)
+        if ch == "(":
+            depth += 1
+    return depths
+
+
+def _enclosing_block(masked: str, depths: list[int], pos: int) -> tuple[int, int]:
+    """Start/end offsets of the innermost parenthesized block containing ``pos``."""
+    target = depths[pos]
+    if target == 0:
+        return 0, len(masked)
+    start = pos
+    while start > 0 and not (masked[start - 1] == "(" and depths[start - 1] == target - 1):
+        start -= 1
+    end = pos
+    while end < len(masked) and not (masked[end] == ")" and depths[end] == target - 1):
+        end += 1
+    return start, end
+
+
+def _top_level_matches(pattern: re.Pattern, masked: str, depths: list[int], start: int, end: int, depth: int):
+    for match in pattern.finditer(masked, start, end):
+        if depths[match.start()] == depth:
+            yield match
+
+
+def _branch_bounds(masked: str, depths: list[int], start: int, end: int, pos: int) -> tuple[int, int]:
+    """Narrow a block to the UNION/EXCEPT/INTERSECT branch containing ``pos``."""
+    depth = depths[pos]
+    for match in _top_level_matches(_SET_OPERATION, masked, depths, start, end, depth):
+        if match.end() <= pos:
+            start = match.end()
+        else:
+            return start, match.start()
+    return start, end
+
+
+def _strip_parens(text: str) -> str:
+    text = text.strip()
+    while text.startswith("(") and text.endswith(")"):
+        text = text[1:-1].strip()
+    return text
+
+
+@dataclass
+class _Predicate:
+    text: str
+    masked: str
+    depths: list[int]
+
+
+def _split_top_level(pred: _Predicate, pattern: re.Pattern) -> list[_Predicate]:
+    """
+    Split a predicate on ``AND`` or ``OR`` outside any parentheses.
+
+    Parentheses wrapping the whole predicate are looked through first, so
+    ``(a OR b)`` splits into ``a`` and ``b``.
+    """
+    masked, depths = pred.masked, pred.depths
+    a, b = 0, len(masked)
+    while True:
+        while a < b and masked[a].isspace():
+            a += 1
+        while b > a and masked[b - 1].isspace():
+            b -= 1
+        wrapped = (
+            b - a >= 2
+            and masked[a] == "("
+            and masked[b - 1] == ")"
+            and all(d > depths[a] for d in depths[a + 1:b - 1])
+        )
+        if not wrapped:
+            break
+        a, b = a + 1, b - 1
+    if a >= b:
+        return []
+
+    base = depths[a]
+    pieces = []
+    last = a
+    in_between = False
+    for op in pattern.finditer(masked, a, b):
+        if depths[op.start()] != base:
+            continue
+        segment = masked[last:op.start()]
+        if _BETWEEN.search(segment) and not in_between and op.group(0).upper() == "AND":
+            # BETWEEN x AND y: this AND belongs to the predicate.
+            in_between = True
+            continue
+        in_between = False
+        pieces.append((last, op.start()))
+        last = op.end()
+    pieces.append((last, b))
+    return [
+        _Predicate(pred.text[i:j], masked[i:j], depths[i:j])
+        for i, j in pieces
+        if masked[i:j].strip()
+    ]
+
+
+def _predicates(masked: str, sql: str, depths: list[int], start: int, end: int) -> list[_Predicate]:
+    """Conjuncts (top-level ``AND`` operands) of every WHERE/ON clause directly inside a block."""
+    depth = depths[start] if start < len(depths) else 0
+    preds = []
+    for clause in _top_level_matches(_CLAUSE_START, masked, depths, start, end, depth):
+        clause_end = end
+        for stop in _top_level_matches(_CLAUSE_END, masked, depths, clause.end(), end, depth):
+            clause_end = stop.start()
+            break
+        a, b = clause.end(), clause_end
+        preds.extend(_split_top_level(_Predicate(sql[a:b], masked[a:b], depths[a:b]), _AND))
+    return preds
+
+
+@dataclass
+class SourceScan:
+    """One read of a source table within a query."""
+
+    table: str
+    alias: str | None
+    scope: str | None
+    status: str
+    estimated_gb: float | None
+    window_days: float | None = None
+    detail: str = ""
+
+
+@dataclass
+class QueryCost:
+    """Scan estimate for one query."""
+
+    name: str
+    file: str
+    sources: list[SourceScan] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def estimated_gb(self) -> float:
+        return sum(s.estimated_gb or 0.0 for s in self.sources)
+
+    @property
+    def issues(self) -> list[str]:
+        return [
+            f"{s.table}{f' ({s.scope})' if s.scope else ''}: {s.detail}"
+            for s in self.sources
+            if s.status in (DYNAMIC, WRAPPED, UNFILTERED, UNKNOWN)
+        ]
+
+
+def load_catalog(path: Path | str | None = None) -> dict[str, Any]:
+    """Load the table-size catalog (defaults to ``queries/table_sizes.json``)."""
+    with open(path or DEFAULT_CATALOG_PATH) as f:
+        return json.load(f)
+
+
+def _catalog_entry(catalog: dict[str, Any], table: str) -> dict[str, Any] | None:
+    tables = catalog.get("tables", {})
+    key = table.lower()
+    if key in tables:
+        return tables[key]
+    for pattern, entry in tables.items():
+        if fnmatch.fnmatchcase(key, pattern):
+            return entry
+    return None
+
+
+def _window_days(bound: str, catalog: dict[str, Any], today: datetime.date) -> float:
+    """How many days of history a constant lower bound admits."""
+    default = float(catalog.get("default_window_days", 30))
+    if "{{" in bound:
+        return default
+    date = _DATE_LITERAL.search(bound)
+    if date:
+        return max((today - datetime.date.fromisoformat(date.group(1))).days, 1)
+    interval = _INTERVAL.search(bound)
+    if interval and _NOW.search(bound):
+        return max(int(interval.group(1)) * _UNIT_DAYS[interval.group(2).upper()], 1)
+    if _NOW.search(bound):
+        return 1
+    return default
+
+
+def _analyze_predicate(
+    pred: _Predicate,
+    column: re.Pattern,
+) -> tuple[str, str, str, str] | None:
+    """
+    Classify one conjunct against a partition column.
+
+    Returns (status, column expression, bound text, operator) or None if the
+    conjunct does not put a lower bound on the column.
+    """
+    if not column.search(pred.masked):
+        return None
+    base = pred.depths[0] if pred.depths else 0
+    op = None
+    for match in _COMPARISON.finditer(pred.masked):
+        if pred.depths[match.start()] == base:
+            op = match
+            break
+    if op is None:
+        return None
+
+    lhs, rhs = pred.masked[:op.start()], pred.masked[op.end():]
+    op_text = op.group(0).upper()
+    if column.search(lhs):
+        col_side, col_text, bound = lhs, pred.text[:op.start()], pred.text[op.end():]
+        lower = op_text in (">=", ">", "=", "BETWEEN", "IN")
+    elif column.search(rhs):
+        col_side, col_text, bound = rhs, pred.text[op.end():], pred.text[:op.start()]
+        lower = op_text in ("<=", "<", "=")
+    else:
+        return None
+    if not lower:
+        return None
+
+    if op_text == "BETWEEN":
+        bound = _AND.split(bound, maxsplit=1)[0]
+    expr = " ".join(_strip_parens(col_text).split())
+    if not column.fullmatch(" ".join(_strip_parens(col_side).split())):
+        return WRAPPED, expr, bound.strip(), op_text
+    if _DYNAMIC_BOUND.search(mask_sql(bound)):
+        return DYNAMIC, expr, bound.strip(), op_text
+    return PRUNED, expr, bound.strip(), op_text
+
+
+def _bound(
+    pred: _Predicate,
+    column: re.Pattern,
+    catalog: dict[str, Any],
+    today: datetime.date,
+) -> tuple[str, str, str, float | None] | None:
+    """
+    Lower bound one conjunct puts on a partition column.
+
+    A conjunct with a top-level ``OR`` is bounded only if every branch is;
+    it then takes the weakest branch's status and the widest window.
+
+    Returns (status, column expression, bound text, window days) or None.
+    """
+    branches = _split_top_level(pred, _OR)
+    if len(branches) > 1:
+        found = []
+        for branch in branches:
+            bound = _best_bound(_split_top_level(branch, _AND), column, catalog, today)
+            if bound is None:
+                return None
+            found.append(bound)
+        worst = max(found, key=lambda f: _STATUS_RANK[f[0]])
+        windows = [f[3] for f in found]
+        window = None if None in windows else max(windows)
+        return worst[0], worst[1], worst[2], window
+
+    found = _analyze_predicate(pred, column)
+    if found is None:
+        return None
+    status, expr, bound, op_text = found
+    if status == PRUNED:
+        window = 1.0 if op_text in ("=", "IN") else _window_days(bound, catalog, today)
+    elif status == DYNAMIC:
+        window = float(catalog.get("incremental_window_days", 2))
+    else:
+        window = None
+    return status, expr, bound, window
+
+
+def _best_bound(
+    preds: list[_Predicate],
+    column: re.Pattern,
+    catalog: dict[str, Any],
+    today: datetime.date,
+) -> tuple[str, str, str, float | None] | None:
+    """
+    Strongest bound among conjuncts that all apply.
+
+    The window is the narrowest constant one; a dynamic bound's window is
+    used only when no conjunct prunes.
+    """
+    best = None
+    window = None
+    for pred in preds:
+        found = _bound(pred, column, catalog, today)
+        if found is None:
+            continue
+        status, _, _, days = found
+        if status == PRUNED:
+            window = days if window is None else min(window, days)
+        elif status == DYNAMIC and window is None:
+            window = days
+        if best is None or _STATUS_RANK[status] < _STATUS_RANK[best[0]]:
+            best = found
+    if best is None:
+        return None
+    return best[0], best[1], best[2], None if best[0] == WRAPPED else window
+
+
+def _scope_name(masked: str, block_start: int) -> str | None:
+    match = re.search(r"([A-Za-z_]\w*)\s+AS\s*\($", masked[:block_start], re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def analyze_sql(
+    sql: str,
+    catalog: dict[str, Any],
+    name: str = "",
+    file: str = "",
+    today: datetime.date | None = None,
+) -> QueryCost:
+    """Estimate the scan footprint of one SQL text."""
+    today = today or datetime.date.today()
+    masked = mask_sql(sql)
+    depths = _depths(masked)
+    ctes = {m.group(1).lower() for m in _CTE_NAME.finditer(masked)}
+    report = QueryCost(name=name, file=file)
+
+    for ref in _SOURCE_REF.finditer(masked):
+        table, alias = ref.group(1), ref.group(2)
+        lowered = table.lower()
+        if lowered in ctes or lowered in ("table", "unnest", "lateral"):
+            continue
+        if "." not in table and not _QUERY_REF.fullmatch(table):
+            continue
+
+        block_start, block_end = _enclosing_block(masked, depths, ref.start())
+        scope = _scope_name(masked, block_start) if block_start else None
+        block_start, block_end = _branch_bounds(masked, depths, block_start, block_end, ref.start())
+        entry = _catalog_entry(catalog, table)
+        if entry is None:
+            report.sources.append(SourceScan(
+                table, alias, scope, UNKNOWN, None, detail="not in table-size catalog",
+            ))
+            continue
+        if not entry.get("partition_columns"):
+            report.sources.append(SourceScan(
+                table, alias, scope, UNPARTITIONED, float(entry.get("total_gb", 0.0)),
+            ))
+            continue
+
+        qualifier = re.escape(alias or table.split(".")[-1])
+        cols = "|".join(re.escape(c) for c in entry["partition_columns"])
+        column = re.compile(rf"(?:\b{qualifier}\.|(?<![\w.]))(?:{cols})\b", re.IGNORECASE)
+
+        preds = _predicates(masked, sql, depths, block_start, block_end)
+        best = _best_bound(preds, column, catalog, today)
+
+        history = float(entry.get("history_days", 0))
+        per_day = float(entry.get("gb_per_day", 0.0))
+        if best is None:
+            status, detail = UNFILTERED, (
+                f"no lower bound on {'/'.join(entry['partition_columns'])}; full history scanned"
+            )
+            window = None
+        else:
+            status, expr, bound, window = best
+            if status == WRAPPED:
+                detail = f"partition column wrapped in an expression ({expr}); full history scanned"
+            elif status == DYNAMIC:
+                detail = f"bound {' '.join(bound.split())} comes from another relation; pruning relies on dynamic filtering"
+            else:
+                detail = ""
+        days = history if window is None else min(window, history)
+        report.sources.append(SourceScan(
+            table, alias, scope, status, round(per_day * days, 3), window, detail,
+        ))
+
+    return report
+
+
+def analyze_query(
+    query: dict[str, Any],
+    catalog: dict[str, Any],
+    today: datetime.date | None = None,
+) -> QueryCost:
+    """Estimate the scan footprint of a registered query."""
+    path = REPO_ROOT / query["file"]
+    try:
+        with open(path) as f:
+            sql = f.read()
+    except FileNotFoundError:
+        return QueryCost(query["name"], query["file"], error=f"Query file not found: {query['file']}")
+    return analyze_sql(sql, catalog, query["name"], query["file"], today)
+
+
+def print_cost_report(reports: list[QueryCost], verbose: bool = False) -> None:
+    """Print per-query scan estimates and partition-pruning issues."""
+    headers = ["Name", "Sources", "Est. GB", "Issues"]
+    widths = [45, 8, 10, 6]
+    header_row = " | ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(header_row)
+    print("-" * len(header_row))
+    for report in reports:
+        if report.error:
+            print(f"{report.name[:widths[0]].ljust(widths[0])} | {report.error}")
+            continue
+        row = [
+            report.name[:widths[0]],
+            str(len(report.sources)),
+            f"{report.estimated_gb:,.1f}",
+            str(len(report.issues)),
+        ]
+        print(" | ".join(val.ljust(w) for val, w in zip(row, widths)))
+        if verbose:
+            for s in report.sources:
+                size = "?" if s.estimated_gb is None else f"{s.estimated_gb:,.2f} GB"
+                where = f" in {s.scope}" if s.scope else ""
+                print(f"    {s.table}{where}: {s.status}, {size}")
+        for issue in report.issues:
+            print(f"    [!] {issue}")
+
+    total = sum(r.estimated_gb for r in reports)
+    print(f"\nEstimated total scan: {total:,.1f} GB across {len(reports)} queries")
@@ -0,0 +1,244 @@
+"""
+Asyncio Dune API client.
+
+Runs many executions concurrently on one event loop. Status polling waits
+with ``asyncio.sleep`` so an in-flight execution holds no thread while it is
+queued or running; only the HTTP round-trips themselves run on a small
+executor sized to the session's connection pool.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from scripts.dune_client import (
+    DEFAULT_POLL_STRATEGY,
+    TERMINAL_STATES,
+    DuneSession,
+    ExecutionResult,
+    ExecutionTiming,
+    PollStrategy,
+    _retry_after,
+    _rows_from_response,
+    _status_credits,
+    _status_error,
+    get_session,
+)
+
+
+@dataclass
+class ExecutionJob:
+    """One execution to submit through ``AsyncDuneClient.iter_completed``."""
+
+    key: str
+    sql: str | None = None
+    query_id: int | None = None
+    params: dict[str, Any] | None = None
+    timeout_seconds: int = 300
+
+
+class AsyncDuneClient:
+    """
+    Coroutine-based counterpart of the ``scripts.dune_client`` functions.
+
+    Args:
+        session: Underlying pooled session. Defaults to the shared one.
+        poll: Status polling strategy.
+        max_in_flight: Maximum executions submitted but not yet finished.
+    """
+
+    def __init__(
+        self,
+        session: DuneSession | None = None,
+        poll: PollStrategy | None = None,
+        max_in_flight: int = 200,
+    ):
+        self.session = session or get_session()
+        self.poll = poll or DEFAULT_POLL_STRATEGY
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.session.pool_size,
+            thread_name_prefix="dune-http",
+        )
+
+    async def __aenter__(self) -> "AsyncDuneClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the HTTP executor (the session stays open)."""
+        self._executor.shutdown(wait=False)
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        payload: dict[str, Any] | None = None,
+        timing: ExecutionTiming | None = None,
+    ) -> tuple[dict[str, Any], Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.session.request_with_headers, method, path, payload, timing
+        )
+
+    async def _run(
+        self,
+        submit_path: str,
+        payload: dict[str, Any],
+        timeout_seconds: int,
+    ) -> ExecutionResult:
+        timing = ExecutionTiming()
+        execution_id = None
+        try:
+            timing.begin()
+            exec_resp, _ = await self._request("POST", submit_path, payload, timing)
+            timing.submit_ms = timing.elapsed_ms()
+            execution_id = str(exec_resp.get("execution_id", "")) or None
+            if not execution_id:
+                return ExecutionResult(
+                    False, None, "FAILED", [], [], 0, f"Missing execution_id in response: {exec_resp}",
+                    timing.finish(), timing=timing,
+                )
+
+            state = "QUERY_STATE_PENDING"
+            last_status: dict[str, Any] = {}
+            while True:
+                status, headers = await self._request("GET", f"/execution/{execution_id}/status", None, timing)
+                timing.poll_count += 1
+                last_status = status
+                state = str(status.get("state") or status.get("query_state") or state)
+                if state in TERMINAL_STATES:
+                    break
+                remaining = timeout_seconds - (time.time() - timing.started_at)
+                if remaining <= 0:
+                    break
+                delay = self.poll.next_delay(timing.poll_count, status, _retry_after(headers))
+                await asyncio.sleep(min(delay, remaining))
+            timing.record_status(last_status)
+            timing.wait_ms = timing.elapsed_ms() - timing.submit_ms
+
+            if state != "QUERY_STATE_COMPLETED":
+                return ExecutionResult(
+                    success=False,
+                    execution_id=execution_id,
+                    state=state,
+                    rows=[],
+                    columns=[],
+                    row_count=0,
+                    error=_status_error(last_status, state),
+                    execution_time_ms=timing.finish(),
+                    credits=_status_credits(last_status),
+                    timing=timing,
+                )
+
+            fetch_start = time.time()
+            res, _ = await self._request("GET", f"/execution/{execution_id}/results", None, timing)
+            rows, columns = _rows_from_response(res)
+            timing.fetch_ms = int((time.time() - fetch_start) * 1000)
+            return ExecutionResult(
+                success=True,
+                execution_id=execution_id,
+                state=state,
+                rows=rows,
+                columns=columns,
+                row_count=len(rows),
+                execution_time_ms=timing.finish(),
+                credits=_status_credits(last_status),
+                timing=timing,
+            )
+        except Exception as e:
+            return ExecutionResult(
+                False, execution_id, "FAILED", [], [], 0, str(e), timing.finish(), timing=timing
+            )
+
+    async def execute_sql(
+        self,
+        sql: str,
+        params: dict[str, Any] | None = None,
+        timeout_seconds: int = 300,
+    ) -> ExecutionResult:
+        """Execute raw SQL query via Dune API."""
+        payload: dict[str, Any] = {"sql": sql, "performance": "medium"}
+        if params:
+            payload["query_parameters"] = params
+        return await self._run("/sql/execute", payload, timeout_seconds)
+
+    async def execute_query(
+        self,
+        query_id: int,
+        params: dict[str, Any] | None = None,
+        timeout_seconds: int = 300,
+    ) -> ExecutionResult:
+        """Execute a saved Dune query by ID."""
+        payload: dict[str, Any] = {"query_id": query_id}
+        if params:
+            payload["query_parameters"] = params
+        return await self._run("/query/execute", payload, timeout_seconds)
+
+    async def get_latest_result(
+        self,
+        query_id: int,
+        max_age_hours: int = 8,
+    ) -> ExecutionResult:
+        """Get latest cached result for a saved query."""
+        try:
+            res, _ = await self._request("GET", f"/query/{query_id}/results?max_age_hours={max_age_hours}")
+            rows, columns = _rows_from_response(res)
+            return ExecutionResult(True, None, "QUERY_STATE_COMPLETED", rows, columns, len(rows))
+        except Exception as e:
+            return ExecutionResult(False, None, "FAILED", [], [], 0, str(e))
+
+    async def execute_job(self, job: ExecutionJob) -> ExecutionResult:
+        """Execute an ``ExecutionJob`` (SQL text or saved query)."""
+        if job.sql is not None:
+            return await self.execute_sql(job.sql, job.params, job.timeout_seconds)
+        if job.query_id is not None:
+            return await self.execute_query(job.query_id, job.params, job.timeout_seconds)
+        return ExecutionResult(False, None, "FAILED", [], [], 0, f"Job '{job.key}' has neither sql nor query_id")
+
+    async def iter_completed(
+        self,
+        jobs: Iterable[ExecutionJob],
+    ) -> AsyncIterator[tuple[str, ExecutionResult]]:
+        """
+        Submit all jobs and yield ``(key, result)`` pairs as each finishes.
+
+        At most ``max_in_flight`` executions are active at once.
+        """
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def run_one(job: ExecutionJob) -> tuple[str, ExecutionResult]:
+            async with semaphore:
+                return job.key, await self.execute_job(job)
+
+        tasks = [asyncio.create_task(run_one(job)) for job in jobs]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield await fut
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def gather(self, jobs: Iterable[ExecutionJob]) -> dict[str, ExecutionResult]:
+        """Run all jobs concurrently and return results keyed by job key."""
+        return {key: result async for key, result in self.iter_completed(jobs)}
+
+
+def run_concurrently(
+    jobs: Iterable[ExecutionJob],
+    session: DuneSession | None = None,
+    poll: PollStrategy | None = None,
+    max_in_flight: int = 200,
+) -> dict[str, ExecutionResult]:
+    """Blocking helper: execute jobs on a fresh event loop and return all results."""
+
+    async def _main() -> dict[str, ExecutionResult]:
+        async with AsyncDuneClient(session, poll, max_in_flight) as client:
+            return await client.gather(jobs)
+
+    return asyncio.run(_main())
@@ -3,20 +3,121 @@ Dune Analytics API client wrapper.
 
 Provides a simplified interface for executing queries and retrieving results
 using direct HTTP calls (no external SDK dependency).
+
+All requests go through a ``DuneSession``, which keeps a small pool of
+keep-alive HTTPS connections per host so that the submit, status polls and
+result fetch of an execution reuse the same TLS connection.
 """
 
+import datetime
+import http.client
 import json
+import logging
 import os
+import random
+import socket
+import threading
 import time
-import urllib.error
-import urllib.request
-from dataclasses import dataclass
-from typing import Any
+import urllib.parse
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
 
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from scripts.result_cache import ResultCache
+
 API_BASE = "https://api.dune.com/api/v1"
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExecutionTiming:
+    """
+    Per-phase timings of one execution.
+
+    ``submit_ms``, ``wait_ms`` and ``fetch_ms`` are wall-clock phases measured
+    by the client (submit request, status polling, result download and JSON
+    decode). ``queue_ms`` and ``engine_ms`` are derived from the timestamps
+    Dune reports in the execution status and stay None when it omits them.
+    """
+
+    started_at: float | None = None
+    submit_ms: int | None = None
+    wait_ms: int | None = None
+    queue_ms: int | None = None
+    engine_ms: int | None = None
+    fetch_ms: int | None = None
+    decode_ms: float = 0.0
+    total_ms: int | None = None
+    poll_count: int = 0
+    request_count: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def begin(self) -> None:
+        """Mark the start of the execution."""
+        self.started_at = time.time()
+
+    def elapsed_ms(self) -> int:
+        """Milliseconds since ``begin`` (0 if never started)."""
+        if self.started_at is None:
+            return 0
+        return int((time.time() - self.started_at) * 1000)
+
+    def finish(self) -> int | None:
+        """Record and return the total wall-clock time."""
+        if self.started_at is None:
+            return None
+        self.total_ms = self.elapsed_ms()
+        return self.total_ms
+
+    def record_response(self, sent: int, received: int, decode_seconds: float) -> None:
+        """Account one HTTP round trip (retries included)."""
+        self.request_count += 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.decode_ms += decode_seconds * 1000
+
+    def record_status(self, status: dict[str, Any]) -> None:
+        """Derive queue and engine time from a status response's timestamps."""
+        submitted = _parse_api_time(status.get("submitted_at"))
+        started = _parse_api_time(status.get("execution_started_at"))
+        ended = _parse_api_time(status.get("execution_ended_at"))
+        if submitted is not None and started is not None:
+            self.queue_ms = max(int((started - submitted) * 1000), 0)
+        if started is not None and ended is not None:
+            self.engine_ms = max(int((ended - started) * 1000), 0)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any] | None) -> "ExecutionTiming | None":
+        """Rebuild from ``dataclasses.asdict`` output (e.g. a cached result)."""
+        if data is None:
+            return None
+        known = {f: data[f] for f in cls.__dataclass_fields__ if f in data}
+        return cls(**known)
+
+
+def _parse_api_time(value: Any) -> float | None:
+    """Epoch seconds from an API timestamp like ``2024-05-01T12:00:00.123456789Z``."""
+    if not isinstance(value, str) or not value:
+        return None
+    text = value.strip().replace("Z", "+00:00")
+    # Python only parses up to microseconds; Dune reports nanoseconds.
+    if "." in text:
+        head, _, frac = text.partition(".")
+        digits = len(frac) - len(frac.lstrip("0123456789"))
+        text = f"{head}.{frac[:min(digits, 6)].ljust(6, '0')}{frac[digits:]}"
+    try:
+        parsed = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
 
 @dataclass
 class ExecutionResult:
@@ -30,6 +131,9 @@ class ExecutionResult:
     row_count: int
     error: str | None = None
     execution_time_ms: int | None = None
+    cached: bool = False
+    credits: float | None = None
+    timing: ExecutionTiming | None = None
 
     @property
     def is_empty(self) -> bool:
@@ -37,6 +141,297 @@ class ExecutionResult:
         return self.row_count == 0
 
 
+@dataclass
+class RetryPolicy:
+    """Retry behaviour for transient HTTP and network failures."""
+
+    max_retries: int = 3
+    backoff_seconds: float = 0.5
+    max_backoff_seconds: float = 10.0
+    retry_statuses: frozenset[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504})
+    )
+    retry_methods: frozenset[str] = field(
+        default_factory=lambda: frozenset({"GET"})
+    )
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff delay before retry number ``attempt`` (0-based)."""
+        return min(self.backoff_seconds * (2**attempt), self.max_backoff_seconds)
+
+
+@dataclass
+class PollStrategy:
+    """
+    Schedule for polling an execution's status.
+
+    Polls start tight so cheap queries return quickly, then back off
+    exponentially (with jitter) for long-running ones. A server-provided
+    ``queue_position`` stretches the interval while the execution is queued,
+    and a ``Retry-After`` header is always honored as a lower bound.
+    """
+
+    initial_interval: float = 0.25
+    max_interval: float = 15.0
+    multiplier: float = 1.5
+    jitter: float = 0.2
+    seconds_per_queue_position: float = 1.0
+
+    @classmethod
+    def fixed(cls, interval: float) -> "PollStrategy":
+        """Constant-interval polling (the pre-backoff behaviour)."""
+        return cls(initial_interval=interval, max_interval=interval, multiplier=1.0, jitter=0.0)
+
+    def next_delay(
+        self,
+        poll_count: int,
+        status: dict[str, Any] | None = None,
+        retry_after: float | None = None,
+    ) -> float:
+        """
+        Seconds to wait before the next status poll.
+
+        Args:
+            poll_count: Number of status polls already made (>= 1).
+            status: Last status response, used for queue hints.
+            retry_after: Server ``Retry-After`` value in seconds, if any.
+        """
+        delay = min(
+            self.initial_interval * self.multiplier ** max(poll_count - 1, 0),
+            self.max_interval,
+        )
+        queue_position = (status or {}).get("queue_position")
+        if isinstance(queue_position, (int, float)) and queue_position > 0:
+            delay = max(delay, min(queue_position * self.seconds_per_queue_position, self.max_interval))
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+DEFAULT_POLL_STRATEGY = PollStrategy()
+
+TERMINAL_STATES = frozenset(
+    {
+        "QUERY_STATE_COMPLETED",
+        "QUERY_STATE_FAILED",
+        "QUERY_STATE_CANCELLED",
+        "QUERY_STATE_EXPIRED",
+    }
+)
+
+
+class _ConnectionPool:
+    """Bounded LIFO pool of keep-alive connections to a single host."""
+
+    def __init__(self, scheme: str, host: str, port: int | None, maxsize: int, timeout: float):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxsize)
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self) -> http.client.HTTPConnection:
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._new_connection()
+
+    def release(self, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class DuneSession:
+    """
+    Thread-safe Dune API client with pooled keep-alive connections.
+
+    Args:
+        api_key: Dune API key. Defaults to ``DUNE_API_KEY`` from the environment.
+        base_url: API base URL.
+        pool_size: Maximum concurrent connections per host.
+        timeout: Socket timeout in seconds for each request.
+        retry: Retry policy for transient failures.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = API_BASE,
+        pool_size: int = 8,
+        timeout: float = 60.0,
+        retry: RetryPolicy | None = None,
+    ):
+        self.api_key = api_key or _get_api_key()
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self._pools: dict[tuple[str, str, int | None], _ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "DuneSession":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close all idle pooled connections."""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+    def _pool_for(self, parsed: urllib.parse.SplitResult) -> _ConnectionPool:
+        key = (parsed.scheme, parsed.hostname or "", parsed.port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _ConnectionPool(*key, maxsize=self.pool_size, timeout=self.timeout)
+                self._pools[key] = pool
+            return pool
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None,
+        headers: dict[str, str],
+    ) -> tuple[int, http.client.HTTPMessage, bytes]:
+        parsed = urllib.parse.urlsplit(url)
+        target = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+        pool = self._pool_for(parsed)
+        conn = pool.acquire()
+        reusable = False
+        try:
+            conn.request(method, target, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            reusable = not resp.will_close
+            return resp.status, resp.headers, data
+        finally:
+            pool.release(conn, reusable)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        payload: dict[str, Any] | None = None,
+        timing: ExecutionTiming | None = None,
+    ) -> dict[str, Any]:
+        """
+        Send a request to the Dune API and decode the JSON response.
+
+        Args:
+            method: HTTP method.
+            path: API path relative to ``base_url`` (may include a query string).
+            payload: Optional JSON body.
+            timing: Optional ExecutionTiming to account bytes and decode time on.
+
+        Returns:
+            Decoded JSON response (empty dict for an empty body).
+
+        Raises:
+            RuntimeError: On HTTP error status or network failure after retries.
+        """
+        return self.request_with_headers(method, path, payload, timing)[0]
+
+    def request_with_headers(
+        self,
+        method: str,
+        path: str,
+        payload: dict[str, Any] | None = None,
+        timing: ExecutionTiming | None = None,
+    ) -> tuple[dict[str, Any], http.client.HTTPMessage]:
+        """Like ``request`` but also return the response headers."""
+        url = f"{self.base_url}{path}"
+        headers = {
+            "X-Dune-API-Key": self.api_key,
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+        }
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+
+        retryable = method.upper() in self.retry.retry_methods
+        attempt = 0
+        while True:
+            try:
+                status, resp_headers, body = self._send(method, url, data, headers)
+            except (http.client.HTTPException, ConnectionError, socket.timeout, OSError) as e:
+                # A pooled connection may have been closed by the server while
+                # idle; retry on a fresh one before giving up.
+                if attempt < self.retry.max_retries and (retryable or isinstance(e, http.client.RemoteDisconnected)):
+                    time.sleep(self.retry.delay(attempt) if attempt else 0)
+                    attempt += 1
+                    continue
+                raise RuntimeError(f"Network error: {e}") from e
+
+            if status >= 400:
+                if timing is not None:
+                    timing.record_response(len(data or b""), len(body), 0.0)
+                if status in self.retry.retry_statuses and (retryable or status == 429) and attempt < self.retry.max_retries:
+                    time.sleep(_retry_after(resp_headers) or self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+                raw = body.decode("utf-8", errors="ignore")
+                raise RuntimeError(f"HTTP {status}: {raw}")
+
+            decode_start = time.perf_counter()
+            text = body.decode("utf-8")
+            decoded = json.loads(text) if text else {}
+            if timing is not None:
+                timing.record_response(len(data or b""), len(body), time.perf_counter() - decode_start)
+            return decoded, resp_headers
+
+
+def _retry_after(headers: http.client.HTTPMessage) -> float | None:
+    """Parse a numeric ``Retry-After`` header, if present."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+_default_sessions: dict[str, DuneSession] = {}
+_default_sessions_lock = threading.Lock()
+
+
+def get_session(api_key: str | None = None) -> DuneSession:
+    """Return the shared process-wide session for an API key."""
+    api_key = api_key or _get_api_key()
+    with _default_sessions_lock:
+        session = _default_sessions.get(api_key)
+        if session is None:
+            session = DuneSession(api_key=api_key)
+            _default_sessions[api_key] = session
+        return session
+
+
 def _get_api_key() -> str:
     load_dotenv()
     api_key = os.getenv("DUNE_API_KEY")
@@ -48,52 +443,94 @@ def _get_api_key() -> str:
     return api_key
 
 
-def _request(
-    method: str,
+def _wait_for_completion(
+    session: DuneSession,
+    execution_id: str,
+    start: float,
+    timeout_seconds: int,
+    poll: PollStrategy,
+    timing: ExecutionTiming | None = None,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Poll an execution until it reaches a terminal state or times out.
+
+    Returns:
+        Tuple of (final state, last status response).
+    """
+    state = "QUERY_STATE_PENDING"
+    last_status: dict[str, Any] = {}
+    poll_count = 0
+    while True:
+        status, headers = session.request_with_headers("GET", f"/execution/{execution_id}/status", timing=timing)
+        poll_count += 1
+        last_status = status
+        state = str(status.get("state") or status.get("query_state") or state)
+        if state in TERMINAL_STATES:
+            break
+        remaining = timeout_seconds - (time.time() - start)
+        if remaining <= 0:
+            break
+        delay = poll.next_delay(poll_count, status, _retry_after(headers))
+        time.sleep(min(delay, remaining))
+    if timing is not None:
+        timing.poll_count = poll_count
+        timing.record_status(last_status)
+    return state, last_status
+
+
+def _fetch_execution_rows(
+    session: DuneSession,
     path: str,
-    api_key: str,
-    payload: dict[str, Any] | None = None,
-) -> dict[str, Any]:
-    url = f"{API_BASE}{path}"
-    headers = {
-        "X-Dune-API-Key": api_key,
-        "Content-Type": "application/json",
-    }
-    data = None
-    if payload is not None:
-        data = json.dumps(payload).encode("utf-8")
-
-    req = urllib.request.Request(url, data=data, headers=headers, method=method)
-    try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            body = resp.read().decode("utf-8")
-            if not body:
-                return {}
-            return json.loads(body)
-    except urllib.error.HTTPError as e:
-        raw = e.read().decode("utf-8", errors="ignore")
-        raise RuntimeError(f"HTTP {e.code}: {raw}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Network error: {e}") from e
-
-
-def execute_sql(
-    sql: str,
-    params: dict[str, Any] | None = None,
-    timeout_seconds: int = 300,
+    timing: ExecutionTiming | None = None,
+) -> tuple[list[dict[str, Any]], list[str]]:
+    fetch_start = time.time()
+    rows, columns = _rows_from_response(session.request("GET", path, timing=timing))
+    if timing is not None:
+        timing.fetch_ms = int((time.time() - fetch_start) * 1000)
+    return rows, columns
+
+
+def _rows_from_response(res: dict[str, Any]) -> tuple[list[dict[str, Any]], list[str]]:
+    result_obj = res.get("result", {}) if isinstance(res, dict) else {}
+    rows = result_obj.get("rows", []) if isinstance(result_obj, dict) else []
+    columns = list(rows[0].keys()) if rows else []
+    return rows, columns
+
+
+def _status_credits(last_status: dict[str, Any]) -> float | None:
+    credits = last_status.get("execution_cost_credits")
+    return float(credits) if credits is not None else None
+
+
+def _status_error(last_status: dict[str, Any], state: str) -> str:
+    error = last_status.get("error")
+    if isinstance(error, dict) and error.get("message"):
+        return str(error["message"])
+    err_msg = (
+        last_status.get("error")
+        or last_status.get("error_message")
+        or last_status.get("message")
+        or f"Execution not completed. Final state: {state}"
+    )
+    return str(err_msg)
+
+
+def _run_execution(
+    session: DuneSession | None,
+    submit_path: str,
+    payload: dict[str, Any],
+    timeout_seconds: int,
+    poll: PollStrategy | None,
 ) -> ExecutionResult:
-    """Execute raw SQL query via Dune API."""
+    """Submit, poll and fetch one execution, timing each phase (failures included)."""
+    timing = ExecutionTiming()
+    execution_id = None
     try:
-        api_key = _get_api_key()
-
-        # Dune endpoint for executing ad-hoc SQL.
-        payload: dict[str, Any] = {"sql": sql, "performance": "medium"}
-        if params:
-            payload["query_parameters"] = params
-
-        start = time.time()
-        exec_resp = _request("POST", "/sql/execute", api_key, payload)
-        execution_id = str(exec_resp.get("execution_id", ""))
+        session = session or get_session()
+        timing.begin()
+        exec_resp = session.request("POST", submit_path, payload, timing=timing)
+        timing.submit_ms = timing.elapsed_ms()
+        execution_id = str(exec_resp.get("execution_id", "")) or None
         if not execution_id:
             return ExecutionResult(
                 success=False,
@@ -103,32 +540,16 @@ def execute_sql(
                 columns=[],
                 row_count=0,
                 error=f"Missing execution_id in response: {exec_resp}",
+                execution_time_ms=timing.finish(),
+                timing=timing,
             )
 
-        terminal_states = {
-            "QUERY_STATE_COMPLETED",
-            "QUERY_STATE_FAILED",
-            "QUERY_STATE_CANCELLED",
-            "QUERY_STATE_EXPIRED",
-        }
-
-        state = "QUERY_STATE_PENDING"
-        last_status: dict[str, Any] = {}
-        while time.time() - start < timeout_seconds:
-            status = _request("GET", f"/execution/{execution_id}/status", api_key)
-            last_status = status
-            state = str(status.get("state") or status.get("query_state") or state)
-            if state in terminal_states:
-                break
-            time.sleep(2)
+        state, last_status = _wait_for_completion(
+            session, execution_id, timing.started_at, timeout_seconds, poll or DEFAULT_POLL_STRATEGY, timing
+        )
+        timing.wait_ms = timing.elapsed_ms() - timing.submit_ms
 
         if state != "QUERY_STATE_COMPLETED":
-            err_msg = (
-                last_status.get("error")
-                or last_status.get("error_message")
-                or last_status.get("message")
-                or f"Execution not completed. Final state: {state}"
-            )
             return ExecutionResult(
                 success=False,
                 execution_id=execution_id,
@@ -136,14 +557,13 @@ def execute_sql(
                 rows=[],
                 columns=[],
                 row_count=0,
-                error=str(err_msg),
-                execution_time_ms=int((time.time() - start) * 1000),
+                error=_status_error(last_status, state),
+                execution_time_ms=timing.finish(),
+                credits=_status_credits(last_status),
+                timing=timing,
             )
 
-        res = _request("GET", f"/execution/{execution_id}/results", api_key)
-        result_obj = res.get("result", {}) if isinstance(res, dict) else {}
-        rows = result_obj.get("rows", []) if isinstance(result_obj, dict) else []
-        columns = list(rows[0].keys()) if rows else []
+        rows, columns = _fetch_execution_rows(session, f"/execution/{execution_id}/results", timing)
 
         return ExecutionResult(
             success=True,
@@ -152,85 +572,311 @@ def execute_sql(
             rows=rows,
             columns=columns,
             row_count=len(rows),
-            execution_time_ms=int((time.time() - start) * 1000),
+            execution_time_ms=timing.finish(),
+            credits=_status_credits(last_status),
+            timing=timing,
         )
-
     except Exception as e:
         return ExecutionResult(
             success=False,
-            execution_id=None,
+            execution_id=execution_id,
             state="FAILED",
             rows=[],
             columns=[],
             row_count=0,
             error=str(e),
+            execution_time_ms=timing.finish(),
+            timing=timing,
         )
 
 
+def execute_sql(
+    sql: str,
+    params: dict[str, Any] | None = None,
+    timeout_seconds: int = 300,
+    session: DuneSession | None = None,
+    poll: PollStrategy | None = None,
+    performance: str = "medium",
+    cache: "ResultCache | None" = None,
+) -> ExecutionResult:
+    """
+    Execute raw SQL query via Dune API.
+
+    When ``cache`` is given, an unexpired result for the same SQL, parameters
+    and performance tier is returned without contacting the API, and new
+    successful results are stored in it.
+    """
+    key = None
+    if cache is not None:
+        from scripts.result_cache import cache_key
+
+        key = cache_key(sql, params, performance)
+        try:
+            hit = cache.get(key)
+        except Exception as e:
+            # A broken cache must not fail the query; run it instead.
+            logger.warning("Result cache read failed, executing instead: %s", e)
+            hit = None
+        if hit is not None:
+            return hit
+
+    # Dune endpoint for executing ad-hoc SQL.
+    payload: dict[str, Any] = {"sql": sql, "performance": performance}
+    if params:
+        payload["query_parameters"] = params
+
+    result = _run_execution(session, "/sql/execute", payload, timeout_seconds, poll)
+    if cache is not None and key is not None and result.success:
+        try:
+            cache.put(key, result)
+        except Exception as e:
+            # The execution already succeeded (and spent credits); keep its result.
+            logger.warning("Result cache write failed for execution %s: %s", result.execution_id, e)
+    return result
+
+
 def execute_query(
     query_id: int,
     params: dict[str, Any] | None = None,
     timeout_seconds: int = 300,
+    session: DuneSession | None = None,
+    poll: PollStrategy | None = None,
 ) -> ExecutionResult:
     """Execute a saved Dune query by ID."""
+    payload: dict[str, Any] = {"query_id": query_id}
+    if params:
+        payload["query_parameters"] = params
+    return _run_execution(session, "/query/execute", payload, timeout_seconds, poll)
+
+
+def get_latest_result(
+    query_id: int,
+    max_age_hours: int = 8,
+    session: DuneSession | None = None,
+) -> ExecutionResult:
+    """Get latest cached result for a saved query."""
+    timing = ExecutionTiming()
     try:
-        api_key = _get_api_key()
-        payload: dict[str, Any] = {"query_id": query_id}
-        if params:
-            payload["query_parameters"] = params
+        session = session or get_session()
+        timing.begin()
+        rows, columns = _fetch_execution_rows(
+            session, f"/query/{query_id}/results?max_age_hours={max_age_hours}", timing
+        )
+        return ExecutionResult(
+            True, None, "QUERY_STATE_COMPLETED", rows, columns, len(rows), timing=timing, execution_time_ms=timing.finish()
+        )
+    except Exception as e:
+        return ExecutionResult(False, None, "FAILED", [], [], 0, str(e), timing.finish(), timing=timing)
+
+
+class ResultStream:
+    """
+    Paginated view over an execution's results.
+
+    Iterating yields row batches (lists of row dicts) fetched one page at a
+    time with ``limit``/``offset``, so only a single page is held in memory.
+    A failed execution yields no batches; check ``success`` and ``error``.
+    Page downloads are added to ``timing.fetch_ms`` as they happen.
+    """
+
+    def __init__(
+        self,
+        session: DuneSession | None,
+        results_path: str | None,
+        execution_id: str | None = None,
+        state: str = "QUERY_STATE_COMPLETED",
+        page_size: int = 10_000,
+        error: str | None = None,
+        execution_time_ms: int | None = None,
+        timing: ExecutionTiming | None = None,
+    ):
+        self.session = session
+        self.results_path = results_path
+        self.execution_id = execution_id
+        self.state = state
+        self.page_size = page_size
+        self.error = error
+        self.execution_time_ms = execution_time_ms
+        self.timing = timing
+        self.columns: list[str] = []
+        self.total_row_count: int | None = None
+        self.rows_fetched = 0
 
-        start = time.time()
-        exec_resp = _request("POST", "/query/execute", api_key, payload)
-        execution_id = str(exec_resp.get("execution_id", ""))
-        if not execution_id:
-            return ExecutionResult(False, None, "FAILED", [], [], 0, f"Missing execution_id: {exec_resp}")
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.state == "QUERY_STATE_COMPLETED"
+
+    def __iter__(self) -> Iterator[list[dict[str, Any]]]:
+        if not self.success or self.session is None or self.results_path is None:
+            return
+        sep = "&" if "?" in self.results_path else "?"
+        offset: int | None = 0
+        while offset is not None:
+            page_start = time.time()
+            res = self.session.request(
+                "GET", f"{self.results_path}{sep}limit={self.page_size}&offset={offset}", timing=self.timing
+            )
+            if self.timing is not None:
+                self.timing.fetch_ms = (self.timing.fetch_ms or 0) + int((time.time() - page_start) * 1000)
+            rows, columns = _rows_from_response(res)
+            metadata = (res.get("result") or {}).get("metadata") or {}
+            if not self.columns:
+                self.columns = list(metadata.get("column_names") or columns)
+            if self.total_row_count is None and metadata.get("total_row_count") is not None:
+                self.total_row_count = int(metadata["total_row_count"])
+            if rows:
+                self.rows_fetched += len(rows)
+                yield rows
+            next_offset = res.get("next_offset")
+            offset = int(next_offset) if next_offset is not None and rows else None
+        if self.timing is not None and self.timing.fetch_ms is not None:
+            # Time spent by the consumer between pages is not execution time.
+            self.timing.total_ms = (self.timing.submit_ms or 0) + (self.timing.wait_ms or 0) + self.timing.fetch_ms
+
+    def iter_rows(self) -> Iterator[dict[str, Any]]:
+        """Iterate individual rows across all pages."""
+        for batch in self:
+            yield from batch
+
+    def collect_columnar(self) -> ExecutionResult:
+        """
+        Materialize the stream into a ``ColumnarResult``.
+
+        Each page is converted to typed column arrays as it arrives, so row
+        dicts for the full result are never held at once.
+        """
+        from scripts.columnar import ColumnarResult, ColumnarTable
+
+        if not self.success:
+            return self.collect()
+        table = ColumnarTable.from_batches(self)
+        if self.columns and not table.columns:
+            table = ColumnarTable.from_batches([], self.columns)
+        return ColumnarResult(
+            table,
+            execution_id=self.execution_id,
+            state=self.state,
+            execution_time_ms=self.execution_time_ms,
+            timing=self.timing,
+        )
 
-        terminal_states = {
-            "QUERY_STATE_COMPLETED",
-            "QUERY_STATE_FAILED",
-            "QUERY_STATE_CANCELLED",
-            "QUERY_STATE_EXPIRED",
-        }
-        state = "QUERY_STATE_PENDING"
-        while time.time() - start < timeout_seconds:
-            status = _request("GET", f"/execution/{execution_id}/status", api_key)
-            state = str(status.get("state") or status.get("query_state") or state)
-            if state in terminal_states:
-                break
-            time.sleep(2)
+    def collect(self) -> ExecutionResult:
+        """Materialize the whole stream into an ExecutionResult."""
+        rows = list(self.iter_rows()) if self.success else []
+        return ExecutionResult(
+            success=self.success,
+            execution_id=self.execution_id,
+            state=self.state,
+            rows=rows,
+            columns=self.columns or (list(rows[0].keys()) if rows else []),
+            row_count=len(rows),
+            error=self.error,
+            execution_time_ms=self.execution_time_ms,
+            timing=self.timing,
+        )
 
-        if state != "QUERY_STATE_COMPLETED":
-            return ExecutionResult(False, execution_id, state, [], [], 0, f"Execution not completed. Final state: {state}")
 
-        res = _request("GET", f"/execution/{execution_id}/results", api_key)
-        result_obj = res.get("result", {}) if isinstance(res, dict) else {}
-        rows = result_obj.get("rows", []) if isinstance(result_obj, dict) else []
-        columns = list(rows[0].keys()) if rows else []
+def _stream_execution(
+    session: DuneSession,
+    submit_path: str,
+    payload: dict[str, Any],
+    timeout_seconds: int,
+    poll: PollStrategy | None,
+    page_size: int,
+) -> ResultStream:
+    timing = ExecutionTiming()
+    timing.begin()
+    exec_resp = session.request("POST", submit_path, payload, timing=timing)
+    timing.submit_ms = timing.elapsed_ms()
+    execution_id = str(exec_resp.get("execution_id", ""))
+    if not execution_id:
+        return ResultStream(
+            None,
+            None,
+            state="FAILED",
+            error=f"Missing execution_id in response: {exec_resp}",
+            execution_time_ms=timing.finish(),
+            timing=timing,
+        )
 
-        return ExecutionResult(
-            success=True,
+    state, last_status = _wait_for_completion(
+        session, execution_id, timing.started_at, timeout_seconds, poll or DEFAULT_POLL_STRATEGY, timing
+    )
+    timing.wait_ms = timing.elapsed_ms() - timing.submit_ms
+    elapsed_ms = timing.finish()
+    if state != "QUERY_STATE_COMPLETED":
+        return ResultStream(
+            None,
+            None,
             execution_id=execution_id,
             state=state,
-            rows=rows,
-            columns=columns,
-            row_count=len(rows),
-            execution_time_ms=int((time.time() - start) * 1000),
+            error=_status_error(last_status, state),
+            execution_time_ms=elapsed_ms,
+            timing=timing,
         )
+    return ResultStream(
+        session,
+        f"/execution/{execution_id}/results",
+        execution_id=execution_id,
+        state=state,
+        page_size=page_size,
+        execution_time_ms=elapsed_ms,
+        timing=timing,
+    )
+
+
+def stream_sql(
+    sql: str,
+    params: dict[str, Any] | None = None,
+    timeout_seconds: int = 300,
+    session: DuneSession | None = None,
+    poll: PollStrategy | None = None,
+    performance: str = "medium",
+    page_size: int = 10_000,
+) -> ResultStream:
+    """Execute raw SQL and return a paginated stream over its results."""
+    try:
+        session = session or get_session()
+        payload: dict[str, Any] = {"sql": sql, "performance": performance}
+        if params:
+            payload["query_parameters"] = params
+        return _stream_execution(session, "/sql/execute", payload, timeout_seconds, poll, page_size)
     except Exception as e:
-        return ExecutionResult(False, None, "FAILED", [], [], 0, str(e))
+        return ResultStream(None, None, state="FAILED", error=str(e))
 
 
-def get_latest_result(
+def stream_query(
+    query_id: int,
+    params: dict[str, Any] | None = None,
+    timeout_seconds: int = 300,
+    session: DuneSession | None = None,
+    poll: PollStrategy | None = None,
+    page_size: int = 10_000,
+) -> ResultStream:
+    """Execute a saved query and return a paginated stream over its results."""
+    try:
+        session = session or get_session()
+        payload: dict[str, Any] = {"query_id": query_id}
+        if params:
+            payload["query_parameters"] = params
+        return _stream_execution(session, "/query/execute", payload, timeout_seconds, poll, page_size)
+    except Exception as e:
+        return ResultStream(None, None, state="FAILED", error=str(e))
+
+
+def stream_latest_result(
     query_id: int,
     max_age_hours: int = 8,
-) -> ExecutionResult:
-    """Get latest cached result for a saved query."""
+    session: DuneSession | None = None,
+    page_size: int = 10_000,
+) -> ResultStream:
+    """Paginated stream over the latest cached result of a saved query."""
     try:
-        api_key = _get_api_key()
-        res = _request("GET", f"/query/{query_id}/results?max_age_hours={max_age_hours}", api_key)
-        result_obj = res.get("result", {}) if isinstance(res, dict) else {}
-        rows = result_obj.get("rows", []) if isinstance(result_obj, dict) else []
-        columns = list(rows[0].keys()) if rows else []
-        return ExecutionResult(True, None, "QUERY_STATE_COMPLETED", rows, columns, len(rows))
+        session = session or get_session()
     except Exception as e:
-        return ExecutionResult(False, None, "FAILED", [], [], 0, str(e))
+        return ResultStream(None, None, state="FAILED", error=str(e))
+    return ResultStream(
+        session,
+        f"/query/{query_id}/results?max_age_hours={max_age_hours}",
+        page_size=page_size,
+    )
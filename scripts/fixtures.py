@@ -0,0 +1,390 @@
+"""
+Generate the Parquet fixtures used by the local DuckDB engine.
+
+Writes small, deterministic stand-ins for the Dune tables read by the
+``lending_flow_stitching`` and ``bitcoin_utxo_heuristics_v2`` smoke tests,
+plus the unified lending action ledger as its ``query_<id>`` table, laid
+out as ``<output>/<schema>/<table>.parquet`` (``<output>/query_<id>.parquet``
+for the ledger) with a ``fixtures.json`` manifest. The manifest's ``as_of`` date is what ``LocalEngine`` evaluates
+``CURRENT_DATE`` as, so the committed snapshot keeps falling inside the smoke
+tests' "last N days" windows.
+
+Requires the optional ``local`` extra (``pip install -e .[local]``).
+"""
+
+import argparse
+import datetime
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from scripts.local_engine import DEFAULT_FIXTURES_DIR, FIXTURES_MANIFEST
+from scripts.registry import get_registry
+
+STABLECOINS = [
+    "a0b86991c6218b36c1d19d4a2e9eb0ce3606eb48",  # USDC
+    "dac17f958d2ee523a2206206994597c13d831ec7",  # USDT
+    "6b175474e89094c44da98b954eedeac495271d0f",  # DAI
+]
+WETH = "c02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"
+AAVE_V3_POOL = "87870bca3f3fd6335c3f4ce8392d69350b4fa4e2"
+MORPHO_BLUE = "bbbbbbbbbb9cc5e90e3b3af64bdaf62c37eeffcb"
+COMET_USDC = "c3d688b66703497daa19211eedff47f25384cdc3"
+CTOKENS = [
+    "39aa39c021dfbae8fac545936693ac917d5e7563",  # cUSDC
+    "f650c3d88d12db855b8bf7d11be6c55a4e07dcc9",  # cUSDT
+    "5d3a536e4d6dbd6114cc1ead35777bab948e3643",  # cDAI
+]
+PROTOCOLS = ["aave_v3", "morpho_blue", "compound_v3", "compound_v2"]
+
+# Ethereum block numbers are approximated from 12-second slots after this block.
+_ETH_EPOCH = datetime.datetime(2024, 11, 1)
+_ETH_BLOCK_ZERO = 21_100_000
+
+BLOCKS_PER_DAY = 144
+SCRIPT_TYPES = ["witness_v0_keyhash", "witness_v1_taproot", "pubkeyhash", "scripthash"]
+# (min inputs, max inputs, min outputs, max outputs) per transaction shape,
+# one for each intent the UTXO heuristics classify.
+TX_SHAPES = [
+    (10, 20, 1, 2),  # consolidation
+    (1, 2, 10, 20),  # fan-out batch
+    (5, 8, 5, 8),  # coinjoin-like (input/output counts differ by at most 1)
+    (1, 1, 1, 1),  # self transfer
+    (2, 4, 2, 2),  # change-like with two outputs
+    (1, 3, 3, 6),  # other
+]
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Fixture generation requires pyarrow. Install it with: pip install -e .[local]") from e
+    return pa, pq
+
+
+def _hash(rng: np.random.Generator, size: int = 32) -> bytes:
+    return rng.bytes(size)
+
+
+def _day_start(as_of: datetime.date, days_back: int) -> datetime.datetime:
+    day = as_of - datetime.timedelta(days=days_back)
+    return datetime.datetime(day.year, day.month, day.day)
+
+
+class _EventLog:
+    """Rows of one decoded event table, with the columns Dune adds to every event."""
+
+    def __init__(self, contract: str):
+        self.contract = contract
+        self.rows: list[dict[str, Any]] = []
+
+    def add(self, block_time: datetime.datetime, tx_hash: bytes, evt_index: int, **params: Any) -> None:
+        self.rows.append(
+            {
+                "contract_address": bytes.fromhex(self.contract),
+                "evt_tx_hash": tx_hash,
+                "evt_index": evt_index,
+                "evt_block_time": block_time,
+                "evt_block_number": _ETH_BLOCK_ZERO + int((block_time - _ETH_EPOCH).total_seconds()) // 12,
+                **params,
+            }
+        )
+
+
+def lending_tables(as_of: datetime.date, rng: np.random.Generator) -> dict[str, list[dict[str, Any]]]:
+    """
+    Borrow and supply events for Aave V3, Morpho Blue and Compound V3/V2.
+
+    Each of the last 28 days gets standalone events plus a few same-tx
+    borrow -> supply pairs that move a stablecoin between two protocols.
+    """
+    entities = [_hash(rng, 20) for _ in range(24)]
+    markets = {asset: _hash(rng, 32) for asset in STABLECOINS + [WETH]}
+
+    createmarket = _EventLog(MORPHO_BLUE)
+    for loan_token, market_id in markets.items():
+        params = {
+            "loanToken": "0x" + loan_token,
+            "collateralToken": "0x" + WETH,
+            "oracle": "0x" + _hash(rng, 20).hex(),
+            "irm": "0x" + _hash(rng, 20).hex(),
+            "lltv": "860000000000000000",
+        }
+        createmarket.add(_day_start(as_of, 400), _hash(rng), 0, id=market_id, marketParams=json.dumps(params))
+
+    logs = {
+        ("aave_v3", "borrow"): _EventLog(AAVE_V3_POOL),
+        ("aave_v3", "supply"): _EventLog(AAVE_V3_POOL),
+        ("morpho_blue", "borrow"): _EventLog(MORPHO_BLUE),
+        ("morpho_blue", "supply"): _EventLog(MORPHO_BLUE),
+        ("compound_v3", "borrow"): _EventLog(COMET_USDC),
+        ("compound_v3", "supply"): _EventLog(COMET_USDC),
+        ("compound_v2", "borrow"): {token: _EventLog(token) for token in CTOKENS},
+        ("compound_v2", "supply"): {token: _EventLog(token) for token in CTOKENS},
+    }
+
+    def emit(
+        protocol: str,
+        action: str,
+        block_time: datetime.datetime,
+        tx_hash: bytes,
+        evt_index: int,
+        entity: bytes,
+        asset: str,
+    ) -> None:
+        amount = int(rng.lognormal(9, 1.5)) * 10**6
+        if protocol == "aave_v3":
+            params = {"reserve": bytes.fromhex(asset), "user": entity, "onBehalfOf": entity, "amount": amount}
+            if action == "borrow":
+                params["interestRateMode"] = 2
+            params["referralCode"] = 0
+            logs[protocol, action].add(block_time, tx_hash, evt_index, **params)
+        elif protocol == "morpho_blue":
+            params = {"id": markets[asset], "caller": entity, "onBehalf": entity, "assets": amount, "shares": amount}
+            if action == "borrow":
+                params["receiver"] = entity
+            logs[protocol, action].add(block_time, tx_hash, evt_index, **params)
+        elif protocol == "compound_v3":
+            if action == "borrow":
+                params = {"src": entity, "to": entity, "amount": amount}
+            else:
+                params = {"from": entity, "dst": entity, "amount": amount}
+            logs[protocol, action].add(block_time, tx_hash, evt_index, **params)
+        else:
+            token = CTOKENS[STABLECOINS.index(asset)] if asset in STABLECOINS else CTOKENS[0]
+            if action == "borrow":
+                params = {"borrower": entity, "borrowAmount": amount, "accountBorrows": amount, "totalBorrows": amount}
+            else:
+                params = {"minter": entity, "mintAmount": amount, "mintTokens": amount * 50}
+            logs[protocol, action][token].add(block_time, tx_hash, evt_index, **params)
+
+    for days_back in range(1, 29):
+        start = _day_start(as_of, days_back)
+        for _ in range(12):
+            block_time = start + datetime.timedelta(seconds=int(rng.integers(0, 86_400)))
+            protocol = PROTOCOLS[rng.integers(0, len(PROTOCOLS))]
+            asset = STABLECOINS[rng.integers(0, len(STABLECOINS))]
+            if protocol == "aave_v3" and rng.random() < 0.2:
+                asset = WETH
+            action = "borrow" if rng.random() < 0.5 else "supply"
+            emit(protocol, action, block_time, _hash(rng), int(rng.integers(0, 300)), entities[rng.integers(0, len(entities))], asset)
+        for _ in range(3):
+            block_time = start + datetime.timedelta(seconds=int(rng.integers(0, 86_400)))
+            source, dest = rng.choice(len(PROTOCOLS), 2, replace=False)
+            asset = STABLECOINS[0] if "compound_v3" in (PROTOCOLS[source], PROTOCOLS[dest]) else STABLECOINS[rng.integers(0, len(STABLECOINS))]
+            entity = entities[rng.integers(0, len(entities))]
+            tx_hash = _hash(rng)
+            borrow_index = int(rng.integers(0, 200))
+            emit(PROTOCOLS[source], "borrow", block_time, tx_hash, borrow_index, entity, asset)
+            emit(PROTOCOLS[dest], "supply", block_time, tx_hash, borrow_index + int(rng.integers(1, 20)), entity, asset)
+
+    def rows(log: Any) -> list[dict[str, Any]]:
+        if isinstance(log, dict):
+            merged = [row for sub in log.values() for row in sub.rows]
+            return sorted(merged, key=lambda row: row["evt_block_time"])
+        return log.rows
+
+    return {
+        "morpho_blue_ethereum.morphoblue_evt_createmarket": createmarket.rows,
+        "aave_v3_ethereum.pool_evt_borrow": rows(logs["aave_v3", "borrow"]),
+        "aave_v3_ethereum.pool_evt_supply": rows(logs["aave_v3", "supply"]),
+        "morpho_blue_ethereum.morphoblue_evt_borrow": rows(logs["morpho_blue", "borrow"]),
+        "morpho_blue_ethereum.morphoblue_evt_supply": rows(logs["morpho_blue", "supply"]),
+        "compound_v3_ethereum.comet_evt_withdraw": rows(logs["compound_v3", "borrow"]),
+        "compound_v3_ethereum.comet_evt_supply": rows(logs["compound_v3", "supply"]),
+        "compound_ethereum.cerc20delegator_evt_borrow": rows(logs["compound_v2", "borrow"]),
+        "compound_ethereum.cerc20delegator_evt_mint": rows(logs["compound_v2", "supply"]),
+    }
+
+
+def bitcoin_tables(
+    as_of: datetime.date,
+    rng: np.random.Generator,
+    txs_per_day: int = 40,
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    ``bitcoin.blocks``, ``inputs`` and ``outputs`` for the 7 days before ``as_of``.
+
+    Transactions cycle through ``TX_SHAPES`` so every intent the heuristics
+    classify is present, and each day has one coinbase transaction.
+    """
+    addresses = ["bc1q" + _hash(rng, 19).hex() for _ in range(300)]
+    tip_height = 960_000
+    blocks: list[dict[str, Any]] = []
+    inputs: list[dict[str, Any]] = []
+    outputs: list[dict[str, Any]] = []
+
+    for height in range(tip_height - 7 * BLOCKS_PER_DAY, tip_height):
+        days_back, slot = divmod(tip_height - height - 1, BLOCKS_PER_DAY)
+        block_time = _day_start(as_of, days_back + 1) + datetime.timedelta(seconds=(BLOCKS_PER_DAY - 1 - slot) * 600)
+        blocks.append({"time": block_time, "date": block_time.date(), "height": height, "hash": _hash(rng)})
+
+    for days_back in range(7, 0, -1):
+        start = _day_start(as_of, days_back)
+        for n in range(txs_per_day + 1):
+            offset = int(rng.integers(0, 86_400))
+            block_time = start + datetime.timedelta(seconds=offset)
+            block_height = tip_height - days_back * BLOCKS_PER_DAY + offset * BLOCKS_PER_DAY // 86_400
+            tx_id = _hash(rng)
+            common = {"block_time": block_time, "block_date": block_time.date(), "block_height": block_height, "tx_id": tx_id}
+
+            if n == txs_per_day:
+                inputs.append(
+                    {**common, "index": 0, "spent_block_height": None, "value": 0.0, "address": None, "type": "coinbase", "is_coinbase": True}
+                )
+                shape, input_count = (1, 1, 1, 2), 1
+            else:
+                shape = TX_SHAPES[n % len(TX_SHAPES)]
+                input_count = int(rng.integers(shape[0], shape[1] + 1))
+                for index in range(input_count):
+                    inputs.append(
+                        {
+                            **common,
+                            "index": index,
+                            # Spent outputs aged from a few blocks to a few years.
+                            "spent_block_height": block_height - int(rng.integers(1, 3 * 365 * BLOCKS_PER_DAY)),
+                            "value": round(float(rng.lognormal(-4, 2)), 8),
+                            "address": addresses[rng.integers(0, len(addresses))],
+                            "type": SCRIPT_TYPES[rng.integers(0, len(SCRIPT_TYPES))],
+                            "is_coinbase": False,
+                        }
+                    )
+            output_count = int(rng.integers(shape[2], shape[3] + 1))
+            if shape == TX_SHAPES[2]:
+                output_count = input_count + int(rng.integers(-1, 2))
+            for index in range(output_count):
+                outputs.append(
+                    {
+                        **common,
+                        "index": index,
+                        "value": round(float(rng.lognormal(-4, 2)), 8),
+                        "address": addresses[rng.integers(0, len(addresses))],
+                        "type": SCRIPT_TYPES[rng.integers(0, len(SCRIPT_TYPES))],
+                    }
+                )
+
+    return {"bitcoin.blocks": blocks, "bitcoin.inputs": inputs, "bitcoin.outputs": outputs}
+
+
+def action_ledger(as_of: datetime.date, seed: int = 0, n: int = 2_000) -> list[dict[str, Any]]:
+    """
+    Rows of ``lending_action_ledger_unified`` for the 28 days before ``as_of``.
+
+    Shipped as its ``query_<id>`` table so the nested lending queries (flow
+    stitching and everything downstream) run without the ledger's many
+    source event tables.
+    """
+    from scripts.flow_stitcher import synthetic_actions
+
+    actions = synthetic_actions(n, entities=40, days=28, seed=seed, start=_day_start(as_of, 28))
+    rows = []
+    for action in actions.to_dict("records"):
+        entity = bytes.fromhex(action["entity_address"][2:])
+        rows.append(
+            {
+                "block_time": action["block_time"].to_pydatetime(),
+                "block_date": action["block_date"].date(),
+                "block_number": int(action["block_number"]),
+                "tx_hash": bytes.fromhex(action["tx_hash"][2:]),
+                "evt_index": int(action["evt_index"]),
+                "protocol": action["protocol"],
+                "action_type": action["action_type"],
+                "user_address": entity,
+                "on_behalf_of": entity,
+                "entity_address": entity,
+                "asset_address": bytes.fromhex(action["asset_address"][2:]),
+                "asset_symbol": action["asset_symbol"],
+                "amount_raw": str(int(action["amount"] * 10**6)),
+                "amount": float(action["amount"]),
+                "amount_usd": float(action["amount_usd"]),
+            }
+        )
+    return rows
+
+
+def generate(
+    output_dir: Path | str = DEFAULT_FIXTURES_DIR,
+    as_of: datetime.date | None = None,
+    seed: int = 0,
+) -> dict[str, int]:
+    """
+    Write every fixture table and the manifest under ``output_dir``.
+
+    Returns:
+        Mapping of ``schema.table`` to the number of rows written.
+    """
+    pa, pq = _import_pyarrow()
+    output_dir = Path(output_dir)
+    as_of = as_of or datetime.date.today()
+    rng = np.random.default_rng(seed)
+
+    tables = {**lending_tables(as_of, rng), **bitcoin_tables(as_of, rng)}
+    ledger_id = get_registry().id_map["lending_action_ledger_unified"]
+    tables[f"query_{ledger_id}"] = action_ledger(as_of, seed)
+    counts = {}
+    for name, rows in tables.items():
+        schema, _, table = name.rpartition(".")
+        path = output_dir / schema / f"{table}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.Table.from_pylist(rows), path, compression="zstd")
+        counts[name] = len(rows)
+
+    manifest = {"as_of": as_of.isoformat(), "seed": seed, "tables": counts}
+    with open(output_dir / FIXTURES_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    return counts
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Generate Parquet fixtures for the local DuckDB engine",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.fixtures
+  python -m scripts.fixtures --as-of 2026-10-16 --seed 0
+  python -m scripts.fixtures --output /tmp/fixtures
+
+Then run smoke tests offline:
+  python -m scripts.smoke_runner --test lending_flow_stitching --engine local
+        """,
+    )
+    parser.add_argument(
+        "--output",
+        help="Fixture directory to write (default: tests/fixtures)",
+    )
+    parser.add_argument(
+        "--as-of",
+        help="Date the fixtures are generated for; CURRENT_DATE in local runs (default: today)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed (default: 0)",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        as_of = datetime.date.fromisoformat(args.as_of) if args.as_of else None
+        counts = generate(args.output or DEFAULT_FIXTURES_DIR, as_of, args.seed)
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    for name, count in counts.items():
+        print(f"  {name}: {count} rows")
+    print(f"\nWrote {len(counts)} tables to {args.output or DEFAULT_FIXTURES_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
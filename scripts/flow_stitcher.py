@@ -0,0 +1,558 @@
+"""
+Sort-merge flow stitching for local backtests.
+
+A vectorized counterpart of ``lending_flow_stitching.sql``. It reads
+``lending_action_ledger_unified`` rows and pairs each borrow with the
+supplies that follow it on another protocol, producing the query's output
+rows (``flow_id``, ``time_delta_seconds``, ``flow_speed_category``, ...):
+
+- same-transaction flows: every supply later in the borrow's transaction
+  with the same entity and asset;
+- cross-transaction flows: the first supply event of each other transaction
+  by the same entity and asset within the stitch window (default 2 minutes)
+  after the borrow.
+
+Instead of a range join, borrows and supplies are sorted by
+``(entity, asset, time)``. Each borrow's window is found with two binary
+searches (a vectorized two-pointer merge), so the cost is
+``O(n log n + matches)``.
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from scripts.loop_detector import to_micros
+
+ACTION_COLUMNS = [
+    "block_time",
+    "block_date",
+    "tx_hash",
+    "evt_index",
+    "protocol",
+    "action_type",
+    "entity_address",
+    "asset_address",
+    "asset_symbol",
+    "amount",
+    "amount_usd",
+]
+
+FLOW_COLUMNS = [
+    "flow_id",
+    "block_date",
+    "entity_address",
+    "source_protocol",
+    "dest_protocol",
+    "asset_address",
+    "asset_symbol",
+    "borrow_tx_hash",
+    "supply_tx_hash",
+    "borrow_time",
+    "supply_time",
+    "time_delta_seconds",
+    "is_same_tx",
+    "amount",
+    "amount_usd",
+    "flow_speed_category",
+]
+
+DEFAULT_WINDOW_SECONDS = 120
+
+# Borrow + supply rows stitched per pass; bounds the intermediate arrays.
+DEFAULT_PARTITION_ROWS = 2_000_000
+
+
+def speed_category(time_delta_seconds: np.ndarray, is_same_tx: np.ndarray) -> np.ndarray:
+    """The query's ``flow_speed_category`` CASE expression."""
+    return np.select(
+        [is_same_tx, time_delta_seconds <= 15, time_delta_seconds <= 60],
+        ["atomic", "near_instant", "fast"],
+        "delayed",
+    )
+
+
+def _codes(*columns: pd.Series) -> np.ndarray:
+    """Dense int64 codes of the row-wise combination of ``columns`` (-1 where any is null)."""
+    combined = np.zeros(len(columns[0]), dtype=np.int64)
+    nulls = np.zeros(len(combined), dtype=bool)
+    for column in columns:
+        codes, uniques = pd.factorize(column)
+        nulls |= codes < 0
+        # Re-densify after each column so the combined code cannot overflow.
+        combined = np.unique(combined * (len(uniques) + 1) + codes + 1, return_inverse=True)[1]
+    return np.where(nulls, -1, combined).astype(np.int64)
+
+
+def _search_keys(
+    b_code: np.ndarray,
+    b_value: np.ndarray,
+    s_code: np.ndarray,
+    s_value: np.ndarray,
+    s_tiebreak: np.ndarray,
+    span: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge keys ``code * span + value`` for a binary-searchable supply side.
+
+    Supplies are sorted by (code, value, tiebreak). Null-keyed supplies sort
+    first and null-keyed borrows get negative keys, so neither can match.
+
+    Returns:
+        Tuple of (borrow keys, sorted supply keys, supply sort order).
+    """
+    if (int(max(b_code.max(), s_code.max())) + 1) * span >= 2**62:
+        raise ValueError("Too many entity/asset groups for a single pass; split the input by date range")
+    order = np.lexsort((s_tiebreak, s_value, s_code))
+    s_keys = s_code[order] * span + s_value[order]
+    b_keys = np.where(b_code >= 0, b_code * span + b_value, -1)
+    return b_keys, s_keys, order
+
+
+def _expand(lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(left index, right index) pairs for every right row in ``[lo[i], hi[i])``."""
+    counts = np.maximum(hi - lo, 0)
+    left = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, np.repeat(lo, counts) + offsets
+
+
+def _flows(
+    b: pd.DataFrame,
+    s: pd.DataFrame,
+    bi: np.ndarray,
+    si: np.ndarray,
+    flow_id: np.ndarray,
+    delta: np.ndarray,
+    same_tx: bool,
+) -> pd.DataFrame:
+    borrow = b.iloc[bi].reset_index(drop=True)
+    supply = s.iloc[si].reset_index(drop=True)
+    is_same = np.full(len(bi), same_tx)
+    return pd.DataFrame(
+        {
+            "flow_id": flow_id,
+            "block_date": borrow["block_date"],
+            "entity_address": borrow["entity_address"],
+            "source_protocol": borrow["protocol"],
+            "dest_protocol": supply["protocol"],
+            "asset_address": borrow["asset_address"],
+            "asset_symbol": borrow["asset_symbol"],
+            "borrow_tx_hash": borrow["tx_hash"],
+            "supply_tx_hash": supply["tx_hash"],
+            "borrow_time": borrow["block_time"],
+            "supply_time": supply["block_time"],
+            "time_delta_seconds": delta.astype(np.int32),
+            "is_same_tx": is_same,
+            "amount": borrow["amount"],
+            "amount_usd": borrow["amount_usd"],
+            "flow_speed_category": speed_category(delta, is_same),
+        },
+        columns=FLOW_COLUMNS,
+    )
+
+
+def _join_ids(*parts: np.ndarray) -> np.ndarray:
+    out = parts[0].astype(str)
+    for part in parts[1:]:
+        out = np.char.add(np.char.add(out, "-"), part.astype(str))
+    return out.astype(object)
+
+
+def _stitch(borrows: pd.DataFrame, supplies: pd.DataFrame, window_seconds: int) -> list[pd.DataFrame]:
+    """Same-transaction and cross-transaction flows of one partition."""
+    nb = len(borrows)
+    both = pd.concat([borrows, supplies], ignore_index=True)
+    tx = _codes(both["tx_hash"])
+    entity_asset = _codes(both["entity_address"], both["asset_address"])
+    protocol = _codes(both["protocol"])
+    evt = both["evt_index"].to_numpy(dtype=np.int64)
+    us = to_micros(both["block_time"])
+    del both
+    b_tx, s_tx = tx[:nb], tx[nb:]
+    b_proto, s_proto = protocol[:nb], protocol[nb:]
+    b_evt, s_evt = evt[:nb], evt[nb:]
+    b_us, s_us = us[:nb], us[nb:]
+
+    # Same transaction: key (tx, entity, asset), later evt_index, other protocol.
+    code = _codes(pd.Series(tx), pd.Series(entity_asset))
+    code[(tx < 0) | (entity_asset < 0)] = -1
+    b_code, s_code = code[:nb], code[nb:]
+    evt_span = int(evt.max()) + 1
+    b_keys, s_keys, order = _search_keys(b_code, b_evt, s_code, s_evt, s_evt, evt_span)
+    lo = np.searchsorted(s_keys, b_keys, side="right")
+    hi = np.maximum(np.searchsorted(s_keys, (b_code + 1) * evt_span, side="left"), lo)
+    hi[b_code < 0] = lo[b_code < 0]
+    bi, pos = _expand(lo, hi)
+    si = order[pos]
+    keep = (s_proto[si] != b_proto[bi]) & (s_proto[si] >= 0) & (b_proto[bi] >= 0)
+    bi, si = bi[keep], si[keep]
+    b_hash = borrows["tx_hash"].to_numpy(dtype=object)
+    s_hash = supplies["tx_hash"].to_numpy(dtype=object)
+    same_tx = _flows(
+        borrows, supplies, bi, si,
+        _join_ids(b_hash[bi], b_evt[bi], s_evt[si]),
+        np.zeros(len(bi), dtype=np.int64),
+        same_tx=True,
+    )
+
+    # Cross transaction: key (entity, asset), supply in (borrow, borrow + window].
+    b_code, s_code = entity_asset[:nb], entity_asset[nb:]
+    t0 = int(us.min()) // 1000
+    b_ms, s_ms = b_us // 1000 - t0, s_us // 1000 - t0
+    window_ms = window_seconds * 1000
+    span = int(max(b_ms.max(), s_ms.max())) + window_ms + 1
+    # Ties on time are ordered by evt_index so the first supply per tx wins.
+    b_keys, s_keys, order = _search_keys(b_code, b_ms, s_code, s_ms, s_evt, span)
+    lo = np.searchsorted(s_keys, b_keys, side="left")
+    hi = np.searchsorted(s_keys, b_keys + window_ms, side="right")
+    hi[b_code < 0] = lo[b_code < 0]
+    del b_keys, s_keys
+    bi, pos = _expand(lo, hi)
+    si = order[pos]
+    # Millisecond keys bound the search; exact microsecond bounds filter it.
+    delta_us = s_us[si] - b_us[bi]
+    keep = (
+        (delta_us > 0)
+        & (delta_us <= window_seconds * 1_000_000)
+        & (s_tx[si] != b_tx[bi])
+        & (s_tx[si] >= 0)
+        & (b_tx[bi] >= 0)
+        & (s_proto[si] != b_proto[bi])
+        & (s_proto[si] >= 0)
+        & (b_proto[bi] >= 0)
+    )
+    bi, si, delta_us = bi[keep], si[keep], delta_us[keep]
+    # First supply event per (borrow, supply tx); candidates are already in
+    # (time, evt_index) order within each borrow.
+    pair = bi.astype(np.int64) * (int(s_tx.max()) + 1) + s_tx[si]
+    first = np.unique(pair, return_index=True)[1]
+    first.sort()
+    bi, si, delta_us = bi[first], si[first], delta_us[first]
+    cross_tx = _flows(
+        borrows, supplies, bi, si,
+        _join_ids(b_hash[bi], s_hash[si], s_evt[si]),
+        delta_us // 1_000_000,
+        same_tx=False,
+    )
+    return [same_tx, cross_tx]
+
+
+def stitch_flows(
+    actions: pd.DataFrame,
+    window_seconds: int = DEFAULT_WINDOW_SECONDS,
+    partition_rows: int = DEFAULT_PARTITION_ROWS,
+) -> pd.DataFrame:
+    """
+    Stitch borrow -> supply flows from action ledger rows.
+
+    Both joins stay within one (entity, asset), so large inputs are split
+    by a hash of that pair into partitions of about ``partition_rows``
+    borrows and supplies each. The result is the same for any partitioning;
+    only peak memory changes.
+
+    Args:
+        actions: ``lending_action_ledger_unified`` rows (at least ``ACTION_COLUMNS``).
+        window_seconds: Cross-transaction stitch window.
+        partition_rows: Target borrow + supply rows per partition.
+
+    Returns:
+        Flow rows with ``FLOW_COLUMNS``, same-transaction flows first
+        within each partition.
+
+    Raises:
+        ValueError: If columns are missing.
+    """
+    missing = [c for c in ACTION_COLUMNS if c not in actions.columns]
+    if missing:
+        raise ValueError(f"Action rows are missing columns: {missing}")
+    # Rows are selected per partition so the full input is never copied.
+    rows = (actions["entity_address"].notna() & actions["action_type"].isin(["borrow", "supply"])).to_numpy()
+    parts = -(-int(rows.sum()) // max(partition_rows, 1))
+    if parts > 1:
+        partition = _codes(actions["entity_address"], actions["asset_address"]) % parts
+    else:
+        partition, parts = np.zeros(len(actions), dtype=np.int64), 1
+
+    frames = []
+    for p in range(parts):
+        group = actions.loc[rows & (partition == p), ACTION_COLUMNS]
+        borrows = group[group["action_type"] == "borrow"].reset_index(drop=True)
+        supplies = group[group["action_type"] == "supply"].reset_index(drop=True)
+        if not (borrows.empty or supplies.empty):
+            frames.extend(_stitch(borrows, supplies, window_seconds))
+    if not frames:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+@dataclass
+class FlowComparison:
+    """Multiset comparison of stitched flows with a reference result."""
+
+    matched: int = 0
+    missing: list[tuple] = field(default_factory=list)
+    extra: list[tuple] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra)
+
+
+def hex_text(value: Any) -> str:
+    """Varbinary as Dune renders it (``0x...``); DuckDB returns it as bytes."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+        # Hashes stored as text and cast to VARBINARY come back as their ASCII bytes.
+        return raw.decode("ascii") if raw.startswith(b"0x") else "0x" + raw.hex()
+    return str(value)
+
+
+def _normalize(flows: pd.DataFrame) -> Counter:
+    """Comparable row tuples: timestamps as epoch micros, floats to 9 significant digits."""
+    columns = {
+        "flow_id": flows["flow_id"].astype(str),
+        "block_date": flows["block_date"].astype(str).str[:10],
+        "source_protocol": flows["source_protocol"].astype(str),
+        "dest_protocol": flows["dest_protocol"].astype(str),
+        "supply_tx_hash": flows["supply_tx_hash"].map(hex_text),
+        "borrow_time": to_micros(flows["borrow_time"]),
+        "supply_time": to_micros(flows["supply_time"]),
+        "time_delta_seconds": flows["time_delta_seconds"].astype(np.int64),
+        "is_same_tx": flows["is_same_tx"].astype(bool),
+        "amount_usd": [None if pd.isna(v) else float(f"{v:.9g}") for v in flows["amount_usd"]],
+        "flow_speed_category": flows["flow_speed_category"].astype(str),
+    }
+    return Counter(zip(*(list(v) for v in columns.values())))
+
+
+def compare_flows(local: pd.DataFrame, reference: pd.DataFrame) -> FlowComparison:
+    """
+    Compare flows as multisets of rows.
+
+    ``flow_id`` alone is not unique: two borrows in one transaction that
+    match the same supply share an id.
+    """
+    ours, theirs = _normalize(local), _normalize(reference)
+    return FlowComparison(
+        matched=sum((ours & theirs).values()),
+        missing=list((theirs - ours).elements()),
+        extra=list((ours - theirs).elements()),
+    )
+
+
+def _hex_ids(values: np.ndarray, width: int) -> pd.Series:
+    """``0x``-prefixed, zero-padded ids, formatted once per distinct value."""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    text = "0x" + pd.Series(uniques).astype("str").str.zfill(width)
+    return text.take(inverse).reset_index(drop=True)
+
+
+def synthetic_actions(
+    n: int,
+    entities: int | None = None,
+    days: int = 30,
+    seed: int = 0,
+    start: str | pd.Timestamp = "2025-01-01",
+) -> pd.DataFrame:
+    """Random ledger actions with bursts of borrow/supply activity per entity, starting at ``start``."""
+    rng = np.random.default_rng(seed)
+    entities = entities or max(n // 50, 1)
+    protocols = pd.Categorical(["aave_v3", "morpho_blue", "compound_v3", "compound_v2"])
+    assets = pd.Categorical(["0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48", "0xdac17f958d2ee523a2206206994597c13d831ec7"])
+    symbols = pd.Categorical(["USDC", "USDT"])
+    action_types = pd.Categorical(["borrow", "supply", "repay", "withdraw"])
+
+    # Actions arrive in bursts: a few per transaction, transactions seconds apart.
+    burst = rng.integers(0, days * 86_400, max(n // 4, 1))
+    seconds = np.repeat(burst, 4)[:n] + rng.integers(0, 90, n) * (rng.random(n) < 0.5)
+    tx = np.repeat(np.arange(len(burst)), 4)[:n] * 8 + rng.integers(0, 3, n)
+    block_time = pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s")
+    asset = rng.integers(0, len(assets), n)
+    amount = rng.lognormal(9, 2, n)
+    return pd.DataFrame(
+        {
+            "block_time": block_time,
+            "block_date": block_time.floor("D"),
+            "block_number": 21_000_000 + seconds // 12,
+            "tx_hash": _hex_ids(tx, 64),
+            # Unique within each transaction, in shuffled order.
+            "evt_index": np.arange(n) * 319 % 400,
+            "protocol": protocols.take(rng.integers(0, len(protocols), n)),
+            "action_type": action_types.take(rng.choice(4, n, p=[0.35, 0.45, 0.1, 0.1])),
+            "entity_address": _hex_ids(np.repeat(rng.integers(0, entities, len(burst)), 4)[:n], 40),
+            "asset_address": assets.take(asset),
+            "asset_symbol": symbols.take(asset),
+            "amount": amount,
+            "amount_usd": amount,
+        }
+    )
+
+
+def run_sql(actions: pd.DataFrame, sql: str) -> tuple[pd.DataFrame, float]:
+    """
+    Run ``lending_flow_stitching.sql`` over ``actions`` on the local DuckDB engine.
+
+    The query's ``previous.query.result`` is empty and ``CURRENT_DATE`` is
+    pinned after the last action, so the output covers every action.
+
+    Returns:
+        Tuple of (flows, seconds spent in the query).
+    """
+    import datetime
+    import tempfile
+
+    from scripts.incremental import OUTPUT_TABLE, IncrementalHarness
+    from scripts.local_engine import LocalEngine
+    from scripts.registry import get_registry
+
+    engine = LocalEngine(fixtures_dir=Path(tempfile.gettempdir()) / "flow_stitcher_no_fixtures")
+    ledger_id = get_registry().id_map["lending_action_ledger_unified"]
+    engine.register_table(f"query_{ledger_id}", actions)
+    last_day = pd.to_datetime(actions["block_date"]).max().date()
+    with tempfile.TemporaryDirectory() as tmp:
+        harness = IncrementalHarness(sql, Path(tmp) / "prev.parquet", engine)
+        start = time.perf_counter()
+        harness.run(last_day + datetime.timedelta(days=1))
+        elapsed = time.perf_counter() - start
+    return engine.con.execute(f'SELECT * FROM "{OUTPUT_TABLE}"').df(), elapsed
+
+
+def main() -> int:
+    """CLI entry point."""
+    from scripts.chain_templates import get_renderer, load_chain_config
+    from scripts.result_export import DEFAULT_DATA_DIR, load
+    from scripts.sweep import interval_seconds
+
+    parser = argparse.ArgumentParser(
+        description="Stitch lending flows locally from the exported action ledger",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.flow_stitcher --compare
+  python -m scripts.flow_stitcher --start 2025-01-01 --end 2025-03-31 --window 5m
+  python -m scripts.flow_stitcher --synthetic 2000000 --benchmark
+  python -m scripts.flow_stitcher --synthetic 10000000
+
+Actions are read from the Parquet export of lending_action_ledger_unified
+(python -m scripts.result_export export lending_action_ledger_unified).
+        """,
+    )
+    parser.add_argument(
+        "--chain",
+        default="ethereum",
+        help="Chain whose exported ledger to read (default: ethereum)",
+    )
+    parser.add_argument(
+        "--window",
+        help="Cross-tx stitch window, e.g. 2m (default: the chain's stitch_window)",
+    )
+    parser.add_argument("--start", help="First block_date to read (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last block_date to read (YYYY-MM-DD)")
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="N",
+        help="Use N generated actions instead of the export",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare with the exported lending_flow_stitching result",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Also run lending_flow_stitching.sql on DuckDB over the same actions and compare",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write the stitched flows to a Parquet file",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(DEFAULT_DATA_DIR),
+        help="Export data directory (default: .cache/data)",
+    )
+
+    args = parser.parse_args()
+    if args.compare and (args.start or args.end or args.synthetic):
+        print("Error: --compare needs the full exported ledger (drop --start/--end/--synthetic)")
+        return 1
+    try:
+        config = load_chain_config(args.chain)
+        if "lending_flow_stitching" not in config.get("templates", []):
+            raise ValueError(f"lending_flow_stitching is not rendered from the template for {args.chain}")
+        constants = config["constants"]
+        window = interval_seconds(args.window or constants["stitch_window"])
+        prefix = constants.get("query_prefix", "").lower()
+        if args.synthetic:
+            actions = synthetic_actions(args.synthetic)
+            source = f"{args.synthetic:,} synthetic actions"
+        else:
+            actions = load(
+                f"{prefix}lending_action_ledger_unified",
+                columns=ACTION_COLUMNS,
+                start=args.start,
+                end=args.end,
+                data_dir=Path(args.data_dir),
+            ).to_pandas()
+            source = f"{len(actions):,} actions from {prefix}lending_action_ledger_unified"
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{source} ({args.chain}), stitch window {window}s")
+    start = time.perf_counter()
+    flows = stitch_flows(actions, window)
+    elapsed = time.perf_counter() - start
+    counts = flows["flow_speed_category"].value_counts()
+    print(
+        f"  local: {len(flows):,} flows in {elapsed:.2f}s "
+        f"({len(actions) / elapsed if elapsed else 0:,.0f} actions/s): "
+        + ", ".join(f"{k} {counts.get(k, 0):,}" for k in ("atomic", "near_instant", "fast", "delayed"))
+    )
+    if args.output:
+        flows.to_parquet(args.output, index=False)
+
+    reference = None
+    if args.benchmark:
+        sql = get_renderer().render_chain(
+            {**config, "templates": ["lending_flow_stitching"]},
+            {"stitch_window": f"INTERVAL '{window}' SECOND"},
+        )["lending_flow_stitching"]
+        try:
+            reference, sql_seconds = run_sql(actions, sql)
+        except (RuntimeError, ImportError) as e:
+            print(f"Error: {e}")
+            return 1
+        print(f"  sql:   {len(reference):,} flows in {sql_seconds:.2f}s (DuckDB, {sql_seconds / elapsed if elapsed else 0:.1f}x local)")
+    elif args.compare:
+        try:
+            reference = load(f"{prefix}lending_flow_stitching", data_dir=Path(args.data_dir)).to_pandas()
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+    if reference is None:
+        return 0
+
+    comparison = compare_flows(flows, reference)
+    print(
+        f"\n{comparison.matched:,} rows identical, {len(comparison.missing):,} missing locally, "
+        f"{len(comparison.extra):,} extra locally"
+    )
+    for row in (comparison.missing + comparison.extra)[:10]:
+        print(f"  - {row}")
+    return 0 if comparison.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,472 @@
+"""
+Local harness for incremental (``previous.query.result``) queries.
+
+Incremental queries read their own last output through
+``TABLE(previous.query.result(schema => DESCRIPTOR(...)))``, recompute from a
+checkpoint with a 1-day lookback and union the result with the rows they
+keep. This module emulates that loop on the local DuckDB engine: each run's
+output is written to Parquet and fed back as the next run's ``prev``, and
+``CURRENT_DATE`` is pinned so a sequence of days can be replayed.
+
+Each run reports how many rows were carried over from ``prev`` versus
+recomputed, and how many of the recomputed rows actually changed.
+
+Upstream ``query_<id>`` tables missing from the fixtures are loaded from
+their Parquet export or materialized from their own SQL before the replay.
+
+Requires the optional ``local`` extra (``pip install -e .[local]``).
+"""
+
+import argparse
+import datetime
+import os
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from scripts.local_engine import DEFAULT_FIXTURES_DIR, LocalEngine
+from scripts.registry import REPO_ROOT, get_registry
+
+DEFAULT_STATE_DIR = REPO_ROOT / ".cache" / "incremental"
+
+PREV_TABLE = "__previous_result"
+OUTPUT_TABLE = "__incremental_output"
+
+_PREVIOUS_RESULT_START = re.compile(
+    r"TABLE\s*\(\s*previous\.query\.result\s*\(", re.IGNORECASE
+)
+_DESCRIPTOR_START = re.compile(r"DESCRIPTOR\s*\(", re.IGNORECASE)
+_CURRENT_DATE = re.compile(r"\bCURRENT_DATE\b", re.IGNORECASE)
+_NOW = re.compile(r"\b(?:NOW\s*\(\s*\)|CURRENT_TIMESTAMP)", re.IGNORECASE)
+_SELECT_KEYWORD = re.compile(r"\bSELECT\b", re.IGNORECASE)
+_LINE_COMMENT = re.compile(r"--[^\n]*")
+
+# Trino type names in DESCRIPTORs that DuckDB spells differently.
+_DUCKDB_TYPES = {
+    "VARBINARY": "BLOB",
+}
+
+
+def _matching_paren(sql: str, open_pos: int) -> int:
+    """Index of the parenthesis closing the one at ``open_pos``."""
+    depth = 0
+    for i in range(open_pos, len(sql)):
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in previous.query.result call")
+
+
+def _split_top_level(text: str) -> list[str]:
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _find_previous_result(sql: str) -> tuple[int, int, list[tuple[str, str]]] | None:
+    """Locate the previous.query.result table function and parse its DESCRIPTOR."""
+    match = _PREVIOUS_RESULT_START.search(sql)
+    if match is None:
+        return None
+    start = match.start()
+    end = _matching_paren(sql, sql.index("(", start))
+
+    call = sql[start:end + 1]
+    descriptor = _DESCRIPTOR_START.search(call)
+    if descriptor is None:
+        raise ValueError("previous.query.result call has no DESCRIPTOR schema")
+    open_pos = descriptor.end() - 1
+    body = call[open_pos + 1:_matching_paren(call, open_pos)]
+
+    schema = []
+    for column in _split_top_level(_LINE_COMMENT.sub("", body)):
+        name, _, col_type = column.partition(" ")
+        schema.append((name.strip().strip('"'), " ".join(col_type.split()).upper()))
+    return start, end + 1, schema
+
+
+def parse_descriptor(sql: str) -> list[tuple[str, str]]:
+    """
+    Column schema declared by a query's ``previous.query.result`` DESCRIPTOR.
+
+    Returns:
+        List of (column name, Trino type) pairs; empty if the query is not incremental.
+    """
+    found = _find_previous_result(sql)
+    return found[2] if found else []
+
+
+def rewrite_previous_result(sql: str, table: str = PREV_TABLE) -> str:
+    """Replace the previous.query.result table function with a plain table reference."""
+    found = _find_previous_result(sql)
+    if found is None:
+        return sql
+    start, end, _ = found
+    return f'{sql[:start]}"{table}"{sql[end:]}'
+
+
+def pin_current_date(sql: str, day: datetime.date) -> str:
+    """Replace ``CURRENT_DATE`` and ``NOW()`` with literals for a simulated day."""
+    sql = _CURRENT_DATE.sub(f"DATE '{day.isoformat()}'", sql)
+    return _NOW.sub(f"TIMESTAMP '{day.isoformat()} 00:00:00'", sql)
+
+
+def split_with_clause(sql: str) -> tuple[str, str]:
+    """
+    Split ``WITH ... SELECT ...`` into the CTE prefix and the final query body.
+
+    The body starts at the first ``SELECT`` outside any parentheses, which is
+    how the incremental queries in this repo are laid out.
+    """
+    depth = 0
+    pos = 0
+    masked = _mask_literals(sql)
+    while pos < len(masked):
+        ch = masked[pos]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and (m := _SELECT_KEYWORD.match(masked, pos)) and (pos == 0 or not masked[pos - 1].isalnum()):
+            return sql[:m.start()], sql[m.start():]
+        pos += 1
+    return sql, ""
+
+
+def _mask_literals(sql: str) -> str:
+    # Blank out strings and comments so their contents don't affect paren depth.
+    def blank(match: re.Match) -> str:
+        return " " * len(match.group(0))
+
+    return re.sub(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", blank, sql, flags=re.DOTALL)
+
+
+def _duckdb_type(trino_type: str) -> str:
+    return _DUCKDB_TYPES.get(trino_type, trino_type)
+
+
+@dataclass
+class IncrementalRun:
+    """Outcome of one simulated incremental refresh."""
+
+    day: datetime.date
+    rows_total: int
+    rows_kept: int
+    rows_recomputed: int
+    rows_changed: int
+    prev_rows: int
+    execution_time_ms: int
+    checkpoint: dict[str, Any] | None = None
+
+    @property
+    def rows_redundant(self) -> int:
+        """Recomputed rows that came out identical to what ``prev`` already had."""
+        return self.rows_recomputed - self.rows_changed
+
+
+class IncrementalHarness:
+    """
+    Replays an incremental query over simulated days on the local engine.
+
+    Args:
+        sql: Query SQL containing a ``previous.query.result`` DESCRIPTOR.
+        state_path: Parquet file holding the previous run's output.
+        engine: LocalEngine with the source fixtures loaded.
+    """
+
+    def __init__(self, sql: str, state_path: Path | str, engine: LocalEngine):
+        self.schema = parse_descriptor(sql)
+        if not self.schema:
+            raise ValueError("Query does not read previous.query.result")
+        # Wrapped in a subquery below, so drop the statement terminator.
+        self.sql = rewrite_previous_result(sql).strip().rstrip(";")
+        self.state_path = Path(state_path)
+        self.engine = engine
+
+    def reset(self) -> None:
+        """Forget the stored output so the next run starts from an empty ``prev``."""
+        self.state_path.unlink(missing_ok=True)
+
+    def _cast_columns(self) -> str:
+        return ", ".join(
+            f'CAST("{name}" AS {_duckdb_type(col_type)}) AS "{name}"'
+            for name, col_type in self.schema
+        )
+
+    def _load_prev(self) -> int:
+        con = self.engine.con
+        if self.state_path.exists():
+            literal = str(self.state_path).replace("'", "''")
+            con.execute(
+                f'CREATE OR REPLACE TABLE "{PREV_TABLE}" AS '
+                f"SELECT {self._cast_columns()} FROM read_parquet('{literal}')"
+            )
+        else:
+            columns = ", ".join(f'"{name}" {_duckdb_type(t)}' for name, t in self.schema)
+            con.execute(f'CREATE OR REPLACE TABLE "{PREV_TABLE}" ({columns})')
+        return con.execute(f'SELECT count(*) FROM "{PREV_TABLE}"').fetchone()[0]
+
+    def _scalar_row(self, sql: str) -> dict[str, Any] | None:
+        result = self.engine.execute_sql(sql)
+        if not result.success:
+            return None
+        return result.rows[0] if result.rows else None
+
+    def _save_output(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+        literal = str(tmp).replace("'", "''")
+        self.engine.con.execute(f"COPY \"{OUTPUT_TABLE}\" TO '{literal}' (FORMAT PARQUET)")
+        os.replace(tmp, self.state_path)
+
+    def run(self, day: datetime.date) -> IncrementalRun:
+        """
+        Execute one refresh as if it ran on ``day`` and store its output as ``prev``.
+
+        Raises:
+            RuntimeError: If the query fails locally.
+        """
+        start = datetime.datetime.now()
+        prev_rows = self._load_prev()
+        pinned = pin_current_date(self.sql, day)
+
+        try:
+            total = self.engine.materialize(
+                OUTPUT_TABLE, f"SELECT {self._cast_columns()} FROM ({pinned}) AS q"
+            )
+        except Exception as e:
+            raise RuntimeError(f"Incremental run for {day} failed: {e}") from e
+
+        ctes, _ = split_with_clause(pinned)
+        kept_row = self._scalar_row(f"{ctes} SELECT count(*) AS n FROM kept_old")
+        checkpoint = self._scalar_row(f"{ctes} SELECT * FROM checkpoint")
+        if kept_row is not None:
+            kept = kept_row["n"]
+        else:
+            # No kept_old CTE: count output rows carried over unchanged from prev.
+            kept = self._scalar_row(
+                f'SELECT count(*) AS n FROM (SELECT * FROM "{OUTPUT_TABLE}" '
+                f'INTERSECT ALL SELECT * FROM "{PREV_TABLE}")'
+            )["n"]
+        changed = self._scalar_row(
+            f'SELECT count(*) AS n FROM (SELECT * FROM "{OUTPUT_TABLE}" '
+            f'EXCEPT ALL SELECT * FROM "{PREV_TABLE}")'
+        )["n"]
+
+        self._save_output()
+        elapsed = datetime.datetime.now() - start
+        return IncrementalRun(
+            day=day,
+            rows_total=total,
+            rows_kept=kept,
+            rows_recomputed=total - kept,
+            rows_changed=changed,
+            prev_rows=prev_rows,
+            execution_time_ms=int(elapsed.total_seconds() * 1000),
+            checkpoint=checkpoint,
+        )
+
+    def replay(self, start: datetime.date, days: int) -> list[IncrementalRun]:
+        """Run one refresh per simulated day, starting at ``start``."""
+        return [self.run(start + datetime.timedelta(days=i)) for i in range(days)]
+
+
+def prepare_previous_result(engine: LocalEngine, sql: str, table: str, source: str | None = None) -> str:
+    """
+    Point a query's ``previous.query.result`` at engine table ``table``.
+
+    ``table`` is filled from the current contents of ``source``, or left
+    empty when there is no source (or it does not exist yet). Queries that
+    are not incremental are returned unchanged.
+    """
+    schema = parse_descriptor(sql)
+    if not schema:
+        return sql
+    casts = ", ".join(f'CAST("{col}" AS {_duckdb_type(t)}) AS "{col}"' for col, t in schema)
+    nulls = ", ".join(f'CAST(NULL AS {_duckdb_type(t)}) AS "{col}"' for col, t in schema)
+    if source is not None:
+        try:
+            engine.materialize(table, f'SELECT {casts} FROM "{source}"')
+            return rewrite_previous_result(sql, table)
+        except Exception:
+            pass  # First run: there is no earlier output to read.
+    engine.materialize(table, f"SELECT {nulls} WHERE false")
+    return rewrite_previous_result(sql, table)
+
+
+def materialize_refresh(engine: LocalEngine, name: str, sql: str) -> int:
+    """
+    Refresh a query into the engine table ``name``, as a Dune execution would.
+
+    An incremental query reads ``previous.query.result`` from the current
+    contents of ``name``, or from an empty result on the first refresh.
+
+    Returns:
+        Number of rows in the refreshed table.
+    """
+    sql = prepare_previous_result(engine, sql, f"{PREV_TABLE}_{name}", source=name)
+    return engine.materialize(name, sql.strip().rstrip(";"))
+
+
+def materialize_upstreams(engine: LocalEngine, sql: str, data_dir: Path | str | None = None) -> list[str]:
+    """
+    Make every ``query_<id>`` that ``sql`` reads available on the engine.
+
+    References already loaded (fixtures) are kept. Otherwise the upstream's
+    Parquet export is registered when there is one, or the upstream query is
+    materialized from its SQL after its own upstreams.
+
+    Returns:
+        Registry names of the upstreams registered or materialized, in order.
+
+    Raises:
+        RuntimeError: If a reference is unknown or an upstream fails locally.
+    """
+    from scripts.result_export import DEFAULT_DATA_DIR, register_exports
+    from scripts.sql_references import scan_sql
+
+    names_by_id = {query_id: name for name, query_id in get_registry().id_map.items()}
+    prepared: list[str] = []
+
+    def ensure(query_id: int, path: tuple[str, ...]) -> None:
+        table = f"query_{query_id}"
+        if table in engine.tables:
+            return
+        name = names_by_id.get(query_id)
+        if name is None:
+            raise RuntimeError(f"{table} is not a registry query and has no fixture")
+        if name in path:
+            raise RuntimeError(f"Dependency cycle through '{name}'")
+        if not register_exports(engine, [name], data_dir or DEFAULT_DATA_DIR):
+            upstream_sql = load_query_sql(name)
+            for ref in sorted(scan_sql(upstream_sql).ids):
+                ensure(ref, (*path, name))
+            try:
+                materialize_refresh(engine, table, upstream_sql)
+            except Exception as e:
+                raise RuntimeError(f"Materializing upstream '{name}' failed: {e}") from e
+        prepared.append(name)
+
+    for ref in sorted(scan_sql(sql).ids):
+        ensure(ref, ())
+    return prepared
+
+
+def load_query_sql(name: str) -> str:
+    """Read a registered query's SQL with ``query_<NAME_ID>`` placeholders resolved."""
+    from scripts.smoke_runner import substitute_query_ids
+
+    registry = get_registry()
+    query = registry.get(name)
+    if query is None:
+        raise ValueError(f"Query '{name}' not found in registry")
+    with open(REPO_ROOT / query["file"]) as f:
+        return substitute_query_ids(f.read(), registry)
+
+
+def print_runs(runs: list[IncrementalRun]) -> None:
+    """Print a per-run summary table."""
+    headers = ["Day", "Prev", "Output", "Kept", "Recomputed", "Changed", "Redundant", "Time"]
+    widths = [10, 8, 8, 8, 10, 8, 9, 8]
+    header_row = " | ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(header_row)
+    print("-" * len(header_row))
+    for run in runs:
+        row = [
+            run.day.isoformat(),
+            str(run.prev_rows),
+            str(run.rows_total),
+            str(run.rows_kept),
+            str(run.rows_recomputed),
+            str(run.rows_changed),
+            str(run.rows_redundant),
+            f"{run.execution_time_ms / 1000:.2f}s",
+        ]
+        print(" | ".join(val.ljust(w) for val, w in zip(row, widths)))
+
+    if runs:
+        recomputed = sum(r.rows_recomputed for r in runs)
+        redundant = sum(r.rows_redundant for r in runs)
+        print(f"\nRecomputed {recomputed} rows over {len(runs)} runs ({redundant} unchanged)")
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Replay an incremental query locally over simulated days",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.incremental bitcoin_tx_features_daily --start 2026-01-03 --days 5
+  python -m scripts.incremental lending_flow_stitching --start 2026-10-12 --days 3 --reset
+        """,
+    )
+    parser.add_argument("name", help="Query name in registry")
+    parser.add_argument(
+        "--start",
+        type=datetime.date.fromisoformat,
+        default=datetime.date.today(),
+        help="First simulated CURRENT_DATE (default: today)",
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=1,
+        help="Number of consecutive days to replay (default: 1)",
+    )
+    parser.add_argument(
+        "--fixtures",
+        help="Fixture directory for the local engine (default: tests/fixtures)",
+    )
+    parser.add_argument(
+        "--state-dir",
+        help="Where each query's previous output is kept (default: .cache/incremental)",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Discard stored output and start from an empty previous result",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        sql = load_query_sql(args.name)
+        state_dir = Path(args.state_dir) if args.state_dir else DEFAULT_STATE_DIR
+        engine = LocalEngine(args.fixtures or DEFAULT_FIXTURES_DIR)
+        harness = IncrementalHarness(sql, state_dir / f"{args.name}.parquet", engine)
+        materialize_upstreams(engine, sql)
+    except (ValueError, ImportError, RuntimeError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    if args.reset:
+        harness.reset()
+
+    print(f"\nReplaying {args.name} for {args.days} day(s) from {args.start}")
+    try:
+        runs = harness.replay(args.start, args.days)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    print_runs(runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
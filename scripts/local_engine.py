@@ -0,0 +1,284 @@
+"""
+Local DuckDB execution engine for smoke tests.
+
+Runs Dune (Trino-dialect) SQL against fixture tables stored as Parquet, so
+smoke tests can be iterated on offline without spending API credits.
+
+Fixtures are discovered under a directory laid out as::
+
+    <fixtures>/<schema>/<table>.parquet   ->  <schema>.<table>
+    <fixtures>/query_<id>.parquet         ->  query_<id>
+
+A ``fixtures.json`` manifest with an ``as_of`` date pins ``CURRENT_DATE`` to
+the day the fixtures were generated for, so the committed snapshot under
+``tests/fixtures`` (``python -m scripts.fixtures``) keeps matching the
+smoke tests' relative date windows.
+
+Known divergence: Trino divides by a decimal literal in decimal arithmetic,
+so ``(block_height - spent_block_height) / 144.0`` is rounded half up to one
+decimal place and ``AVG`` over it stays a one-decimal decimal. DuckDB
+evaluates the same expression in double precision, so values derived from
+it (``avg_days_held`` and the ``human_factor_score`` thresholds built on it)
+can differ from Dune on a share of rows. ``scripts.tx_features`` reproduces
+the Trino semantics when exact parity is needed.
+
+Requires the optional ``local`` extra (``pip install -e .[local]``).
+"""
+
+import datetime
+import decimal
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Any
+
+from scripts.dune_client import ExecutionResult, ExecutionTiming
+from scripts.registry import REPO_ROOT
+
+DEFAULT_FIXTURES_DIR = REPO_ROOT / "tests" / "fixtures"
+FIXTURES_MANIFEST = "fixtures.json"
+
+# Strings, quoted identifiers and comments are copied through untouched.
+# INTERVAL literals are matched first so their quoted amount stays with the
+# surrounding code and is rewritten by ``_translate_code``.
+_SKIP_PATTERN = re.compile(
+    r"""
+    (?P<interval>\bINTERVAL\s+'\d+'\s+[A-Z]+\b)  # interval literal (translated)
+    | '(?:[^']|'')*'        # string literal
+    | "(?:[^"]|"")*"        # quoted identifier
+    | --[^\n]*              # line comment
+    | /\*.*?\*/             # block comment
+    """,
+    re.VERBOSE | re.DOTALL | re.IGNORECASE,
+)
+
+_INTERVAL_PATTERN = re.compile(
+    r"\bINTERVAL\s+'(\d+)'\s+(SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|YEAR)\b",
+    re.IGNORECASE,
+)
+
+# Trino varbinary literal (0xabcd...). DuckDB would parse "0xab" as "0 AS xab".
+_HEX_LITERAL = re.compile(r"\b0x([0-9a-fA-F]+)\b")
+
+_CURRENT_DATE = re.compile(r"\bCURRENT_DATE\b", re.IGNORECASE)
+
+_FUNCTION_RENAMES = [
+    (re.compile(r"\bjson_extract_scalar\s*\(", re.IGNORECASE), "json_extract_string("),
+    (re.compile(r"\bfrom_hex\s*\(", re.IGNORECASE), "unhex("),
+    (re.compile(r"\bto_hex\s*\(", re.IGNORECASE), "hex("),
+    (re.compile(r"\bapprox_percentile\s*\(", re.IGNORECASE), "approx_quantile("),
+]
+
+
+def _translate_code(code: str, as_of: datetime.date | None = None) -> str:
+    code = _INTERVAL_PATTERN.sub(lambda m: f"INTERVAL {m.group(1)} {m.group(2).upper()}", code)
+    code = _HEX_LITERAL.sub(lambda m: f"unhex('{m.group(1)}')", code)
+    for pattern, replacement in _FUNCTION_RENAMES:
+        code = pattern.sub(replacement, code)
+    if as_of is not None:
+        code = _CURRENT_DATE.sub(f"DATE '{as_of.isoformat()}'", code)
+    return code
+
+
+def translate_trino(sql: str, as_of: datetime.date | None = None) -> str:
+    """
+    Rewrite the Trino constructs used by this repo's queries into DuckDB SQL.
+
+    Handles varbinary literals, ``from_hex``/``to_hex``,
+    ``json_extract_scalar``, ``approx_percentile`` and ``INTERVAL 'n' UNIT``.
+    ``DATE_TRUNC``, ``date_diff``, ``CURRENT_DATE`` and ``VARBINARY`` casts are
+    already DuckDB-compatible and pass through unchanged, unless ``as_of`` is
+    given, in which case ``CURRENT_DATE`` becomes that date.
+    """
+    out = []
+    pos = 0
+    for match in _SKIP_PATTERN.finditer(sql):
+        if match.group("interval"):
+            continue
+        out.append(_translate_code(sql[pos:match.start()], as_of))
+        out.append(match.group(0))
+        pos = match.end()
+    out.append(_translate_code(sql[pos:], as_of))
+    return "".join(out)
+
+
+def _to_dune_value(value: Any) -> Any:
+    """Normalize a DuckDB value to the JSON shape returned by the Dune API."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + " UTC"
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, list):
+        return [_to_dune_value(v) for v in value]
+    return value
+
+
+def fixtures_as_of(directory: Path) -> datetime.date | None:
+    """Read the ``as_of`` date from a fixture directory's manifest, if any."""
+    path = Path(directory) / FIXTURES_MANIFEST
+    if not path.exists():
+        return None
+    with open(path) as f:
+        as_of = json.load(f).get("as_of")
+    return datetime.date.fromisoformat(as_of) if as_of else None
+
+
+def _import_duckdb() -> Any:
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError(
+            "The local engine requires duckdb. Install it with: pip install -e .[local]"
+        ) from e
+    return duckdb
+
+
+class LocalEngine:
+    """
+    DuckDB-backed stand-in for ``dune_client.execute_sql``.
+
+    Args:
+        fixtures_dir: Directory of Parquet fixture tables.
+        database: DuckDB database path (in-memory by default).
+        as_of: Date to evaluate ``CURRENT_DATE`` as. Defaults to the ``as_of``
+            of the fixtures manifest, or the real current date without one.
+    """
+
+    def __init__(
+        self,
+        fixtures_dir: Path | str = DEFAULT_FIXTURES_DIR,
+        database: str = ":memory:",
+        as_of: datetime.date | None = None,
+    ):
+        duckdb = _import_duckdb()
+        self.fixtures_dir = Path(fixtures_dir)
+        self.con = duckdb.connect(database)
+        # Trino divides integers as integers; DuckDB defaults to float division.
+        self.con.execute("SET integer_division = true")
+        self.con.execute("SET TimeZone = 'UTC'")
+        self._lock = threading.Lock()
+        self.tables = self.load_fixtures(self.fixtures_dir)
+        self.as_of = as_of or fixtures_as_of(self.fixtures_dir)
+
+    def load_fixtures(self, directory: Path) -> list[str]:
+        """Register every Parquet fixture under ``directory`` as a view."""
+        tables = []
+        if not directory.exists():
+            return tables
+        for path in sorted(directory.rglob("*.parquet")):
+            rel = path.relative_to(directory)
+            if len(rel.parts) == 1:
+                name = f'"{path.stem}"'
+            else:
+                schema = rel.parts[0]
+                self.con.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+                name = f'"{schema}"."{path.stem}"'
+            literal = str(path).replace("'", "''")
+            self.con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{literal}')")
+            tables.append(name.replace('"', ""))
+        return tables
+
+    def register_table(self, name: str, data: Any) -> None:
+        """Register an in-memory table (pandas DataFrame or Arrow table) as ``name``."""
+        schema, _, table = name.rpartition(".")
+        alias = "_fixture_" + re.sub(r"\W", "_", name)
+        target = f'"{schema}"."{table}"' if schema else f'"{table}"'
+        with self._lock:
+            if schema:
+                self.con.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+            self.con.register(alias, data)
+            self.con.execute(f"CREATE OR REPLACE TABLE {target} AS SELECT * FROM {alias}")
+            self.con.unregister(alias)
+
+    def register_parquet(self, name: str, pattern: Path | str) -> None:
+        """Register a view ``name`` over Hive-partitioned Parquet files matching ``pattern``."""
+        literal = str(pattern).replace("'", "''")
+        with self._lock:
+            self.con.execute(
+                f'CREATE OR REPLACE VIEW "{name}" AS '
+                f"SELECT * FROM read_parquet('{literal}', hive_partitioning = true, union_by_name = true)"
+            )
+            self.tables.append(name)
+
+    def materialize(self, name: str, sql: str) -> int:
+        """
+        Execute Trino-dialect SQL and keep its typed output as table ``name``.
+
+        Unlike ``execute_sql`` the rows stay inside DuckDB with their native
+        types, so they can be queried further or written to Parquet.
+
+        Returns:
+            Number of rows in the new table.
+        """
+        translated = translate_trino(sql, self.as_of)
+        with self._lock:
+            self.con.execute(f'CREATE OR REPLACE TABLE "{name}" AS {translated}')
+            if name not in self.tables:
+                self.tables.append(name)
+            return self.con.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+
+    def execute_sql(
+        self,
+        sql: str,
+        params: dict[str, Any] | None = None,
+        timeout_seconds: int = 300,
+        **_: Any,
+    ) -> ExecutionResult:
+        """
+        Execute Trino-dialect SQL locally and return an ExecutionResult.
+
+        ``params`` are substituted into ``{{name}}`` placeholders as on Dune.
+        """
+        timing = ExecutionTiming()
+        timing.begin()
+        try:
+            for key, value in (params or {}).items():
+                sql = sql.replace(f"{{{{{key}}}}}", str(value))
+            translated = translate_trino(sql, self.as_of)
+            timing.submit_ms = timing.elapsed_ms()
+            with self._lock:
+                # Waiting on the shared connection is this engine's queue.
+                timing.queue_ms = timing.elapsed_ms() - timing.submit_ms
+                cursor = self.con.cursor()
+                try:
+                    cursor.execute(translated)
+                    columns = [d[0] for d in cursor.description or []]
+                    records = cursor.fetchall()
+                finally:
+                    cursor.close()
+            timing.engine_ms = timing.elapsed_ms() - timing.submit_ms - timing.queue_ms
+            timing.wait_ms = timing.queue_ms + timing.engine_ms
+            rows = [
+                {col: _to_dune_value(val) for col, val in zip(columns, record)}
+                for record in records
+            ]
+            timing.fetch_ms = timing.elapsed_ms() - timing.submit_ms - timing.wait_ms
+            return ExecutionResult(
+                success=True,
+                execution_id=None,
+                state="QUERY_STATE_COMPLETED",
+                rows=rows,
+                columns=columns,
+                row_count=len(rows),
+                execution_time_ms=timing.finish(),
+                timing=timing,
+            )
+        except Exception as e:
+            return ExecutionResult(
+                success=False,
+                execution_id=None,
+                state="QUERY_STATE_FAILED",
+                rows=[],
+                columns=[],
+                row_count=0,
+                error=str(e),
+                execution_time_ms=timing.finish(),
+                timing=timing,
+            )
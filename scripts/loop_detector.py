@@ -0,0 +1,468 @@
+"""
+Incremental lending loop detection over flow-stitching rows.
+
+A local counterpart of ``lending_loop_detection.sql``. Flows are chained per
+entity in ``(borrow_time, flow_id)`` order. A flow continues the entity's
+previous flow when its ``source_protocol`` equals the previous
+``dest_protocol`` and it was borrowed within the continuation window of the
+previous borrow. Each chain becomes one loop row with the query's output
+columns.
+
+``LoopDetector`` consumes flows in time-ordered batches (e.g. one exported
+day at a time). It keeps only each entity's open chain in its state and
+emits a loop once the chain can no longer be continued, so a year of flows
+can be replayed with different windows without recomputing whole windows.
+Within a batch, continuation and per-chain sums are computed with NumPy.
+Only chain boundaries are handled in Python.
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+FLOW_COLUMNS = [
+    "flow_id",
+    "block_date",
+    "entity_address",
+    "source_protocol",
+    "dest_protocol",
+    "borrow_tx_hash",
+    "borrow_time",
+    "amount_usd",
+]
+
+LOOP_COLUMNS = [
+    "loop_id",
+    "entity_address",
+    "start_date",
+    "end_date",
+    "protocols_involved",
+    "hop_count",
+    "recursion_depth",
+    "root_tx_hash",
+    "gross_borrowed_usd",
+    "loop_status",
+]
+
+DEFAULT_WINDOW_SECONDS = 3600
+
+
+def loop_status(hop_count: int) -> str:
+    """Classification used by the query's ``loop_status`` column."""
+    if hop_count >= 3:
+        return "deep_loop"
+    if hop_count == 2:
+        return "standard_loop"
+    return "single_hop"
+
+
+def to_micros(values: pd.Series) -> np.ndarray:
+    """Epoch microseconds of timestamps given as datetimes or Dune timestamp strings."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values.astype(str).str.removesuffix(" UTC"), utc=True, format="ISO8601")
+    elif values.dt.tz is None:
+        values = values.dt.tz_localize("UTC")
+    return values.dt.tz_convert("UTC").astype("datetime64[us, UTC]").astype(np.int64).to_numpy()
+
+
+def _prepare(flows: pd.DataFrame) -> pd.DataFrame:
+    missing = [c for c in FLOW_COLUMNS if c not in flows.columns]
+    if missing:
+        raise ValueError(f"Flow rows are missing columns: {missing}")
+    batch = flows[FLOW_COLUMNS].copy()
+    batch["_t"] = to_micros(batch["borrow_time"])
+    return batch.sort_values(["entity_address", "_t", "flow_id"], kind="stable", ignore_index=True)
+
+
+class _OpenChain:
+    """A chain that may still be continued by the entity's next flow."""
+
+    __slots__ = ("loop_id", "root_tx_hash", "start_date", "path", "hops", "gross", "last_dest", "last_time")
+
+    def __init__(self, loop_id: Any, root_tx_hash: Any, start_date: Any, path: list[Any], hops: int, gross: float):
+        self.loop_id = loop_id
+        self.root_tx_hash = root_tx_hash
+        self.start_date = start_date
+        self.path = path
+        self.hops = hops
+        self.gross = gross
+        self.last_dest: Any = None
+        self.last_time = 0
+
+    def row(self, entity: Any) -> tuple:
+        return (
+            self.loop_id,
+            entity,
+            self.start_date,
+            None,
+            self.path,
+            self.hops,
+            self.hops,
+            self.root_tx_hash,
+            float(self.gross),
+            loop_status(self.hops),
+        )
+
+
+class LoopDetector:
+    """
+    Incremental loop detector.
+
+    Batches passed to ``update`` must not overlap in time: every flow in a
+    batch is borrowed at or after the latest flow of the previous batch.
+    Daily partitions of ``lending_flow_stitching`` satisfy this.
+
+    Args:
+        window_seconds: Maximum time between consecutive borrows of a chain.
+    """
+
+    def __init__(self, window_seconds: int = DEFAULT_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.window_us = window_seconds * 1_000_000
+        self.open: dict[Any, _OpenChain] = {}
+        self.watermark: int | None = None
+        self.flows_seen = 0
+        self.loops_emitted = 0
+        self.peak_open = 0
+
+    @property
+    def state_size(self) -> int:
+        """Number of entities with a chain that can still be continued."""
+        return len(self.open)
+
+    def update(self, flows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Consume one batch of flows.
+
+        Returns:
+            Loops closed by this batch: chains followed by a new chain of the
+            same entity, or chains whose continuation window ended before
+            the batch's latest borrow.
+
+        Raises:
+            ValueError: If columns are missing or the batch starts before the
+                previous one ended.
+        """
+        batch = _prepare(flows)
+        n = len(batch)
+        if n == 0:
+            return _frame([])
+        t = batch["_t"].to_numpy()
+        if self.watermark is not None and t.min() < self.watermark:
+            raise ValueError("Flow batch starts before the end of the previous batch; batches must be time-ordered")
+
+        entity = batch["entity_address"].to_numpy(dtype=object)
+        src = batch["source_protocol"].to_numpy(dtype=object)
+        dst = batch["dest_protocol"].to_numpy(dtype=object)
+        flow_id = batch["flow_id"].to_numpy(dtype=object)
+        tx_hash = batch["borrow_tx_hash"].to_numpy(dtype=object)
+        block_date = batch["block_date"].to_numpy(dtype=object)
+        amount = pd.to_numeric(batch["amount_usd"]).fillna(0.0).to_numpy(dtype=np.float64)
+
+        entity_start = np.ones(n, dtype=bool)
+        entity_start[1:] = entity[1:] != entity[:-1]
+        # SQL compares with NULL as unknown, so a NULL protocol never chains.
+        src_ok = pd.notna(src)
+        dst_ok = pd.notna(dst)
+        cont = np.zeros(n, dtype=bool)
+        cont[1:] = (
+            ~entity_start[1:]
+            & src_ok[1:]
+            & dst_ok[:-1]
+            & (src[1:] == dst[:-1])
+            & (t[1:] <= t[:-1] + self.window_us)
+        )
+
+        closed: list[tuple] = []
+        # The first flow of each entity may continue the chain carried over.
+        for i in np.flatnonzero(entity_start):
+            chain = self.open.get(entity[i])
+            if chain is None:
+                continue
+            if src_ok[i] and chain.last_dest is not None and src[i] == chain.last_dest and t[i] <= chain.last_time + self.window_us:
+                cont[i] = True
+            else:
+                closed.append(self.open.pop(entity[i]).row(entity[i]))
+
+        starts = np.flatnonzero(entity_start | ~cont)
+        ends = np.append(starts[1:], n)
+        hops = ends - starts
+        gross = np.add.reduceat(amount, starts)
+        carried = cont[starts]
+        # The entity's last segment stays open; every earlier one is complete.
+        last = np.append(entity_start[ends[:-1]], True)
+        dst_list = dst.tolist()
+
+        for k in np.flatnonzero(carried | last).tolist():
+            start, end, key = int(starts[k]), int(ends[k]), entity[starts[k]]
+            if carried[k]:
+                chain = self.open[key]
+                chain.path.extend(dst_list[start:end])
+                chain.hops += end - start
+                chain.gross += gross[k]
+            else:
+                chain = _OpenChain(
+                    flow_id[start],
+                    tx_hash[start],
+                    block_date[start],
+                    [src[start], *dst_list[start:end]],
+                    end - start,
+                    gross[k],
+                )
+                self.open[key] = chain
+            chain.last_dest = dst[end - 1] if dst_ok[end - 1] else None
+            chain.last_time = int(t[end - 1])
+            if not last[k]:
+                closed.append(self.open.pop(key).row(key))
+
+        done = np.flatnonzero(~carried & ~last)
+        s, e = starts[done], ends[done]
+        complete = {
+            "loop_id": flow_id[s],
+            "entity_address": entity[s],
+            "start_date": block_date[s],
+            "end_date": None,
+            "protocols_involved": [[src[i], *dst_list[i:j]] for i, j in zip(s.tolist(), e.tolist())],
+            "hop_count": hops[done],
+            "recursion_depth": hops[done],
+            "root_tx_hash": tx_hash[s],
+            "gross_borrowed_usd": gross[done],
+            "loop_status": np.select([hops[done] >= 3, hops[done] == 2], ["deep_loop", "standard_loop"], "single_hop"),
+        }
+
+        self.watermark = int(t.max())
+        self.flows_seen += n
+        self.peak_open = max(self.peak_open, len(self.open))
+        expired = [key for key, chain in self.open.items() if chain.last_time + self.window_us < self.watermark]
+        for key in expired:
+            closed.append(self.open.pop(key).row(key))
+        self.loops_emitted += len(closed) + len(done)
+        return pd.concat([_frame(closed), pd.DataFrame(complete, columns=LOOP_COLUMNS)], ignore_index=True)
+
+    def close(self) -> pd.DataFrame:
+        """Emit every open chain (end of input) and reset the state."""
+        rows = [chain.row(key) for key, chain in self.open.items()]
+        self.open.clear()
+        self.loops_emitted += len(rows)
+        return _frame(rows)
+
+
+def _frame(rows: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame.from_records(rows, columns=LOOP_COLUMNS)
+
+
+def detect_loops(flows: pd.DataFrame, window_seconds: int = DEFAULT_WINDOW_SECONDS) -> pd.DataFrame:
+    """Detect all loops in ``flows``, fed to a ``LoopDetector`` one ``block_date`` at a time."""
+    detector = LoopDetector(window_seconds)
+    if flows.empty:
+        return detector.close()
+    days = pd.Series(to_micros(flows["borrow_time"]) // 86_400_000_000, index=flows.index)
+    parts = [detector.update(batch) for _, batch in flows.groupby(days, sort=True)]
+    parts.append(detector.close())
+    return pd.concat(parts, ignore_index=True)
+
+
+@dataclass
+class LoopComparison:
+    """Multiset comparison of locally detected loops with a reference result."""
+
+    matched: int = 0
+    missing: list[Any] = field(default_factory=list)
+    extra: list[Any] = field(default_factory=list)
+    mismatches: list[tuple[Any, str, Any, Any]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra or self.mismatches)
+
+
+def _as_list(value: Any) -> list[Any]:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return list(value)
+
+
+LOOP_KEY = ["loop_id", "entity_address", "root_tx_hash", "hop_count"]
+
+
+def _keyed(loops: pd.DataFrame) -> pd.DataFrame:
+    """Loops indexed by ``LOOP_KEY`` plus an occurrence number among equal keys."""
+    from scripts.flow_stitcher import hex_text
+
+    keyed = loops.assign(
+        **{column: loops[column].map(hex_text) for column in LOOP_KEY[:3]},
+        hop_count=loops["hop_count"].astype(np.int64),
+    )
+    # Pair duplicate keys in a fixed order so the pairing does not depend on row order.
+    keyed = keyed.sort_values("gross_borrowed_usd", kind="stable")
+    keyed["_occurrence"] = keyed.groupby(LOOP_KEY, sort=False).cumcount()
+    return keyed
+
+
+def compare_loops(local: pd.DataFrame, reference: pd.DataFrame, rel_tol: float = 1e-6) -> LoopComparison:
+    """
+    Compare loops as multisets keyed by ``LOOP_KEY``.
+
+    ``loop_id`` alone is not unique: it is the root flow's id, which two
+    borrows in one transaction can share. Rows with equal keys are paired
+    one to one, so a duplicate on one side only is reported as missing or
+    extra. ``loop_status`` and ``protocols_involved`` must match exactly.
+    ``gross_borrowed_usd`` must match within ``rel_tol``.
+    """
+    on = [*LOOP_KEY, "_occurrence"]
+    merged = _keyed(local).merge(
+        _keyed(reference), on=on, how="outer", suffixes=("_local", "_ref"), indicator=True
+    )
+    comparison = LoopComparison(
+        missing=list(merged.loc[merged["_merge"] == "right_only", LOOP_KEY].itertuples(index=False, name=None)),
+        extra=list(merged.loc[merged["_merge"] == "left_only", LOOP_KEY].itertuples(index=False, name=None)),
+    )
+    both = merged[merged["_merge"] == "both"]
+    comparison.matched = len(both)
+    for row in both.itertuples(index=False):
+        row = row._asdict()
+        if row["loop_status_local"] != row["loop_status_ref"]:
+            comparison.mismatches.append((row["loop_id"], "loop_status", row["loop_status_local"], row["loop_status_ref"]))
+        local_usd, ref_usd = row["gross_borrowed_usd_local"], row["gross_borrowed_usd_ref"]
+        if not np.isclose(local_usd, ref_usd or 0.0, rtol=rel_tol, atol=0.0):
+            comparison.mismatches.append((row["loop_id"], "gross_borrowed_usd", local_usd, ref_usd))
+        if "protocols_involved_ref" in row:
+            local_path = _as_list(row["protocols_involved_local"])
+            ref_path = _as_list(row["protocols_involved_ref"])
+            if local_path != ref_path:
+                comparison.mismatches.append((row["loop_id"], "protocols_involved", local_path, ref_path))
+    return comparison
+
+
+def summarize(loops: pd.DataFrame) -> dict[str, Any]:
+    """Loop counts by status, mean hops and gross borrowed USD."""
+    counts = loops["loop_status"].value_counts()
+    return {
+        "loops": len(loops),
+        "deep_loop": int(counts.get("deep_loop", 0)),
+        "standard_loop": int(counts.get("standard_loop", 0)),
+        "single_hop": int(counts.get("single_hop", 0)),
+        "mean_hops": float(loops["hop_count"].mean()) if len(loops) else 0.0,
+        "gross_borrowed_usd": float(loops["gross_borrowed_usd"].sum()),
+    }
+
+
+def main() -> int:
+    """CLI entry point."""
+    from scripts.chain_templates import load_chain_config
+    from scripts.result_export import DEFAULT_DATA_DIR, load
+    from scripts.sweep import interval_seconds
+
+    parser = argparse.ArgumentParser(
+        description="Backtest lending loop detection over exported flow-stitching results",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.loop_detector
+  python -m scripts.loop_detector --window 30m --window 1h --window 2h --start 2025-01-01
+  python -m scripts.loop_detector --chain base --compare
+
+Flows are read from the Parquet export of <prefix>lending_flow_stitching
+(python -m scripts.result_export export lending_flow_stitching).
+        """,
+    )
+    parser.add_argument(
+        "--chain",
+        default="ethereum",
+        help="Chain whose exported flows to read (default: ethereum)",
+    )
+    parser.add_argument(
+        "--window",
+        action="append",
+        help="Continuation window, e.g. 30m, 1h (repeatable; default: the chain's loop_continuation_window)",
+    )
+    parser.add_argument("--start", help="First block_date to read (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last block_date to read (YYYY-MM-DD)")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare the chain's own window against the exported lending_loop_detection result",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(DEFAULT_DATA_DIR),
+        help="Export data directory (default: .cache/data)",
+    )
+
+    args = parser.parse_args()
+    if args.compare and (args.start or args.end):
+        # Chains crossing the range edges would be cut short locally.
+        print("Error: --compare needs the full exported range (drop --start/--end)")
+        return 1
+    try:
+        constants = load_chain_config(args.chain)["constants"]
+        baseline = interval_seconds(constants["loop_continuation_window"])
+        windows = [interval_seconds(w) for w in args.window] if args.window else [baseline]
+        # Registry names carry the lower-cased placeholder prefix (BASE_ -> base_).
+        prefix = constants.get("query_prefix", "").lower()
+        flows = load(
+            f"{prefix}lending_flow_stitching",
+            columns=FLOW_COLUMNS,
+            start=args.start,
+            end=args.end,
+            data_dir=Path(args.data_dir),
+        ).to_pandas()
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"{len(flows):,} flows from {prefix}lending_flow_stitching ({args.chain})\n")
+    headers = ["Window", "Loops", "Deep", "Standard", "Single", "Mean hops", "Gross USD", "Seconds"]
+    widths = [8, 10, 8, 9, 10, 9, 18, 8]
+    header_row = " | ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(header_row)
+    print("-" * len(header_row))
+    baseline_loops = None
+    for window in windows:
+        start = time.perf_counter()
+        loops = detect_loops(flows, window)
+        elapsed = time.perf_counter() - start
+        if window == baseline:
+            baseline_loops = loops
+        stats = summarize(loops)
+        marker = "*" if window == baseline else ""
+        values = [
+            f"{window // 60}m{marker}",
+            f"{stats['loops']:,}",
+            f"{stats['deep_loop']:,}",
+            f"{stats['standard_loop']:,}",
+            f"{stats['single_hop']:,}",
+            f"{stats['mean_hops']:.2f}",
+            f"{stats['gross_borrowed_usd']:,.0f}",
+            f"{elapsed:.2f}",
+        ]
+        print(" | ".join(v.ljust(w) for v, w in zip(values, widths)))
+
+    if not args.compare:
+        return 0
+    if baseline_loops is None:
+        baseline_loops = detect_loops(flows, baseline)
+    try:
+        reference = load(f"{prefix}lending_loop_detection", data_dir=Path(args.data_dir)).to_pandas()
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    comparison = compare_loops(baseline_loops, reference)
+    print(
+        f"\nCompared with {prefix}lending_loop_detection: {comparison.matched:,} matched, "
+        f"{len(comparison.missing):,} missing, {len(comparison.extra):,} extra, "
+        f"{len(comparison.mismatches):,} mismatched values"
+    )
+    for loop_id, column, local, ref in comparison.mismatches[:20]:
+        print(f"  - {loop_id}: {column} local={local!r} dune={ref!r}")
+    return 0 if comparison.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
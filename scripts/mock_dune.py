@@ -0,0 +1,409 @@
+"""
+Local stand-in for the Dune API.
+
+Implements the endpoints ``scripts.dune_client`` uses, so the client's
+polling state machine, retries, pagination and throughput can be exercised
+without the real API or credits:
+
+- ``POST /sql/execute`` and ``POST /query/execute``
+- ``GET /execution/{id}/status``
+- ``GET /execution/{id}/results`` (with ``limit``/``offset`` paging)
+- ``GET /query/{id}/results``
+
+Each execution is queued for ``queue_seconds``, runs for
+``execution_seconds`` and then completes (or fails with probability
+``failure_rate``). Per-request latency, transient HTTP errors and the size
+of the synthetic result are configurable through ``MockConfig``.
+``GET /_mock/stats`` returns request counters.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server."""
+
+    submit_latency: float = 0.0
+    status_latency: float = 0.0
+    results_latency: float = 0.0
+    queue_seconds: float = 0.0
+    execution_seconds: float = 0.0
+    failure_rate: float = 0.0
+    http_error_rate: float = 0.0
+    rows: int = 100
+    row_width: int = 0
+    credits: float = 1.0
+    seed: int | None = None
+
+
+@dataclass
+class _Execution:
+    execution_id: str
+    submitted_at: float
+    fails: bool
+    rows: int
+
+
+def _iso(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def synthetic_rows(offset: int, limit: int, width: int) -> list[dict[str, Any]]:
+    """Deterministic result rows ``offset .. offset+limit`` (the same for every execution)."""
+    base = datetime.date(2024, 1, 1)
+    padding = "x" * width
+    rows = []
+    for i in range(offset, offset + limit):
+        row = {
+            "block_date": (base + datetime.timedelta(days=i % 365)).isoformat(),
+            "tx_id": f"0x{(i * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF:016x}",
+            "input_count": i % 7 + 1,
+            "value_btc": round((i * 0.137) % 50, 8),
+            "is_coinjoin": i % 11 == 0,
+        }
+        if width:
+            row["payload"] = padding
+        rows.append(row)
+    return rows
+
+
+@lru_cache(maxsize=64)
+def _encoded_page(offset: int, limit: int, width: int) -> tuple[bytes, bytes]:
+    """JSON rows and column names of a page, encoded once so large payloads are cheap to serve."""
+    rows = synthetic_rows(offset, limit, width)
+    return json.dumps(rows).encode("utf-8"), json.dumps(list(rows[0]) if rows else []).encode("utf-8")
+
+
+class MockDuneState:
+    """Executions and counters shared by all handler threads."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.executions: dict[str, _Execution] = {}
+        self.requests: dict[str, int] = {}
+        self.bytes_sent = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def count(self, endpoint: str, nbytes: int) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.bytes_sent += nbytes
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self.rng.random() < rate
+
+    def submit(self) -> _Execution:
+        with self._lock:
+            execution = _Execution(
+                execution_id=f"01MOCK{next(self._ids):020d}",
+                submitted_at=time.time(),
+                fails=self.config.failure_rate > 0 and self.rng.random() < self.config.failure_rate,
+                rows=self.config.rows,
+            )
+            self.executions[execution.execution_id] = execution
+            return execution
+
+    def status(self, execution: _Execution) -> dict[str, Any]:
+        now = time.time()
+        started = execution.submitted_at + self.config.queue_seconds
+        ended = started + self.config.execution_seconds
+        status: dict[str, Any] = {
+            "execution_id": execution.execution_id,
+            "submitted_at": _iso(execution.submitted_at),
+        }
+        if now < started:
+            # One position per remaining second of queueing.
+            status.update(state="QUERY_STATE_PENDING", queue_position=int(started - now) + 1)
+            return status
+        status["execution_started_at"] = _iso(started)
+        if now < ended:
+            status["state"] = "QUERY_STATE_EXECUTING"
+            return status
+        status["execution_ended_at"] = _iso(ended)
+        status["execution_cost_credits"] = self.config.credits
+        if execution.fails:
+            status["state"] = "QUERY_STATE_FAILED"
+            status["error"] = {"type": "FAILED_TYPE_EXECUTION_FAILED", "message": "Injected failure"}
+        else:
+            status["state"] = "QUERY_STATE_COMPLETED"
+        return status
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "executions": len(self.executions),
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_MockHTTPServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _reply(
+        self,
+        endpoint: str,
+        status: int,
+        body: dict[str, Any] | bytes,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.state.count(endpoint, len(data))
+
+    def _inject(self, endpoint: str, latency: float) -> bool:
+        """Apply latency and maybe answer with a transient error; True if handled."""
+        if latency > 0:
+            time.sleep(latency)
+        if self.server.state.chance(self.server.state.config.http_error_rate):
+            self._reply(endpoint, 503, {"error": "Injected transient failure"}, {"Retry-After": "0"})
+            return True
+        return False
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        path = urllib.parse.urlsplit(self.path).path
+        if path not in ("/sql/execute", "/query/execute"):
+            self._reply("unknown", 404, {"error": f"Unknown endpoint {path}"})
+            return
+        endpoint = path.strip("/").replace("/", "_")
+        if self._inject(endpoint, self.server.state.config.submit_latency):
+            return
+        execution = self.server.state.submit()
+        self._reply(endpoint, 200, {"execution_id": execution.execution_id, "state": "QUERY_STATE_PENDING"})
+
+    def do_GET(self) -> None:
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = parsed.path.strip("/").split("/")
+        query = urllib.parse.parse_qs(parsed.query)
+        state = self.server.state
+        config = state.config
+
+        if parts == ["_mock", "stats"]:
+            self._reply("stats", 200, state.stats())
+            return
+
+        if len(parts) == 3 and parts[0] == "execution" and parts[2] in ("status", "results"):
+            endpoint = f"execution_{parts[2]}"
+            latency = config.status_latency if parts[2] == "status" else config.results_latency
+            if self._inject(endpoint, latency):
+                return
+            execution = state.executions.get(parts[1])
+            if execution is None:
+                self._reply(endpoint, 404, {"error": f"Execution {parts[1]} not found"})
+                return
+            status = state.status(execution)
+            if parts[2] == "status":
+                self._reply(endpoint, 200, status)
+                return
+            if status["state"] != "QUERY_STATE_COMPLETED":
+                self._reply(endpoint, 400, {"error": f"Execution is {status['state']}"})
+                return
+            self._results(endpoint, execution.rows, query, status)
+            return
+
+        if len(parts) == 3 and parts[0] == "query" and parts[2] == "results":
+            if self._inject("query_results", config.results_latency):
+                return
+            self._results("query_results", config.rows, query, {"state": "QUERY_STATE_COMPLETED"})
+            return
+
+        self._reply("unknown", 404, {"error": f"Unknown endpoint {parsed.path}"})
+
+    def _results(
+        self,
+        endpoint: str,
+        total: int,
+        query: dict[str, list[str]],
+        status: dict[str, Any],
+    ) -> None:
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", [str(total)])[0])
+        count = max(min(limit, total - offset), 0)
+        rows, columns = _encoded_page(offset, count, self.server.state.config.row_width)
+        head = json.dumps({"execution_id": status.get("execution_id"), "state": status["state"]})[:-1]
+        metadata = f'{{"column_names": {columns.decode()}, "total_row_count": {total}, "row_count": {count}}}'
+        tail = f', "next_offset": {offset + count}' if offset + count < total else ""
+        body = b"".join([
+            head.encode("utf-8"),
+            b', "result": {"rows": ',
+            rows,
+            f', "metadata": {metadata}}}{tail}}}'.encode("utf-8"),
+        ])
+        self._reply(endpoint, 200, body)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address: tuple[str, int], state: MockDuneState):
+        super().__init__(address, _Handler)
+        self.state = state
+
+
+def _serve_in_process(config: MockConfig, host: str, port: int, ready: Any) -> None:
+    server = _MockHTTPServer((host, port), MockDuneState(config))
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class MockDuneServer:
+    """
+    Mock API server on a background thread (or a child process).
+
+    Args:
+        config: Server behaviour.
+        host: Bind address.
+        port: Port (0 picks a free one).
+        process: Serve from a separate process, so its CPU and memory do not
+            show up in measurements of the client.
+
+    Use as a context manager; ``base_url`` is valid once started.
+    """
+
+    def __init__(
+        self,
+        config: MockConfig | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        process: bool = False,
+    ):
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.process = process
+        self._server: _MockHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+        self._child: multiprocessing.Process | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "MockDuneServer":
+        if self.process:
+            ctx = multiprocessing.get_context("spawn")
+            ready = ctx.Queue()
+            self._child = ctx.Process(
+                target=_serve_in_process,
+                args=(self.config, self.host, self.port, ready),
+                daemon=True,
+            )
+            self._child.start()
+            self.port = ready.get(timeout=30)
+        else:
+            self._server = _MockHTTPServer((self.host, self.port), MockDuneState(self.config))
+            self.port = self._server.server_address[1]
+            self._thread = threading.Thread(target=self._server.serve_forever, name="mock-dune", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._child is not None:
+            self._child.terminate()
+            self._child.join(timeout=5)
+            self._child = None
+
+    def stats(self) -> dict[str, Any]:
+        """Request counters, fetched over HTTP so it works for both modes."""
+        from urllib.request import urlopen
+
+        with urlopen(f"{self.base_url}/_mock/stats", timeout=10) as resp:
+            return json.load(resp)
+
+    def __enter__(self) -> "MockDuneServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add ``MockConfig`` options to an argument parser."""
+    parser.add_argument("--submit-latency", type=float, default=0.0, help="Seconds added to each submit")
+    parser.add_argument("--status-latency", type=float, default=0.0, help="Seconds added to each status poll")
+    parser.add_argument("--results-latency", type=float, default=0.0, help="Seconds added to each results page")
+    parser.add_argument("--queue", type=float, default=0.0, dest="queue_seconds", help="Seconds each execution stays queued")
+    parser.add_argument(
+        "--execution", type=float, default=0.0, dest="execution_seconds", help="Seconds each execution runs"
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of executions that fail")
+    parser.add_argument(
+        "--http-error-rate", type=float, default=0.0, help="Fraction of requests answered with a transient 503"
+    )
+    parser.add_argument("--rows", type=int, default=100, help="Rows per result (default: 100)")
+    parser.add_argument("--row-width", type=int, default=0, help="Extra payload bytes per row")
+    parser.add_argument("--seed", type=int, help="Random seed for failure injection")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    """Build a ``MockConfig`` from ``add_config_arguments`` options."""
+    return MockConfig(**{k: getattr(args, k) for k in asdict(MockConfig()) if hasattr(args, k)})
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Serve a local mock of the Dune API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.mock_dune --port 8765
+  python -m scripts.mock_dune --port 8765 --queue 2 --execution 5 --failure-rate 0.1 --rows 100000
+        """,
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = _MockHTTPServer((args.host, args.port), MockDuneState(config_from_args(args)))
+    print(f"Mock Dune API on http://{args.host}:{server.server_address[1]} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+In-memory query registry index.
+
+Loads and merges the chain registry files once, builds lookup indexes, and
+only re-reads the JSON when one of the files changes on disk.
+"""
+
+import json
+import threading
+from collections import defaultdict
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+# Base path for the repository
+REPO_ROOT = Path(__file__).parent.parent
+REGISTRY_PATHS = [
+    REPO_ROOT / "queries" / "registry.bitcoin.json",
+    REPO_ROOT / "queries" / "registry.ethereum.json",
+    REPO_ROOT / "queries" / "registry.base.json",
+]
+
+
+def _chain_from_path(path: Path) -> str:
+    # registry.ethereum.json -> ethereum
+    parts = path.name.split(".")
+    return parts[1] if len(parts) == 3 else path.stem
+
+
+class Registry:
+    """
+    Merged, indexed view of all chain registries.
+
+    Query entries are the raw registry dicts with ``_registry_file`` and
+    ``_chain`` added. Treat them as read-only; use
+    ``registry_manager.set_query_id`` to persist changes.
+    """
+
+    def __init__(self, paths: list[Path] | None = None):
+        self.paths = list(paths or REGISTRY_PATHS)
+        self.queries: list[dict[str, Any]] = []
+        self.by_name: dict[str, dict[str, Any]] = {}
+        self.by_chain: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        self.by_type: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        self.by_architecture: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        self.dependents: dict[str, list[str]] = defaultdict(list)
+
+        for path in self.paths:
+            if not path.exists():
+                raise FileNotFoundError(f"Registry not found: {path}")
+            with open(path) as f:
+                registry = json.load(f)
+            chain = _chain_from_path(path)
+            for query in registry.get("queries", []):
+                q = dict(query)
+                q["_registry_file"] = str(path.relative_to(REPO_ROOT)) if path.is_relative_to(REPO_ROOT) else str(path)
+                q["_chain"] = chain
+                self._add(q)
+
+        self.signature = _signature(self.paths)
+
+    def _add(self, query: dict[str, Any]) -> None:
+        name = query["name"]
+        self.queries.append(query)
+        # First entry wins on duplicates; validate_registry reports them.
+        self.by_name.setdefault(name, query)
+        self.by_chain[query["_chain"]].append(query)
+        self.by_type[query.get("type") or "unknown"].append(query)
+        self.by_architecture[query.get("architecture") or "unknown"].append(query)
+        for dep in query.get("dependencies", []):
+            self.dependents[dep].append(name)
+
+    def get(self, name: str) -> dict[str, Any] | None:
+        """Get a query entry by name."""
+        return self.by_name.get(name)
+
+    def dependencies(self, name: str) -> list[str]:
+        """Direct upstream query names."""
+        query = self.by_name.get(name)
+        return list(query.get("dependencies", [])) if query else []
+
+    def downstream(self, names: list[str]) -> set[str]:
+        """All transitive dependents of the given queries (excluding themselves)."""
+        seen: set[str] = set()
+        stack = list(names)
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), []):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return seen - set(names)
+
+    @cached_property
+    def id_map(self) -> dict[str, int]:
+        """Map of query name to Dune query ID for queries that have one."""
+        return {q["name"]: q["dune_query_id"] for q in self.queries if q.get("dune_query_id")}
+
+    def as_dict(self) -> dict[str, Any]:
+        """Registry in the merged ``{"queries": [...]}`` dict form."""
+        return {
+            "version": "1.0",
+            "description": "Merged query registry",
+            "queries": self.queries,
+        }
+
+    def is_stale(self) -> bool:
+        """True if any registry file changed since this index was built."""
+        return _signature(self.paths) != self.signature
+
+
+def _signature(paths: list[Path]) -> tuple[tuple[int, int], ...]:
+    sig = []
+    for path in paths:
+        try:
+            st = path.stat()
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((-1, -1))
+    return tuple(sig)
+
+
+_cache: dict[tuple[Path, ...], Registry] = {}
+_cache_lock = threading.Lock()
+
+
+def get_registry(paths: list[Path] | None = None) -> Registry:
+    """
+    Return the shared registry index, reloading it if a file changed.
+
+    Args:
+        paths: Registry files to merge (defaults to ``REGISTRY_PATHS``).
+
+    Returns:
+        Cached Registry instance.
+    """
+    key = tuple(paths or REGISTRY_PATHS)
+    with _cache_lock:
+        registry = _cache.get(key)
+        if registry is None or registry.is_stale():
+            registry = Registry(list(key))
+            _cache[key] = registry
+        return registry
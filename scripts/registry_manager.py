@@ -10,33 +10,13 @@ import sys
 from pathlib import Path
 from typing import Any
 
-
-# Base path for the repository
-REPO_ROOT = Path(__file__).parent.parent
-REGISTRY_PATHS = [
-    REPO_ROOT / "queries" / "registry.bitcoin.json",
-    REPO_ROOT / "queries" / "registry.ethereum.json",
-    REPO_ROOT / "queries" / "registry.base.json",
-]
+from scripts.registry import REGISTRY_PATHS, REPO_ROOT, get_registry
+from scripts.sql_references import dependency_drift, derive_dependencies
 
 
 def load_registry() -> dict[str, Any]:
-    """Load and merge all chain registries."""
-    merged_queries: list[dict[str, Any]] = []
-    for path in REGISTRY_PATHS:
-        if not path.exists():
-            raise FileNotFoundError(f"Registry not found: {path}")
-        with open(path) as f:
-            registry = json.load(f)
-        for query in registry.get("queries", []):
-            q = dict(query)
-            q["_registry_file"] = str(path.relative_to(REPO_ROOT))
-            merged_queries.append(q)
-    return {
-        "version": "1.0",
-        "description": "Merged query registry",
-        "queries": merged_queries,
-    }
+    """Load and merge all chain registries (cached until a file changes)."""
+    return get_registry().as_dict()
 
 
 def save_registry_file(path: Path, registry: dict[str, Any]) -> None:
@@ -48,11 +28,7 @@ def save_registry_file(path: Path, registry: dict[str, Any]) -> None:
 
 def get_query(name: str) -> dict[str, Any] | None:
     """Get a query entry by name."""
-    registry = load_registry()
-    for query in registry["queries"]:
-        if query["name"] == name:
-            return query
-    return None
+    return get_registry().get(name)
 
 
 def set_query_id(name: str, dune_id: int) -> bool:
@@ -78,6 +54,35 @@ def set_query_id(name: str, dune_id: int) -> bool:
     return False
 
 
+def sync_dependencies() -> list[str]:
+    """
+    Rewrite registry ``dependencies`` to match the references in each query's SQL.
+
+    Returns:
+        Names of the queries whose dependencies changed.
+    """
+    derived = derive_dependencies(get_registry())
+    changed = []
+    for path in REGISTRY_PATHS:
+        with open(path) as f:
+            registry = json.load(f)
+        modified = False
+        for query in registry.get("queries", []):
+            entry = derived.get(query["name"])
+            if entry is None or entry.error:
+                continue
+            current = query.get("dependencies", [])
+            if set(current) != entry.dependencies:
+                # Keep the existing order for edges that remain
+                kept = [dep for dep in current if dep in entry.dependencies]
+                query["dependencies"] = kept + sorted(entry.dependencies - set(kept))
+                changed.append(query["name"])
+                modified = True
+        if modified:
+            save_registry_file(path, registry)
+    return changed
+
+
 def list_queries(
     architecture: str | None = None,
     query_type: str | None = None,
@@ -94,12 +99,12 @@ def list_queries(
     Returns:
         List of matching query entries.
     """
-    registry = load_registry()
-    queries = registry["queries"]
+    registry = get_registry()
+    queries = registry.queries
 
-    # Apply filters
+    # Apply filters (indexed lookups keep registry order)
     if architecture:
-        queries = [q for q in queries if q.get("architecture") == architecture]
+        queries = registry.by_architecture.get(architecture, [])
 
     if query_type:
         queries = [q for q in queries if q.get("type") == query_type]
@@ -121,6 +126,7 @@ def validate_registry() -> list[str]:
     - All query files exist
     - All smoke test files exist
     - Dependencies reference valid queries
+    - Dependencies match the query references in each SQL file
     - No duplicate query names
 
     Returns:
@@ -158,9 +164,79 @@ def validate_registry() -> list[str]:
             if dep not in names:
                 errors.append(f"[{name}] Unknown dependency: {dep}")
 
+    # Check declared dependencies match the query SQL
+    for drift in dependency_drift(get_registry()):
+        for message in drift.messages:
+            errors.append(f"[{drift.name}] {message}")
+
     return errors
 
 
+def cmd_deps(args: argparse.Namespace) -> int:
+    """Handle 'deps' command."""
+    if args.fix:
+        changed = sync_dependencies()
+        if changed:
+            print(f"Updated dependencies for {len(changed)} query(ies): {', '.join(changed)}")
+        else:
+            print("Registry dependencies already match the SQL.")
+        return 0
+
+    registry = get_registry()
+    derived = derive_dependencies(registry)
+    if args.name:
+        if args.name not in derived:
+            print(f"Error: Query '{args.name}' not found in registry")
+            return 1
+        entry = derived[args.name]
+        print(f"\nQuery: {args.name}")
+        print("-" * 40)
+        print(f"  Declared: {sorted(registry.dependencies(args.name))}")
+        print(f"  From SQL: {sorted(entry.dependencies)}")
+        print(f"  Downstream: {sorted(registry.downstream([args.name]))}")
+        return 0
+
+    drift = dependency_drift(registry)
+    if not drift:
+        print("[+] Registry dependencies match the SQL references.")
+        return 0
+    print(f"[X] {len(drift)} query(ies) with dependency drift:\n")
+    for entry in drift:
+        for message in entry.messages:
+            print(f"  - [{entry.name}] {message}")
+    print("\nRun with --fix to rewrite the registry from the SQL.")
+    return 1
+
+
+def cmd_cost(args: argparse.Namespace) -> int:
+    """Handle 'cost' command."""
+    from scripts.cost_analyzer import analyze_query, load_catalog, print_cost_report
+
+    if args.name:
+        query = get_query(args.name)
+        if not query:
+            print(f"Error: Query '{args.name}' not found in registry")
+            return 1
+        queries = [query]
+    else:
+        queries = list_queries(architecture=args.architecture)
+
+    catalog = load_catalog(args.catalog)
+    reports = [analyze_query(q, catalog) for q in queries]
+
+    print(f"\nEstimated scan footprint ({len(reports)} queries)")
+    print("=" * 80)
+    print_cost_report(reports, verbose=args.verbose)
+    print()
+
+    if args.max_gb is not None:
+        over = [r.name for r in reports if r.estimated_gb > args.max_gb]
+        if over:
+            print(f"[X] {len(over)} query(ies) exceed {args.max_gb:g} GB: {', '.join(over)}")
+            return 1
+    return 0
+
+
 def print_query_table(queries: list[dict[str, Any]]) -> None:
     """Print queries in a formatted table."""
     if not queries:
@@ -261,6 +337,10 @@ Examples:
   python -m scripts.registry_manager show bitcoin_tx_features_daily
   python -m scripts.registry_manager set-id bitcoin_tx_features_daily 12345678
   python -m scripts.registry_manager validate
+  python -m scripts.registry_manager deps
+  python -m scripts.registry_manager deps --fix
+  python -m scripts.registry_manager cost --max-gb 100
+  python -m scripts.registry_manager cost bitcoin_tx_features_daily --verbose
         """,
     )
 
@@ -298,6 +378,40 @@ Examples:
     # Validate command
     subparsers.add_parser("validate", help="Validate registry consistency")
 
+    # Deps command
+    deps_parser = subparsers.add_parser("deps", help="Compare registry dependencies with SQL references")
+    deps_parser.add_argument("name", nargs="?", help="Show declared vs derived dependencies for one query")
+    deps_parser.add_argument(
+        "--fix",
+        action="store_true",
+        help="Rewrite registry dependencies from the SQL references",
+    )
+
+    # Cost command
+    cost_parser = subparsers.add_parser("cost", help="Estimate scan footprint and check partition pruning")
+    cost_parser.add_argument("name", nargs="?", help="Query name (default: all queries)")
+    cost_parser.add_argument(
+        "--architecture",
+        choices=["v2", "legacy"],
+        help="Filter by architecture",
+    )
+    cost_parser.add_argument(
+        "--catalog",
+        help="Table-size catalog JSON (default: queries/table_sizes.json)",
+    )
+    cost_parser.add_argument(
+        "--max-gb",
+        type=float,
+        dest="max_gb",
+        help="Exit non-zero if any query's estimated scan exceeds this many GB",
+    )
+    cost_parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Show every source table read",
+    )
+
     args = parser.parse_args()
 
     if args.command == "list":
@@ -308,6 +422,10 @@ Examples:
         return cmd_set_id(args)
     elif args.command == "validate":
         return cmd_validate(args)
+    elif args.command == "deps":
+        return cmd_deps(args)
+    elif args.command == "cost":
+        return cmd_cost(args)
     else:
         parser.print_help()
         return 1
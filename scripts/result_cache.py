@@ -0,0 +1,127 @@
+"""
+Content-addressed on-disk cache for ad-hoc SQL execution results.
+
+Entries are keyed by a hash of the final SQL text (after placeholder
+substitution), its parameters and the performance tier, stored as JSON,
+expired after a TTL and evicted least-recently-used once the cache exceeds
+its size cap.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from scripts.dune_client import ExecutionResult, ExecutionTiming
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache" / "dune_results"
+
+
+def cache_key(
+    sql: str,
+    params: dict[str, Any] | None = None,
+    performance: str = "medium",
+) -> str:
+    """Stable hash identifying an execution request."""
+    material = json.dumps(
+        {"sql": sql, "params": params or {}, "performance": performance},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk LRU cache of successful ExecutionResults.
+
+    Args:
+        directory: Cache directory (created on first write).
+        ttl_seconds: Entries older than this are treated as misses.
+        max_bytes: Total size cap; least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str = DEFAULT_CACHE_DIR,
+        ttl_seconds: int = 24 * 3600,
+        max_bytes: int = 1024**3,
+    ):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> ExecutionResult | None:
+        """
+        Return the cached result for ``key``, or None on miss/expiry.
+
+        Unreadable or malformed entries, and entries evicted by another
+        thread while being read, count as misses.
+        """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            result = ExecutionResult(**entry["result"])
+            result.timing = ExecutionTiming.from_dict(entry["result"].get("timing"))
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+        try:
+            # Touch mtime so eviction sees this entry as recently used.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        result.cached = True
+        return result
+
+    def put(self, key: str, result: ExecutionResult) -> None:
+        """Store a successful result and enforce the size cap."""
+        if not result.success:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"created_at": time.time(), "result": dataclasses.asdict(result)}
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(payload, f, default=str)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until under ``max_bytes``."""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.glob("*/*.json"):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            return removed
+
+    def clear(self) -> None:
+        """Delete every cache entry."""
+        for path in self.directory.glob("*/*.json"):
+            path.unlink(missing_ok=True)
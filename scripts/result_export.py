@@ -0,0 +1,621 @@
+"""
+Partitioned Parquet export of query results.
+
+Query results are written under a local data directory as a Hive-partitioned
+dataset per query::
+
+    <data_dir>/<query name>/chain=<chain>/<day column>=YYYY-MM-DD/part-0.parquet
+
+The day column is the first of ``block_date``, ``day`` or ``date`` in the
+result. Dune's timestamp and date strings are stored as real Arrow
+timestamps and dates, so filters on them can be pushed down.
+
+Exports are incremental. Each refresh rewrites only these day partitions:
+
+- days at or after the last exported day minus ``lookback_days`` (the window
+  incremental queries recompute);
+- days not exported before.
+
+Older partitions are left untouched. A ``_manifest.json`` per dataset records
+the partitions and row counts. A ``_common_metadata`` file records the
+unified schema.
+
+``load`` reads a dataset back with column pruning, partition pruning on chain
+and day, and row-group predicate pushdown. ``register_exports`` exposes
+exports to the local DuckDB engine as ``query_<id>`` views.
+
+Requires the optional ``local`` extra (``pip install -e .[local]``).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from scripts.columnar import as_columnar
+from scripts.dune_client import ExecutionResult
+from scripts.registry import REPO_ROOT, get_registry
+
+DEFAULT_DATA_DIR = REPO_ROOT / ".cache" / "data"
+
+# Candidate day columns, in order of preference.
+PARTITION_COLUMNS = ("block_date", "day", "date")
+
+MANIFEST_FILE = "_manifest.json"
+SCHEMA_FILE = "_common_metadata"
+PART_FILE = "part-0.parquet"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+_NULL_DAY = np.iinfo(np.int32).min
+
+_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+_TIMESTAMP_PATTERN = r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?( UTC)?$"
+
+_OPERATORS = {
+    "==": lambda f, v: f == v,
+    "=": lambda f, v: f == v,
+    "!=": lambda f, v: f != v,
+    "<": lambda f, v: f < v,
+    "<=": lambda f, v: f <= v,
+    ">": lambda f, v: f > v,
+    ">=": lambda f, v: f >= v,
+    "in": lambda f, v: f.isin(v),
+    "not in": lambda f, v: ~f.isin(v),
+}
+
+_WHERE_PATTERN = re.compile(r"^\s*(\w+)\s*(==|!=|<=|>=|=|<|>)\s*(.+?)\s*$")
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Parquet export requires pyarrow. Install it with: pip install -e .[local]"
+        ) from e
+    return pyarrow
+
+
+@dataclass
+class ExportReport:
+    """Outcome of exporting one result."""
+
+    name: str
+    chain: str
+    rows: int = 0
+    partition_column: str | None = None
+    written: list[str] = field(default_factory=list)
+    kept: int = 0
+    bytes_written: int = 0
+    unchanged: bool = False
+
+
+def _coerce_strings(arr: Any) -> Any:
+    """Parse a string column of Dune dates/timestamps into a typed Arrow array."""
+    pa = _import_pyarrow()
+    import pyarrow.compute as pc
+
+    present = pc.drop_null(arr)
+    if len(present) == 0:
+        return arr
+    if pc.all(pc.match_substring_regex(present, _DATE_PATTERN)).as_py():
+        return pc.cast(arr, pa.date32())
+    if pc.all(pc.match_substring_regex(present, _TIMESTAMP_PATTERN)).as_py():
+        naive = pc.cast(pc.replace_substring_regex(arr, " UTC$", ""), pa.timestamp("us"))
+        return pc.cast(naive, pa.timestamp("us", tz="UTC"))
+    return arr
+
+
+def to_arrow(result: ExecutionResult) -> Any:
+    """
+    Convert a result to an Arrow table.
+
+    Numeric and boolean columns keep their null masks. Date and timestamp
+    strings become ``date32`` and ``timestamp[us, UTC]``. Columns Arrow cannot
+    type, such as uint256 amounts beyond int64, are stored as strings.
+    """
+    pa = _import_pyarrow()
+
+    table = as_columnar(result)
+    arrays = []
+    for name in table.columns:
+        values, mask = table.data[name], table.nulls[name]
+        if values.dtype != object:
+            arrays.append(pa.array(values, mask=mask if mask.any() else None))
+            continue
+        items = values.tolist()
+        try:
+            arr = pa.array(items)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arr = pa.array([None if v is None else str(v) for v in items], type=pa.string())
+        if pa.types.is_string(arr.type):
+            arr = _coerce_strings(arr)
+        arrays.append(arr)
+    return pa.Table.from_arrays(arrays, names=table.columns)
+
+
+def partition_column(columns: Iterable[str]) -> str | None:
+    """Day column a result is partitioned by, if it has one."""
+    present = set(columns)
+    return next((c for c in PARTITION_COLUMNS if c in present), None)
+
+
+def _day_values(table: Any, column: str) -> Any | None:
+    """Days since epoch for the partition column, or None if it is not temporal."""
+    pa = _import_pyarrow()
+    import pyarrow.compute as pc
+
+    col = table[column]
+    if pa.types.is_timestamp(col.type):
+        col = pc.cast(col, pa.date32(), safe=False)
+    if not pa.types.is_date32(col.type):
+        return None
+    # Null days sort first and land in the Hive default partition.
+    return pc.fill_null(pc.cast(col, pa.int32()), _NULL_DAY).to_numpy()
+
+
+def _day_label(day: int) -> str:
+    if day == _NULL_DAY:
+        return NULL_PARTITION
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=int(day))).isoformat()
+
+
+def _dataset_dir(name: str, data_dir: Path | str) -> Path:
+    return Path(data_dir) / name
+
+
+def read_manifest(name: str, data_dir: Path | str = DEFAULT_DATA_DIR) -> dict[str, Any] | None:
+    """Manifest of an exported dataset, or None if it was never exported."""
+    path = _dataset_dir(name, data_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_atomic(path: Path, write: Any) -> int:
+    """Write via a dot-prefixed temp file (ignored by dataset discovery) and rename."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def _unify_schema(table: Any, dataset_dir: Path) -> tuple[Any, Any]:
+    """
+    Cast ``table`` to the dataset's stored schema, widening it where needed.
+
+    Raises:
+        ValueError: If a column changed to an incompatible type.
+    """
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema_path = dataset_dir / SCHEMA_FILE
+    if not schema_path.exists():
+        return table, table.schema
+    stored = pq.read_schema(schema_path)
+    try:
+        unified = pa.unify_schemas([stored, table.schema], promote_options="permissive")
+        target = pa.schema([unified.field(name) for name in table.column_names])
+        return table.cast(target), unified
+    except (pa.ArrowTypeError, pa.ArrowInvalid) as e:
+        raise ValueError(f"Result does not match the exported schema of {dataset_dir.name}: {e}") from e
+
+
+def export_result(
+    name: str,
+    result: ExecutionResult,
+    chain: str | None = None,
+    data_dir: Path | str = DEFAULT_DATA_DIR,
+    lookback_days: int = 1,
+    full: bool = False,
+) -> ExportReport:
+    """
+    Write a successful result to the partitioned dataset of ``name``.
+
+    Args:
+        name: Registry query name (dataset directory).
+        result: Result to export.
+        chain: Chain partition (default: the registry chain of ``name``).
+        data_dir: Root data directory.
+        lookback_days: Days before the last exported day that are rewritten.
+        full: Rewrite every day partition in ``result``.
+
+    Returns:
+        ExportReport with the partitions written.
+
+    Raises:
+        ValueError: If the result failed, or ``chain`` is not given and
+            ``name`` is not in the registry.
+    """
+    import pyarrow.parquet as pq
+
+    if not result.success:
+        raise ValueError(f"Cannot export failed result for '{name}': {result.error}")
+    if chain is None:
+        query = get_registry().get(name)
+        if query is None:
+            raise ValueError(f"Query '{name}' not found in registry; pass chain explicitly")
+        chain = query["_chain"]
+
+    dataset_dir = _dataset_dir(name, data_dir)
+    manifest = read_manifest(name, data_dir) or {"name": name, "chains": {}}
+    state = manifest["chains"].get(chain, {})
+    report = ExportReport(name=name, chain=chain, rows=result.row_count)
+
+    if not full and result.execution_id and state.get("execution_id") == result.execution_id:
+        report.unchanged = True
+        report.partition_column = manifest.get("partition_column")
+        report.kept = len(state.get("partitions", {}))
+        return report
+
+    table = to_arrow(result)
+    day_column = partition_column(table.column_names)
+    days = _day_values(table, day_column) if day_column else None
+    if days is None:
+        day_column = None
+    report.partition_column = day_column
+    if manifest.get("partition_column", day_column) != day_column:
+        raise ValueError(
+            f"'{name}' was exported partitioned by {manifest.get('partition_column')!r}, "
+            f"result has {day_column!r}; re-export into an empty data directory"
+        )
+
+    file_table = table.drop_columns([day_column]) if day_column else table
+    file_table, schema = _unify_schema(file_table, dataset_dir)
+    chain_dir = dataset_dir / f"chain={chain}"
+
+    def write(part: Any, path: Path) -> None:
+        report.bytes_written += _write_atomic(path, lambda tmp: pq.write_table(part, tmp, compression="zstd"))
+        report.written.append(path.parent.name if day_column else path.name)
+
+    partitions: dict[str, int] = dict(state.get("partitions", {}))
+    if day_column is None:
+        write(file_table, chain_dir / PART_FILE)
+        partitions = {"": file_table.num_rows}
+    else:
+        order = np.argsort(days, kind="stable")
+        sorted_days = days[order]
+        file_table = file_table.take(order)
+        unique, starts = np.unique(sorted_days, return_index=True)
+        ends = np.append(starts[1:], len(sorted_days))
+
+        exported = [d for d in partitions if d != NULL_PARTITION]
+        watermark = None
+        if exported and not full:
+            last = datetime.date.fromisoformat(max(exported))
+            watermark = (last - datetime.timedelta(days=lookback_days)).isoformat()
+
+        for day, start, end in zip(unique, starts, ends):
+            label = _day_label(day)
+            if watermark is not None and label in partitions and label != NULL_PARTITION and label < watermark:
+                report.kept += 1
+                continue
+            write(file_table.slice(start, end - start), chain_dir / f"{day_column}={label}" / PART_FILE)
+            partitions[label] = int(end - start)
+
+    _write_atomic(dataset_dir / SCHEMA_FILE, lambda tmp: pq.write_metadata(schema, tmp))
+    manifest["partition_column"] = day_column
+    manifest["chains"][chain] = {
+        "execution_id": result.execution_id,
+        "exported_at": time.time(),
+        "rows": sum(partitions.values()),
+        "partitions": dict(sorted(partitions.items())),
+    }
+    _write_atomic(
+        dataset_dir / MANIFEST_FILE,
+        lambda tmp: tmp.write_text(json.dumps(manifest, indent=2) + "\n"),
+    )
+    return report
+
+
+def dataset(name: str, data_dir: Path | str = DEFAULT_DATA_DIR) -> Any:
+    """
+    Open an exported dataset as a ``pyarrow.dataset.Dataset``.
+
+    ``chain`` and the day column are exposed as partition fields, so filters
+    on them skip whole directories. The dataset can also be scanned directly
+    by DuckDB or polars.
+
+    Raises:
+        ValueError: If ``name`` has not been exported.
+    """
+    pa = _import_pyarrow()
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    manifest = read_manifest(name, data_dir)
+    if manifest is None:
+        raise ValueError(f"No export found for '{name}' under {data_dir}")
+    dataset_dir = _dataset_dir(name, data_dir)
+    partition_fields = [pa.field("chain", pa.string())]
+    if manifest.get("partition_column"):
+        partition_fields.append(pa.field(manifest["partition_column"], pa.date32()))
+    partitioning = ds.partitioning(pa.schema(partition_fields), flavor="hive")
+    schema = pa.schema(list(pq.read_schema(dataset_dir / SCHEMA_FILE)) + partition_fields)
+    return ds.dataset(dataset_dir, format="parquet", partitioning=partitioning, schema=schema)
+
+
+def _as_scalar(value: Any, type_: Any) -> Any:
+    pa = _import_pyarrow()
+
+    if isinstance(value, (list, tuple, set)):
+        return pa.array([_as_scalar(v, type_).as_py() for v in value], type=type_)
+    if isinstance(value, str) and not pa.types.is_string(type_):
+        if pa.types.is_timestamp(type_):
+            # Naive strings are UTC, as in Dune results.
+            naive = pa.scalar(value.removesuffix(" UTC")).cast(pa.timestamp(type_.unit))
+            return naive.cast(type_)
+        return pa.scalar(value).cast(type_)
+    return pa.scalar(value, type=type_)
+
+
+def build_filter(schema: Any, filters: Iterable[tuple[str, str, Any]]) -> Any | None:
+    """
+    AND together ``(column, op, value)`` filters as a dataset expression.
+
+    ``op`` is one of ``== = != < <= > >= in "not in"``. Values are cast to the
+    column type, so dates and timestamps can be given as ISO strings.
+    """
+    import pyarrow.dataset as ds
+
+    expression = None
+    for column, op, value in filters:
+        if column not in schema.names:
+            raise ValueError(f"Unknown column '{column}'")
+        if op not in _OPERATORS:
+            raise ValueError(f"Unknown operator '{op}'")
+        term = _OPERATORS[op](ds.field(column), _as_scalar(value, schema.field(column).type))
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def load(
+    name: str,
+    columns: list[str] | None = None,
+    filters: Iterable[tuple[str, str, Any]] | None = None,
+    chains: Iterable[str] | None = None,
+    start: datetime.date | str | None = None,
+    end: datetime.date | str | None = None,
+    data_dir: Path | str = DEFAULT_DATA_DIR,
+) -> Any:
+    """
+    Read an exported dataset into an Arrow table.
+
+    Only ``columns`` are read. ``chains`` and the inclusive ``start``/``end``
+    day range prune partitions. ``filters`` are pushed down to Parquet
+    row-group statistics. Call ``.to_pandas()`` on the result for a DataFrame.
+
+    Args:
+        name: Exported query name.
+        columns: Columns to read (default: all).
+        filters: ``(column, op, value)`` tuples, see ``build_filter``.
+        chains: Chain partitions to read (default: all).
+        start: First day to read.
+        end: Last day to read.
+        data_dir: Root data directory.
+    """
+    data = dataset(name, data_dir)
+    conditions = list(filters or [])
+    if chains is not None:
+        conditions.append(("chain", "in", list(chains)))
+    day_column = read_manifest(name, data_dir).get("partition_column")
+    if (start is not None or end is not None) and day_column is None:
+        raise ValueError(f"'{name}' is not partitioned by day")
+    if start is not None:
+        conditions.append((day_column, ">=", str(start)))
+    if end is not None:
+        conditions.append((day_column, "<=", str(end)))
+    return data.to_table(columns=columns, filter=build_filter(data.schema, conditions))
+
+
+def register_exports(engine: Any, names: Iterable[str] | None = None, data_dir: Path | str = DEFAULT_DATA_DIR) -> list[str]:
+    """
+    Expose exported datasets to a ``LocalEngine`` as ``query_<id>`` views.
+
+    Nested queries that read ``query_<id>`` then run against the exported
+    result of that query instead of a fixture.
+
+    Returns:
+        Names of the views created.
+    """
+    registry = get_registry()
+    root = Path(data_dir)
+    if names is None:
+        names = sorted(p.parent.name for p in root.glob(f"*/{MANIFEST_FILE}"))
+    views = []
+    for name in names:
+        query_id = registry.id_map.get(name)
+        if query_id is None or read_manifest(name, data_dir) is None:
+            continue
+        engine.register_parquet(f"query_{query_id}", _dataset_dir(name, data_dir) / "**" / "*.parquet")
+        views.append(f"query_{query_id}")
+    return views
+
+
+def fetch_result(query: dict[str, Any], execute: bool = False, max_age_hours: int = 8, page_size: int = 10_000) -> ExecutionResult:
+    """Download a registry query's latest result (or run it) page by page into columnar form."""
+    from scripts.dune_client import stream_latest_result, stream_query
+
+    query_id = query.get("dune_query_id")
+    if not query_id:
+        raise ValueError(f"Query '{query['name']}' has no dune_query_id")
+    if execute:
+        stream = stream_query(query_id, page_size=page_size)
+    else:
+        stream = stream_latest_result(query_id, max_age_hours=max_age_hours, page_size=page_size)
+    return stream.collect_columnar()
+
+
+def parse_where(expression: str) -> tuple[str, str, str]:
+    """Parse a CLI filter such as ``block_date>=2024-06-01``."""
+    match = _WHERE_PATTERN.match(expression)
+    if not match:
+        raise ValueError(f"Invalid filter '{expression}', expected COLUMN OP VALUE")
+    return match.group(1), match.group(2), match.group(3)
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    registry = get_registry()
+    status = 0
+    for name in args.names:
+        query = registry.get(name)
+        if query is None:
+            print(f"Error: Query '{name}' not found in registry")
+            status = 1
+            continue
+        try:
+            result = fetch_result(query, execute=args.execute, max_age_hours=args.max_age_hours)
+            if not result.success:
+                raise ValueError(result.error)
+            report = export_result(
+                name,
+                result,
+                data_dir=args.data_dir,
+                lookback_days=args.lookback_days,
+                full=args.full,
+            )
+        except (ValueError, ImportError) as e:
+            print(f"Error: {name}: {e}")
+            status = 1
+            continue
+        if report.unchanged:
+            print(f"  [=] {name} ({report.chain}): execution already exported, {report.kept} partition(s) kept")
+        else:
+            print(
+                f"  [+] {name} ({report.chain}): {report.rows:,} rows, "
+                f"{len(report.written)} partition(s) written ({report.bytes_written / 2**20:,.1f} MB), "
+                f"{report.kept} kept"
+            )
+    return status
+
+
+def cmd_show(args: argparse.Namespace) -> int:
+    manifest = read_manifest(args.name, args.data_dir)
+    if manifest is None:
+        print(f"Error: No export found for '{args.name}'")
+        return 1
+    print(f"{args.name} (partitioned by {manifest.get('partition_column') or 'chain only'})")
+    for chain, state in manifest["chains"].items():
+        days = [d for d in state["partitions"] if d and d != NULL_PARTITION]
+        span = f"{min(days)} .. {max(days)}" if days else "-"
+        exported = time.strftime("%Y-%m-%d %H:%M", time.localtime(state["exported_at"]))
+        print(
+            f"  chain={chain}: {state['rows']:,} rows in {len(state['partitions'])} partition(s), "
+            f"days {span}, exported {exported} (execution {state.get('execution_id') or '-'})"
+        )
+    return 0
+
+
+def cmd_read(args: argparse.Namespace) -> int:
+    try:
+        table = load(
+            args.name,
+            columns=args.columns.split(",") if args.columns else None,
+            filters=[parse_where(w) for w in args.where or []],
+            chains=args.chain,
+            start=args.start,
+            end=args.end,
+            data_dir=args.data_dir,
+        )
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"{table.num_rows:,} rows x {table.num_columns} columns")
+    if args.limit:
+        print(table.slice(0, args.limit).to_pandas().to_string(index=False))
+    return 0
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Export query results to partitioned Parquet and read them back",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.result_export export lending_action_ledger_unified bitcoin_tx_features_daily
+  python -m scripts.result_export export lending_flow_stitching --execute --full
+  python -m scripts.result_export show lending_action_ledger_unified
+  python -m scripts.result_export read lending_action_ledger_unified --columns block_time,entity_address,amount_usd \\
+      --start 2025-01-01 --where "action_type=borrow" --limit 10
+        """,
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(DEFAULT_DATA_DIR),
+        help="Root data directory (default: .cache/data)",
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    export_parser = subparsers.add_parser("export", help="Download results and update their datasets")
+    export_parser.add_argument("names", nargs="+", help="Registry query names")
+    export_parser.add_argument(
+        "--execute",
+        action="store_true",
+        help="Run the query instead of fetching its latest result",
+    )
+    export_parser.add_argument(
+        "--max-age-hours",
+        type=int,
+        default=8,
+        help="Maximum age of a reused latest result (default: 8)",
+    )
+    export_parser.add_argument(
+        "--lookback-days",
+        type=int,
+        default=1,
+        help="Days before the last exported day to rewrite (default: 1)",
+    )
+    export_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rewrite every partition in the result",
+    )
+
+    show_parser = subparsers.add_parser("show", help="Summarize an exported dataset")
+    show_parser.add_argument("name", help="Query name")
+
+    read_parser = subparsers.add_parser("read", help="Read an exported dataset")
+    read_parser.add_argument("name", help="Query name")
+    read_parser.add_argument("--columns", help="Comma-separated columns to read")
+    read_parser.add_argument(
+        "--where",
+        action="append",
+        help="Filter COLUMN OP VALUE, e.g. 'block_date>=2024-06-01' (repeatable)",
+    )
+    read_parser.add_argument("--chain", action="append", help="Chain partition to read (repeatable)")
+    read_parser.add_argument("--start", help="First day (YYYY-MM-DD)")
+    read_parser.add_argument("--end", help="Last day (YYYY-MM-DD)")
+    read_parser.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        help="Rows to print (default: 20, 0 for count only)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        return cmd_export(args)
+    elif args.command == "show":
+        return cmd_show(args)
+    elif args.command == "read":
+        return cmd_read(args)
+    else:
+        parser.print_help()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
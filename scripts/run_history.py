@@ -0,0 +1,353 @@
+"""
+Smoke run history and performance regression checks.
+
+Each smoke run is appended to a local SQLite database
+(``.cache/smoke_history.sqlite`` by default): one row per run and one per
+test with duration, queue/engine/fetch time, rows, bytes downloaded,
+credits and the static scan estimate of the query under test.
+
+``HistoryStore.compare`` flags tests whose engine time, fetch time, scan
+estimate or credits exceed the rolling median of their previous runs by more
+than a threshold. Total execution time includes time spent queued on Dune,
+which depends on cluster load rather than the query, so it is recorded for
+information only. Only successful, uncached runs on the same engine count
+towards a baseline.
+"""
+
+import argparse
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from scripts.registry import REPO_ROOT
+
+DEFAULT_HISTORY_PATH = REPO_ROOT / ".cache" / "smoke_history.sqlite"
+
+# Metrics compared against the rolling median, with the absolute change
+# below which a relative jump is treated as noise. execution_time_ms is not
+# one of them: it includes queue time.
+REGRESSION_METRICS = {
+    "engine_ms": 2000.0,
+    "fetch_ms": 2000.0,
+    "estimated_gb": 1.0,
+    "credits": 1.0,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    engine TEXT NOT NULL,
+    git_rev TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    name TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    cached INTEGER NOT NULL,
+    row_count INTEGER,
+    execution_time_ms INTEGER,
+    queue_ms INTEGER,
+    engine_ms INTEGER,
+    fetch_ms INTEGER,
+    bytes_received INTEGER,
+    credits REAL,
+    estimated_gb REAL,
+    error TEXT,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS results_by_name ON results (name, run_id);
+"""
+
+
+@dataclass
+class Regression:
+    """One metric of one test that exceeded its baseline."""
+
+    name: str
+    metric: str
+    value: float
+    median: float
+    samples: int
+
+    @property
+    def ratio(self) -> float:
+        return self.value / self.median if self.median else float("inf")
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+class HistoryStore:
+    """
+    SQLite-backed history of smoke runs.
+
+    Args:
+        path: Database file (created with its parent directory on first use).
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_HISTORY_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.path, timeout=30)
+        con.row_factory = sqlite3.Row
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def record_run(
+        self,
+        results: Iterable[Any],
+        engine: str = "dune",
+        estimates: dict[str, float] | None = None,
+    ) -> int:
+        """
+        Append one run.
+
+        Args:
+            results: SmokeTestResults of the run.
+            engine: Execution backend, so local and Dune timings stay apart.
+            estimates: Static scan estimate (GB) per test name.
+
+        Returns:
+            The new run id.
+        """
+        estimates = estimates or {}
+        with self._connect() as con:
+            cur = con.execute(
+                "INSERT INTO runs (started_at, engine, git_rev) VALUES (?, ?, ?)",
+                (time.time(), engine, _git_rev()),
+            )
+            run_id = cur.lastrowid
+            rows = []
+            for result in results:
+                execution = result.execution_result
+                timing = getattr(execution, "timing", None)
+                rows.append((
+                    run_id,
+                    result.name,
+                    int(result.success),
+                    int(bool(execution and execution.cached)),
+                    execution.row_count if execution else None,
+                    execution.execution_time_ms if execution else None,
+                    timing.queue_ms if timing else None,
+                    timing.engine_ms if timing else None,
+                    timing.fetch_ms if timing else None,
+                    timing.bytes_received if timing else None,
+                    getattr(execution, "credits", None),
+                    estimates.get(result.name),
+                    result.error or (execution.error if execution else None),
+                ))
+            con.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return run_id
+
+    def history(self, name: str, limit: int = 20) -> list[dict[str, Any]]:
+        """Most recent results of one test, newest first."""
+        with self._connect() as con:
+            rows = con.execute(
+                """
+                SELECT r.run_id, r.started_at, r.engine, r.git_rev, t.*
+                FROM results t JOIN runs r USING (run_id)
+                WHERE t.name = ?
+                ORDER BY r.run_id DESC
+                LIMIT ?
+                """,
+                (name, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def baseline(
+        self,
+        name: str,
+        metric: str,
+        engine: str,
+        before_run: int,
+        window: int = 10,
+    ) -> tuple[float | None, int]:
+        """
+        Rolling median of a metric over the previous ``window`` usable runs.
+
+        Returns:
+            Tuple of (median or None, number of samples).
+        """
+        if metric not in REGRESSION_METRICS:
+            raise ValueError(f"Unknown metric '{metric}'")
+        with self._connect() as con:
+            values = [
+                row[0]
+                for row in con.execute(
+                    f"""
+                    SELECT t.{metric}
+                    FROM results t JOIN runs r USING (run_id)
+                    WHERE t.name = ? AND r.engine = ? AND t.run_id < ?
+                      AND t.success = 1 AND t.cached = 0 AND t.{metric} IS NOT NULL
+                    ORDER BY t.run_id DESC
+                    LIMIT ?
+                    """,
+                    (name, engine, before_run, window),
+                )
+            ]
+        if not values:
+            return None, 0
+        return float(statistics.median(values)), len(values)
+
+    def compare(
+        self,
+        run_id: int,
+        threshold: float = 0.5,
+        window: int = 10,
+        min_samples: int = 3,
+    ) -> list[Regression]:
+        """
+        Tests in ``run_id`` whose metrics exceed ``(1 + threshold)`` x their baseline median.
+
+        Increases smaller than the metric's noise floor in ``REGRESSION_METRICS``
+        are ignored, as are tests with fewer than ``min_samples`` prior runs.
+        """
+        with self._connect() as con:
+            run = con.execute("SELECT engine FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if run is None:
+                raise ValueError(f"Run {run_id} not found")
+            current = con.execute(
+                "SELECT * FROM results WHERE run_id = ? AND success = 1 AND cached = 0 ORDER BY name",
+                (run_id,),
+            ).fetchall()
+
+        regressions = []
+        for row in current:
+            for metric, floor in REGRESSION_METRICS.items():
+                value = row[metric]
+                if value is None:
+                    continue
+                median, samples = self.baseline(row["name"], metric, run["engine"], run_id, window)
+                if median is None or samples < min_samples:
+                    continue
+                if value > median * (1 + threshold) and value - median >= floor:
+                    regressions.append(Regression(row["name"], metric, float(value), median, samples))
+        return regressions
+
+
+def scan_estimates(names: Iterable[str]) -> dict[str, float]:
+    """Static scan estimate (GB) of each registered query, from ``scripts.cost_analyzer``."""
+    from scripts.cost_analyzer import analyze_query, load_catalog
+    from scripts.registry import get_registry
+
+    registry = get_registry()
+    catalog = load_catalog()
+    estimates = {}
+    for name in names:
+        query = registry.get(name)
+        if query is None:
+            continue
+        report = analyze_query(query, catalog)
+        if report.error is None:
+            estimates[name] = report.estimated_gb
+    return estimates
+
+
+def _format_metric(metric: str, value: float) -> str:
+    if metric.endswith("_ms"):
+        return f"{value / 1000:.1f}s"
+    if metric == "estimated_gb":
+        return f"{value:,.1f} GB"
+    return f"{value:.2f}"
+
+
+def print_regressions(regressions: list[Regression], threshold: float) -> None:
+    """Print regressions against the rolling baseline."""
+    if not regressions:
+        print(f"\n[+] No regressions beyond +{threshold:.0%} of the rolling median")
+        return
+    print(f"\n[X] {len(regressions)} regression(s) beyond +{threshold:.0%} of the rolling median:")
+    for r in regressions:
+        print(
+            f"  - {r.name}: {r.metric} {_format_metric(r.metric, r.value)} "
+            f"vs median {_format_metric(r.metric, r.median)} ({r.ratio:.1f}x, {r.samples} runs)"
+        )
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Show recorded smoke run history for a test",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.run_history bitcoin_tx_features_daily
+  python -m scripts.run_history lending_flow_stitching --limit 50
+        """,
+    )
+    parser.add_argument("name", help="Smoke test (query) name")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        help="Number of recent runs to show (default: 20)",
+    )
+    parser.add_argument(
+        "--history-file",
+        default=str(DEFAULT_HISTORY_PATH),
+        help="History database (default: .cache/smoke_history.sqlite)",
+    )
+
+    args = parser.parse_args()
+    rows = HistoryStore(args.history_file).history(args.name, args.limit)
+    if not rows:
+        print(f"No recorded runs for '{args.name}'")
+        return 1
+
+    headers = ["Run", "When", "Engine", "Rev", "Status", "Rows", "Time", "Queue", "Exec", "Fetch", "Credits", "Est. GB"]
+    widths = [5, 16, 6, 9, 6, 10, 8, 8, 8, 8, 8, 8]
+    header_row = " | ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(header_row)
+    print("-" * len(header_row))
+    for row in rows:
+        status = "CACHE" if row["cached"] else ("OK" if row["success"] else "FAIL")
+        values = [
+            str(row["run_id"]),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(row["started_at"])),
+            row["engine"],
+            row["git_rev"] or "-",
+            status,
+            "-" if row["row_count"] is None else f"{row['row_count']:,}",
+            "-" if row["execution_time_ms"] is None else f"{row['execution_time_ms'] / 1000:.1f}s",
+            "-" if row["queue_ms"] is None else f"{row['queue_ms'] / 1000:.1f}s",
+            "-" if row["engine_ms"] is None else f"{row['engine_ms'] / 1000:.1f}s",
+            "-" if row["fetch_ms"] is None else f"{row['fetch_ms'] / 1000:.1f}s",
+            "-" if row["credits"] is None else f"{row['credits']:.2f}",
+            "-" if row["estimated_gb"] is None else f"{row['estimated_gb']:,.1f}",
+        ]
+        print(" | ".join(v.ljust(w) for v, w in zip(values, widths)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Dependency-aware scheduler for smoke runs and materialization refreshes.
+
+Builds a DAG from the registry ``dependencies`` fields, plus any upstream
+references found in the query SQL, and executes it in topological waves:
+every node in a wave runs concurrently, and a node is skipped when any of
+its upstream nodes failed or was skipped.
+"""
+
+from collections.abc import Callable, Collection, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any
+
+from scripts.registry import REPO_ROOT, get_registry
+from scripts.smoke_runner import SmokeTestResult, load_registry, run_smoke_test, substitute_query_ids
+from scripts.sql_references import effective_dependencies
+
+PASSED = "passed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class NodeOutcome:
+    """Outcome of one scheduled registry node."""
+
+    name: str
+    status: str
+    wave: int
+    refresh_result: Any | None = None
+    smoke_result: SmokeTestResult | None = None
+    reason: str | None = None
+
+    @property
+    def success(self) -> bool:
+        return self.status == PASSED
+
+    def as_smoke_result(self) -> SmokeTestResult:
+        """Convert to a SmokeTestResult for ``print_results``."""
+        if self.reason is None and self.smoke_result is not None:
+            return self.smoke_result
+        return SmokeTestResult(
+            name=self.name,
+            success=self.success,
+            execution_result=self.smoke_result.execution_result if self.smoke_result else None,
+            validations=self.smoke_result.validations if self.smoke_result else [],
+            error=self.reason,
+        )
+
+
+def _upstream_within(name: str, dependencies: dict[str, list[str]], names: set[str]) -> list[str]:
+    """Upstreams of ``name`` in ``names``, following edges through nodes outside it."""
+    upstream: list[str] = []
+    seen: set[str] = set()
+    stack = list(reversed(dependencies.get(name, [])))
+    while stack:
+        dep = stack.pop()
+        if dep in seen:
+            continue
+        seen.add(dep)
+        if dep in names:
+            upstream.append(dep)
+        else:
+            stack.extend(reversed(dependencies.get(dep, [])))
+    return upstream
+
+
+def build_dag(
+    queries: Iterable[dict[str, Any]],
+    dependencies: dict[str, list[str]] | None = None,
+) -> dict[str, list[str]]:
+    """
+    Build a dependency map restricted to the given queries.
+
+    Edges through queries outside the set (e.g. ones without a smoke test)
+    are collapsed, so C still depends on A when C depends on B, B depends
+    on A, and only A and C are scheduled.
+
+    Args:
+        queries: Registry query entries to schedule.
+        dependencies: Optional name -> upstream names overriding each entry's
+            ``dependencies`` field (e.g. edges derived from the SQL).
+
+    Returns:
+        Mapping of query name to the names it depends on (within the set).
+    """
+    queries = list(queries)
+    names = {q["name"] for q in queries}
+    if dependencies is None:
+        dependencies = {q["name"]: q.get("dependencies", []) for q in queries}
+    return {q["name"]: _upstream_within(q["name"], dependencies, names) for q in queries}
+
+
+def topological_waves(dag: dict[str, list[str]]) -> list[list[str]]:
+    """
+    Group DAG nodes into waves where each wave only depends on earlier ones.
+
+    Raises:
+        ValueError: If the graph contains a cycle.
+    """
+    remaining = {name: set(deps) for name, deps in dag.items()}
+    waves: list[list[str]] = []
+    done: set[str] = set()
+
+    while remaining:
+        wave = sorted(name for name, deps in remaining.items() if deps <= done)
+        if not wave:
+            raise ValueError(f"Dependency cycle among: {sorted(remaining)}")
+        waves.append(wave)
+        done.update(wave)
+        for name in wave:
+            del remaining[name]
+
+    return waves
+
+
+def select_queries(
+    registry: dict[str, Any],
+    architecture: str | None = None,
+    chain_prefix: str | None = None,
+    smoke_only: bool = True,
+    only: Collection[str] | None = None,
+) -> list[dict[str, Any]]:
+    """Select registry entries to schedule."""
+    selected = []
+    for query in registry["queries"]:
+        if only is not None and query["name"] not in only:
+            continue
+        if architecture and query.get("architecture") != architecture:
+            continue
+        if chain_prefix and not query["file"].startswith(f"queries/{chain_prefix}/"):
+            continue
+        if smoke_only and not query.get("smoke_test"):
+            continue
+        selected.append(query)
+    return selected
+
+
+def _refresh_local(query: dict[str, Any], dune_id: int, engine: Any) -> tuple[bool, Any, str | None]:
+    """Materialize a base query into the engine's ``query_<id>`` table."""
+    from scripts.incremental import materialize_refresh
+
+    print(f"  Materializing '{query['name']}' locally (query_{dune_id})...")
+    try:
+        with open(REPO_ROOT / query["file"]) as f:
+            sql = substitute_query_ids(f.read(), get_registry())
+        rows = materialize_refresh(engine, f"query_{dune_id}", sql)
+    except Exception as e:
+        return False, None, f"Refresh failed: {e}"
+    return True, rows, None
+
+
+def _refresh(query: dict[str, Any], timeout_seconds: int, engine: Any | None = None) -> tuple[bool, Any, str | None]:
+    from scripts.dune_client import execute_query
+
+    if query.get("type") != "base":
+        return True, None, None
+    dune_id = query.get("dune_query_id")
+    if not dune_id:
+        return False, None, f"Refresh failed: '{query['name']}' has no Dune query ID set"
+    if engine is not None:
+        return _refresh_local(query, dune_id, engine)
+    print(f"  Refreshing '{query['name']}' (query_{dune_id})...")
+    result = execute_query(dune_id, timeout_seconds=timeout_seconds)
+    if not result.success:
+        return False, result, f"Refresh failed: {result.error}"
+    return True, result, None
+
+
+def _run_node(
+    query: dict[str, Any],
+    wave: int,
+    timeout_seconds: int,
+    refresh: bool,
+    smoke: bool,
+    cache: Any | None,
+    engine: Any | None,
+) -> NodeOutcome:
+    refresh_result = None
+    if refresh:
+        ok, refresh_result, reason = _refresh(query, timeout_seconds, engine)
+        if not ok:
+            return NodeOutcome(query["name"], FAILED, wave, refresh_result, reason=reason)
+
+    smoke_result = None
+    if smoke and query.get("smoke_test"):
+        smoke_result = run_smoke_test(query["name"], timeout_seconds, cache, engine)
+        if not smoke_result.success:
+            return NodeOutcome(query["name"], FAILED, wave, refresh_result, smoke_result)
+
+    return NodeOutcome(query["name"], PASSED, wave, refresh_result, smoke_result)
+
+
+def run_dag(
+    architecture: str | None = None,
+    chain_prefix: str | None = None,
+    timeout_seconds: int = 300,
+    jobs: int = 8,
+    refresh: bool = False,
+    smoke: bool = True,
+    cache: Any | None = None,
+    engine: Any | None = None,
+    on_result: Callable[[NodeOutcome], None] | None = None,
+    only: Collection[str] | None = None,
+) -> list[NodeOutcome]:
+    """
+    Execute registry queries in dependency order.
+
+    Args:
+        architecture: Optional filter for query architecture ('v2', 'legacy').
+        chain_prefix: Optional directory under ``queries/`` (e.g. 'ethereum').
+        timeout_seconds: Maximum time to wait per execution.
+        jobs: Maximum concurrent nodes within a wave.
+        refresh: Re-execute base queries via ``execute_query`` before their
+            consumers, or materialize them into ``engine`` when one is given.
+        smoke: Run each node's smoke test.
+        cache: Optional ResultCache passed to smoke test executions.
+        engine: Optional local engine used instead of the Dune API.
+        on_result: Optional callback invoked as each node finishes.
+        only: Optional names to restrict scheduling to (edges through nodes
+            outside the set are collapsed onto their scheduled upstreams).
+
+    Returns:
+        NodeOutcome for every scheduled node, in wave order.
+    """
+    registry = load_registry()
+    queries = select_queries(
+        registry,
+        architecture=architecture,
+        chain_prefix=chain_prefix,
+        smoke_only=smoke and not refresh,
+        only=only,
+    )
+    by_name = {q["name"]: q for q in queries}
+    dag = build_dag(queries, effective_dependencies(get_registry()))
+    waves = topological_waves(dag)
+
+    outcomes: dict[str, NodeOutcome] = {}
+    ordered: list[NodeOutcome] = []
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1), thread_name_prefix="dag") as pool:
+        for wave_index, wave in enumerate(waves):
+            futures = {}
+            for name in wave:
+                blocked = [dep for dep in dag[name] if not outcomes[dep].success]
+                if blocked:
+                    outcome = NodeOutcome(
+                        name,
+                        SKIPPED,
+                        wave_index,
+                        reason=f"Skipped: upstream {blocked} did not pass",
+                    )
+                    outcomes[name] = outcome
+                    if on_result:
+                        on_result(outcome)
+                    continue
+                futures[name] = pool.submit(
+                    _run_node, by_name[name], wave_index, timeout_seconds, refresh, smoke, cache, engine
+                )
+
+            for future in as_completed(futures.values()):
+                outcome = future.result()
+                outcomes[outcome.name] = outcome
+                if on_result:
+                    on_result(outcome)
+
+            ordered.extend(outcomes[name] for name in wave)
+
+    return ordered
@@ -5,19 +5,14 @@ Executes smoke tests via Dune API and validates results.
 """
 
 import argparse
-import json
 import sys
+from collections.abc import Callable, Collection
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from pathlib import Path
 from typing import Any
 
-# Base path for the repository
-REPO_ROOT = Path(__file__).parent.parent
-REGISTRY_PATHS = [
-    REPO_ROOT / "queries" / "registry.bitcoin.json",
-    REPO_ROOT / "queries" / "registry.ethereum.json",
-    REPO_ROOT / "queries" / "registry.base.json",
-]
+from scripts.registry import REGISTRY_PATHS, REPO_ROOT, Registry, get_registry
+from scripts.sql_references import PlaceholderTable, placeholder_table
 
 
 @dataclass
@@ -48,28 +43,13 @@ class SmokeTestResult:
 
 
 def load_registry() -> dict[str, Any]:
-    """Load and merge all chain registries."""
-    merged_queries: list[dict[str, Any]] = []
-    for path in REGISTRY_PATHS:
-        if not path.exists():
-            raise FileNotFoundError(f"Registry not found: {path}")
-        with open(path) as f:
-            registry = json.load(f)
-        merged_queries.extend(registry.get("queries", []))
-    return {
-        "version": "1.0",
-        "description": "Merged query registry",
-        "queries": merged_queries,
-    }
+    """Load and merge all chain registries (cached until a file changes)."""
+    return get_registry().as_dict()
 
 
 def get_query_info(name: str) -> dict[str, Any] | None:
     """Get query info from registry by name."""
-    registry = load_registry()
-    for query in registry["queries"]:
-        if query["name"] == name:
-            return query
-    return None
+    return get_registry().get(name)
 
 
 def load_smoke_test_sql(test_path: str) -> str:
@@ -90,13 +70,13 @@ def load_smoke_test_sql(test_path: str) -> str:
         return f.read()
 
 
-def substitute_query_ids(sql: str, registry: dict[str, Any]) -> str:
+def substitute_query_ids(sql: str, registry: dict[str, Any] | Registry) -> str:
     """
     Substitute query_<SOME_QUERY_NAME_ID> placeholders with actual Dune IDs.
 
     Args:
         sql: SQL string with potential placeholders.
-        registry: Query registry dict.
+        registry: Query registry dict or Registry index.
 
     Returns:
         SQL with placeholders replaced.
@@ -104,35 +84,22 @@ def substitute_query_ids(sql: str, registry: dict[str, Any]) -> str:
     Raises:
         ValueError: If a dependency's query ID is not set in the registry.
     """
-    # Build a map of query names to their Dune IDs
+    # Registry indexes share one precompiled table per load
+    if isinstance(registry, Registry):
+        return placeholder_table(registry).resolve(sql)
+
     id_map = {}
     for query in registry["queries"]:
         if query["dune_query_id"]:
             id_map[query["name"]] = query["dune_query_id"]
-
-    import re
-
-    def to_query_name(token: str) -> str:
-        # BASE_LENDING_FLOW_STITCHING_ID -> base_lending_flow_stitching
-        name = token
-        if name.endswith("_ID"):
-            name = name[:-3]
-        return name.lower()
-
-    def replace_placeholder(match: re.Match) -> str:
-        token = match.group(1)
-        qname = to_query_name(token)
-        dune_id = id_map.get(qname)
-        if dune_id:
-            return f"query_{dune_id}"
-        return match.group(0)
-
-    return re.sub(r"query_<([A-Z0-9_]+)>", replace_placeholder, sql)
+    return PlaceholderTable(id_map).resolve(sql)
 
 
 def run_smoke_test(
     name: str,
     timeout_seconds: int = 300,
+    cache: Any | None = None,
+    engine: Any | None = None,
 ) -> SmokeTestResult:
     """
     Run a smoke test for a query.
@@ -140,6 +107,9 @@ def run_smoke_test(
     Args:
         name: Query name from registry.
         timeout_seconds: Maximum time to wait for execution.
+        cache: Optional ResultCache for reusing results of identical SQL.
+        engine: Optional local engine (e.g. LocalEngine) to run the SQL
+            instead of the Dune API.
 
     Returns:
         SmokeTestResult with execution and validation results.
@@ -171,15 +141,17 @@ def run_smoke_test(
         sql = load_smoke_test_sql(smoke_test_path)
 
         # Substitute query IDs if needed
-        registry = load_registry()
-        sql = substitute_query_ids(sql, registry)
+        sql = substitute_query_ids(sql, get_registry())
 
         # Execute the smoke test
         from scripts.dune_client import execute_sql
         from scripts.validators import validate_execution_success, validate_non_empty
 
         print(f"  Executing smoke test for '{name}'...")
-        result = execute_sql(sql, timeout_seconds=timeout_seconds)
+        if engine is not None:
+            result = engine.execute_sql(sql, timeout_seconds=timeout_seconds)
+        else:
+            result = execute_sql(sql, timeout_seconds=timeout_seconds, cache=cache)
 
         # Run validations
         validations = [
@@ -218,6 +190,11 @@ def run_smoke_test(
 def run_all_smoke_tests(
     architecture: str | None = None,
     timeout_seconds: int = 300,
+    jobs: int = 1,
+    on_result: Callable[[SmokeTestResult], None] | None = None,
+    cache: Any | None = None,
+    engine: Any | None = None,
+    only: Collection[str] | None = None,
 ) -> list[SmokeTestResult]:
     """
     Run all smoke tests in the registry.
@@ -225,12 +202,17 @@ def run_all_smoke_tests(
     Args:
         architecture: Optional filter for query architecture ('v2', 'legacy').
         timeout_seconds: Maximum time to wait per execution.
+        jobs: Number of smoke tests to run concurrently.
+        on_result: Optional callback invoked as each test finishes.
+        cache: Optional ResultCache for reusing results of identical SQL.
+        engine: Optional local engine to run the SQL instead of the Dune API.
+        only: Optional names to restrict the run to (e.g. queries affected by a diff).
 
     Returns:
-        List of SmokeTestResult for each query with a smoke test.
+        List of SmokeTestResult for each query with a smoke test, in registry order.
     """
     registry = load_registry()
-    results = []
+    names = []
 
     for query in registry["queries"]:
         # Filter by architecture if specified
@@ -241,10 +223,89 @@ def run_all_smoke_tests(
         if not query.get("smoke_test"):
             continue
 
-        result = run_smoke_test(query["name"], timeout_seconds)
-        results.append(result)
+        if only is not None and query["name"] not in only:
+            continue
+
+        names.append(query["name"])
+
+    if jobs <= 1:
+        results = []
+        for name in names:
+            result = run_smoke_test(name, timeout_seconds, cache, engine)
+            if on_result:
+                on_result(result)
+            results.append(result)
+        return results
+
+    by_name: dict[str, SmokeTestResult] = {}
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="smoke") as pool:
+        futures = {pool.submit(run_smoke_test, name, timeout_seconds, cache, engine): name for name in names}
+        for future in as_completed(futures):
+            result = future.result()
+            if on_result:
+                on_result(result)
+            by_name[futures[future]] = result
+
+    return [by_name[name] for name in names]
+
+
+def print_progress(result: SmokeTestResult) -> None:
+    """Print a one-line status for a finished smoke test."""
+    icon = "[+]" if result.success else "[X]"
+    elapsed = ""
+    if result.execution_result and result.execution_result.cached:
+        elapsed = " (cached)"
+    elif result.execution_result and result.execution_result.execution_time_ms is not None:
+        elapsed = f" ({result.execution_result.execution_time_ms / 1000:.1f}s{format_phases(result.execution_result)})"
+    print(f"  {icon} {result.name}{elapsed}", flush=True)
+
+
+def format_phases(result: Any) -> str:
+    """Queue/execute/fetch breakdown suffix, when the result has timings."""
+    timing = getattr(result, "timing", None)
+    if timing is None:
+        return ""
+    phases = [
+        (label, ms)
+        for label, ms in (("queue", timing.queue_ms), ("exec", timing.engine_ms), ("fetch", timing.fetch_ms))
+        if ms
+    ]
+    if not phases:
+        return ""
+    return ": " + ", ".join(f"{label} {ms / 1000:.1f}s" for label, ms in phases)
+
+
+def write_traces(writer: Any, results: list[SmokeTestResult]) -> None:
+    """Append the execution trace of each smoke test that reached an engine."""
+    for result in results:
+        if result.execution_result is not None:
+            writer.write(result.name, result.execution_result, {"smoke_test.passed": result.success})
+
+
+def record_history(
+    results: list[SmokeTestResult],
+    engine: str,
+    path: str | None = None,
+    compare: bool = False,
+    threshold: float = 0.5,
+    window: int = 10,
+) -> bool:
+    """
+    Append a run to the history store and optionally check it for regressions.
 
-    return results
+    Returns:
+        False if ``compare`` found regressions against the rolling median.
+    """
+    from scripts.run_history import DEFAULT_HISTORY_PATH, HistoryStore, print_regressions, scan_estimates
+
+    store = HistoryStore(path or DEFAULT_HISTORY_PATH)
+    run_id = store.record_run(results, engine, scan_estimates(r.name for r in results))
+    print(f"\nRecorded run {run_id} in {store.path}")
+    if not compare:
+        return True
+    regressions = store.compare(run_id, threshold=threshold, window=window)
+    print_regressions(regressions, threshold)
+    return not regressions
 
 
 def list_available_tests() -> list[dict[str, Any]]:
@@ -309,6 +370,12 @@ Examples:
   python -m scripts.smoke_runner --test bitcoin_tx_features_daily
   python -m scripts.smoke_runner --all
   python -m scripts.smoke_runner --all --architecture v2
+  python -m scripts.smoke_runner --all --jobs 8
+  python -m scripts.smoke_runner --all --dag --chain ethereum --refresh
+  python -m scripts.smoke_runner --test bitcoin_utxo_heuristics_v2 --engine local
+  python -m scripts.smoke_runner --all --jobs 8 --trace traces.jsonl --trace-format otel
+  python -m scripts.smoke_runner --all --compare-baseline --regression-threshold 0.3
+  python -m scripts.smoke_runner --changed-since origin/main --jobs 8
   python -m scripts.smoke_runner --list
         """,
     )
@@ -324,6 +391,11 @@ Examples:
         action="store_true",
         help="Run all available smoke tests",
     )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Run only smoke tests of queries changed since REF (git) and their downstream dependents",
+    )
     parser.add_argument(
         "--architecture",
         choices=["v2", "legacy"],
@@ -335,6 +407,88 @@ Examples:
         default=300,
         help="Timeout in seconds for each test (default: 300)",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of smoke tests to run concurrently (only with --all, default: 1)",
+    )
+    parser.add_argument(
+        "--dag",
+        action="store_true",
+        help="Run in dependency order (topological waves), skipping dependents of failures (only with --all)",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="With --dag, re-execute base queries before their consumers (on Dune, or locally with --engine local)",
+    )
+    parser.add_argument(
+        "--chain",
+        choices=["bitcoin", "ethereum", "base"],
+        help="With --dag, restrict to one chain's queries",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Reuse local results for identical smoke test SQL (default: --no-cache)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=24 * 3600,
+        help="Seconds a cached result stays valid (default: 86400)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["dune", "local"],
+        default="dune",
+        help="Execution backend: Dune API or local DuckDB over fixtures (default: dune)",
+    )
+    parser.add_argument(
+        "--fixtures",
+        help="Fixture directory for --engine local (default: tests/fixtures)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Append per-phase execution timings of each test to a JSON-lines file",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=["jsonl", "otel"],
+        default="jsonl",
+        help="Trace records: one flat record per test, or OpenTelemetry-style spans (default: jsonl)",
+    )
+    parser.add_argument(
+        "--history",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Append the run to the local history store (default: --history)",
+    )
+    parser.add_argument(
+        "--history-file",
+        help="History database (default: .cache/smoke_history.sqlite)",
+    )
+    parser.add_argument(
+        "--compare-baseline",
+        action="store_true",
+        help="Fail if a test's time, scan estimate or credits regressed versus its rolling median",
+    )
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=0.5,
+        help="Allowed increase over the rolling median, as a fraction (default: 0.5)",
+    )
+    parser.add_argument(
+        "--baseline-window",
+        type=int,
+        default=10,
+        help="Previous runs in the rolling median (default: 10)",
+    )
     parser.add_argument(
         "--list",
         "-l",
@@ -344,6 +498,39 @@ Examples:
 
     args = parser.parse_args()
 
+    cache = None
+    if args.cache:
+        from scripts.result_cache import ResultCache
+
+        cache = ResultCache(ttl_seconds=args.cache_ttl)
+
+    engine = None
+    if args.engine == "local":
+        from scripts.local_engine import DEFAULT_FIXTURES_DIR, LocalEngine
+
+        engine = LocalEngine(args.fixtures or DEFAULT_FIXTURES_DIR)
+
+    tracer = None
+    if args.trace:
+        from scripts.tracing import TraceWriter
+
+        tracer = TraceWriter(args.trace, args.trace_format)
+
+    def finish(results: list[SmokeTestResult]) -> bool:
+        """Write traces and history for a finished run; False on a regression."""
+        if tracer:
+            write_traces(tracer, results)
+        if not (args.history or args.compare_baseline):
+            return True
+        return record_history(
+            results,
+            args.engine,
+            args.history_file,
+            compare=args.compare_baseline,
+            threshold=args.regression_threshold,
+            window=args.baseline_window,
+        )
+
     # List mode
     if args.list:
         tests = list_available_tests()
@@ -359,24 +546,80 @@ Examples:
     # Run single test
     if args.test:
         print(f"\nRunning smoke test: {args.test}")
-        result = run_smoke_test(args.test, args.timeout)
+        result = run_smoke_test(args.test, args.timeout, cache, engine)
         print_results([result])
-        return 0 if result.success else 1
+        guarded = finish([result])
+        return 0 if result.success and guarded else 1
+
+    only = None
+    if args.changed_since:
+        from scripts.affected import affected_since, print_affected
+
+        try:
+            affected = affected_since(args.changed_since, get_registry())
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        print_affected(affected, args.changed_since)
+        if affected.unmatched:
+            # Unmapped changes under queries/ or tests/ could affect anything.
+            print("Changed files not mapped to a registry query; running all smoke tests.")
+        else:
+            only = affected.names
+            if not only:
+                print("No registry queries affected; nothing to run.")
+                return 0
+        args.all = True
+
+    # Run all tests in dependency order
+    if args.all and args.dag:
+        from scripts.scheduler import run_dag
+
+        print("\nRunning smoke tests in dependency order...")
+        outcomes = run_dag(
+            architecture=args.architecture,
+            chain_prefix=args.chain,
+            timeout_seconds=args.timeout,
+            jobs=max(args.jobs, 1),
+            refresh=args.refresh,
+            cache=cache,
+            engine=engine,
+            on_result=lambda outcome: print_progress(outcome.as_smoke_result()),
+            only=only,
+        )
+
+        if not outcomes:
+            print("No smoke tests found matching criteria.")
+            return 0
+
+        results = [outcome.as_smoke_result() for outcome in outcomes]
+        print_results(results)
+        guarded = finish(results)
+        return 0 if all(r.success for r in results) and guarded else 1
 
     # Run all tests
     if args.all:
         arch_str = f" (architecture={args.architecture})" if args.architecture else ""
         print(f"\nRunning all smoke tests{arch_str}...")
-        results = run_all_smoke_tests(args.architecture, args.timeout)
+        results = run_all_smoke_tests(
+            args.architecture,
+            args.timeout,
+            jobs=args.jobs,
+            on_result=print_progress,
+            cache=cache,
+            engine=engine,
+            only=only,
+        )
 
         if not results:
             print("No smoke tests found matching criteria.")
             return 0
 
         print_results(results)
+        guarded = finish(results)
 
-        # Return non-zero if any test failed
-        return 0 if all(r.success for r in results) else 1
+        # Return non-zero if any test failed or regressed
+        return 0 if all(r.success for r in results) and guarded else 1
 
     # No action specified
     parser.print_help()
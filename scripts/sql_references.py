@@ -0,0 +1,184 @@
+"""
+Query-to-query references derived from SQL text.
+
+Nested queries read their upstreams either by Dune ID (``query_6687961``) or
+through a registry placeholder (``query_<BASE_LENDING_FLOW_STITCHING_ID>``).
+This module scans query files for both forms (ignoring strings and
+comments), maps them back to registry names to derive the real dependency
+graph, and reports where the hand-maintained ``dependencies`` fields drift
+from it.
+
+``PlaceholderTable`` resolves placeholders to ``query_<id>`` from a table
+built once per registry load instead of per SQL string.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from scripts.cost_analyzer import mask_sql
+from scripts.registry import REPO_ROOT, Registry
+
+QUERY_ID_REF = re.compile(r"\bquery_(\d+)\b")
+PLACEHOLDER_REF = re.compile(r"\bquery_<([A-Z0-9_]+)>")
+
+
+def placeholder_name(token: str) -> str:
+    """Registry name a placeholder token refers to (BASE_LENDING_FLOW_STITCHING_ID -> base_lending_flow_stitching)."""
+    if token.endswith("_ID"):
+        token = token[:-3]
+    return token.lower()
+
+
+@dataclass
+class QueryReferences:
+    """Upstream references found in one SQL text."""
+
+    ids: set[int] = field(default_factory=set)
+    placeholders: set[str] = field(default_factory=set)
+
+
+def scan_sql(sql: str) -> QueryReferences:
+    """Find ``query_<id>`` and ``query_<PLACEHOLDER>`` references outside strings and comments."""
+    masked = mask_sql(sql)
+    return QueryReferences(
+        ids={int(m.group(1)) for m in QUERY_ID_REF.finditer(masked)},
+        placeholders={m.group(1) for m in PLACEHOLDER_REF.finditer(masked)},
+    )
+
+
+class PlaceholderTable:
+    """
+    Precompiled placeholder -> ``query_<id>`` substitutions for a registry.
+
+    Both ``<NAME_ID>`` and ``<NAME>`` spellings map to the same query.
+    Placeholders whose query has no Dune ID yet are left untouched.
+    """
+
+    def __init__(self, id_map: dict[str, int]):
+        self.table: dict[str, str] = {}
+        for name, dune_id in id_map.items():
+            token = name.upper()
+            self.table[token] = f"query_{dune_id}"
+            self.table[f"{token}_ID"] = f"query_{dune_id}"
+
+    def _replace(self, match: re.Match) -> str:
+        return self.table.get(match.group(1), match.group(0))
+
+    def resolve(self, sql: str) -> str:
+        """Substitute every known placeholder in one pass."""
+        if "query_<" not in sql:
+            return sql
+        return PLACEHOLDER_REF.sub(self._replace, sql)
+
+    def unresolved(self, sql: str) -> set[str]:
+        """Placeholders in ``sql`` that this table cannot resolve."""
+        return {m.group(1) for m in PLACEHOLDER_REF.finditer(sql) if m.group(1) not in self.table}
+
+
+@lru_cache(maxsize=8)
+def placeholder_table(registry: Registry) -> PlaceholderTable:
+    """Placeholder table for a registry index, built once per loaded registry."""
+    return PlaceholderTable(registry.id_map)
+
+
+@dataclass
+class DerivedDependencies:
+    """Dependencies of one query as found in its SQL."""
+
+    name: str
+    dependencies: set[str] = field(default_factory=set)
+    unknown_ids: set[int] = field(default_factory=set)
+    unknown_placeholders: set[str] = field(default_factory=set)
+    error: str | None = None
+
+
+@lru_cache(maxsize=8)
+def derive_dependencies(registry: Registry) -> dict[str, DerivedDependencies]:
+    """
+    Scan every registered query file and map its references to registry names.
+
+    Returns:
+        Query name -> DerivedDependencies, in registry order.
+    """
+    by_id = {dune_id: name for name, dune_id in registry.id_map.items()}
+    derived: dict[str, DerivedDependencies] = {}
+    for query in registry.queries:
+        name = query["name"]
+        entry = DerivedDependencies(name)
+        derived[name] = entry
+        try:
+            with open(REPO_ROOT / query["file"]) as f:
+                refs = scan_sql(f.read())
+        except FileNotFoundError:
+            entry.error = f"Query file not found: {query['file']}"
+            continue
+
+        for dune_id in refs.ids:
+            if dune_id in by_id:
+                entry.dependencies.add(by_id[dune_id])
+            else:
+                entry.unknown_ids.add(dune_id)
+        for token in refs.placeholders:
+            target = placeholder_name(token)
+            if registry.get(target):
+                entry.dependencies.add(target)
+            else:
+                entry.unknown_placeholders.add(token)
+        entry.dependencies.discard(name)
+    return derived
+
+
+@dataclass
+class DependencyDrift:
+    """Difference between declared and SQL-derived dependencies of one query."""
+
+    name: str
+    missing: list[str]
+    extra: list[str]
+    unknown_ids: list[int]
+    unknown_placeholders: list[str]
+
+    @property
+    def messages(self) -> list[str]:
+        msgs = []
+        if self.missing:
+            msgs.append(f"SQL references undeclared dependencies: {self.missing}")
+        if self.extra:
+            msgs.append(f"Declared dependencies not referenced in SQL: {self.extra}")
+        if self.unknown_ids:
+            msgs.append(f"References query IDs not in registry: {self.unknown_ids}")
+        if self.unknown_placeholders:
+            msgs.append(f"Placeholders match no registry query: {self.unknown_placeholders}")
+        return msgs
+
+
+def dependency_drift(registry: Registry) -> list[DependencyDrift]:
+    """Queries whose registry ``dependencies`` disagree with their SQL."""
+    drift = []
+    for name, derived in derive_dependencies(registry).items():
+        if derived.error:
+            continue
+        declared = set(registry.dependencies(name))
+        entry = DependencyDrift(
+            name=name,
+            missing=sorted(derived.dependencies - declared),
+            extra=sorted(declared - derived.dependencies),
+            unknown_ids=sorted(derived.unknown_ids),
+            unknown_placeholders=sorted(derived.unknown_placeholders),
+        )
+        if entry.messages:
+            drift.append(entry)
+    return drift
+
+
+def effective_dependencies(registry: Registry) -> dict[str, list[str]]:
+    """Declared dependencies plus any extra edges found in the SQL, per query."""
+    derived = derive_dependencies(registry)
+    graph = {}
+    for query in registry.queries:
+        name = query["name"]
+        deps = list(query.get("dependencies", []))
+        deps.extend(sorted(derived[name].dependencies - set(deps)))
+        graph[name] = deps
+    return graph
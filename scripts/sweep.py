@@ -0,0 +1,379 @@
+"""
+Parameter sweeps over templated query constants.
+
+Renders one lending template for every combination of a grid of constant
+values (e.g. the cross-tx stitch window in ``lending_flow_stitching`` or the
+loop continuation window in ``lending_loop_detection``), executes the
+variants concurrently and tabulates output cardinality, execution time and
+credits per variant.
+
+Variants are rendered through ``scripts.chain_templates`` and executed with
+``scripts.dune_async`` (or a local engine). A static scan estimate from
+``scripts.cost_analyzer`` can be used to skip variants over a budget before
+anything is submitted.
+"""
+
+import argparse
+import itertools
+import re
+import sys
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any
+
+from scripts.chain_templates import get_renderer, load_chain_config
+from scripts.dune_client import ExecutionResult
+
+_DURATION = re.compile(r"^(\d+)\s*(s|m|h|d)$", re.IGNORECASE)
+_DURATION_UNITS = {"s": "SECOND", "m": "MINUTE", "h": "HOUR", "d": "DAY"}
+
+
+def parse_value(value: str) -> str:
+    """Expand duration shorthand (``30s``, ``2m``, ``1h``, ``2d``) to an INTERVAL literal."""
+    match = _DURATION.match(value.strip())
+    if match:
+        return f"INTERVAL '{match.group(1)}' {_DURATION_UNITS[match.group(2).lower()]}"
+    return value.strip()
+
+
+_INTERVAL_LITERAL = re.compile(r"^INTERVAL\s+'(\d+)'\s+(SECOND|MINUTE|HOUR|DAY)$", re.IGNORECASE)
+_UNIT_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+
+
+def interval_seconds(value: str) -> int:
+    """
+    Length in seconds of a duration shorthand or ``INTERVAL 'n' UNIT`` literal.
+
+    Raises:
+        ValueError: If ``value`` is neither.
+    """
+    match = _INTERVAL_LITERAL.match(parse_value(value))
+    if not match:
+        raise ValueError(f"Invalid duration '{value}', expected e.g. 90s, 2m, 1h or INTERVAL '1' HOUR")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2).upper()]
+
+
+def parse_grid(specs: list[str]) -> dict[str, list[str]]:
+    """
+    Parse ``NAME=V1,V2,...`` specs into a grid.
+
+    Raises:
+        ValueError: If a spec has no ``=`` or no values.
+    """
+    grid: dict[str, list[str]] = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        parsed = [parse_value(v) for v in values.split(",") if v.strip()]
+        if not sep or not name.strip() or not parsed:
+            raise ValueError(f"Invalid sweep spec '{spec}', expected NAME=V1,V2,...")
+        grid.setdefault(name.strip(), []).extend(parsed)
+    return grid
+
+
+def expand_grid(grid: dict[str, list[str]]) -> list[dict[str, str]]:
+    """Cartesian product of a grid, in the order the values were given."""
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+
+def count_only(sql: str) -> str:
+    """Wrap a query so only its row count is returned."""
+    body = sql.strip().rstrip(";")
+    return f"SELECT COUNT(*) AS row_count FROM (\n{body}\n) AS sweep_variant"
+
+
+@dataclass
+class SweepVariant:
+    """One rendered point of the grid."""
+
+    key: str
+    overrides: dict[str, str]
+    sql: str
+    is_baseline: bool = False
+    estimated_gb: float | None = None
+    skipped: str | None = None
+    result: ExecutionResult | None = None
+
+    @property
+    def row_count(self) -> int | None:
+        """Output cardinality (from the COUNT(*) wrapper when used)."""
+        if self.result is None or not self.result.success:
+            return None
+        rows = self.result.rows
+        if len(rows) == 1 and set(rows[0]) == {"row_count"}:
+            return int(rows[0]["row_count"])
+        return self.result.row_count
+
+
+def build_variants(
+    template: str,
+    chain: str,
+    grid: dict[str, list[str]],
+    counts: bool = True,
+    include_baseline: bool = True,
+) -> list[SweepVariant]:
+    """
+    Render a template once per grid point.
+
+    Args:
+        template: Template name under ``queries/templates/lending``.
+        chain: Chain config to start from.
+        grid: Constant name -> candidate values.
+        counts: Wrap each variant in ``SELECT COUNT(*)`` instead of fetching rows.
+        include_baseline: Add the chain config's own values as the first variant.
+
+    Raises:
+        KeyError: If a grid constant is not defined by the chain config.
+    """
+    config = load_chain_config(chain)
+    constants = config.get("constants", {})
+    for name in grid:
+        if name not in constants:
+            raise KeyError(f"'{name}' is not a constant of the {chain} config")
+    if template not in config.get("templates", []):
+        raise KeyError(f"Template '{template}' is not rendered for {chain}")
+
+    points = expand_grid(grid)
+    baseline = {name: constants[name] for name in grid}
+    if include_baseline and baseline not in points:
+        points.insert(0, baseline)
+
+    renderer = get_renderer()
+    variants = []
+    for i, overrides in enumerate(points):
+        sql = renderer.render_chain({**config, "templates": [template]}, overrides)[template]
+        key = ", ".join(f"{k}={v}" for k, v in overrides.items()) or f"variant_{i}"
+        variants.append(SweepVariant(
+            key=key,
+            overrides=overrides,
+            sql=count_only(sql) if counts else sql,
+            is_baseline=overrides == baseline,
+        ))
+    return variants
+
+
+def apply_budget(variants: list[SweepVariant], max_gb: float | None) -> None:
+    """Attach static scan estimates and mark variants over ``max_gb`` as skipped."""
+    from scripts.cost_analyzer import analyze_sql, load_catalog
+
+    catalog = load_catalog()
+    for variant in variants:
+        variant.estimated_gb = analyze_sql(variant.sql, catalog).estimated_gb
+        if max_gb is not None and variant.estimated_gb > max_gb:
+            variant.skipped = f"estimated scan {variant.estimated_gb:,.1f} GB exceeds budget {max_gb:g} GB"
+
+
+def run_sweep(
+    variants: list[SweepVariant],
+    timeout_seconds: int = 300,
+    max_in_flight: int = 8,
+    engine: Any | None = None,
+    on_result: Callable[[SweepVariant], None] | None = None,
+) -> list[SweepVariant]:
+    """
+    Execute every non-skipped variant concurrently.
+
+    Uses ``AsyncDuneClient`` against the API, or a thread pool over
+    ``engine.execute_sql`` when a local engine is given. Locally, upstream
+    ``query_<id>`` tables are materialized first and ``previous.query.result``
+    reads an empty result, as on an incremental query's first run.
+
+    Raises:
+        RuntimeError: If an upstream query cannot be materialized locally.
+        ValueError: If no Dune API key is configured.
+    """
+    pending = {v.key: v for v in variants if v.skipped is None}
+
+    if engine is not None:
+        from scripts.incremental import PREV_TABLE, materialize_upstreams, prepare_previous_result
+
+        local_sql = {}
+        for key, v in pending.items():
+            materialize_upstreams(engine, v.sql)
+            local_sql[key] = prepare_previous_result(engine, v.sql, f"{PREV_TABLE}_sweep")
+        with ThreadPoolExecutor(max_workers=max(max_in_flight, 1), thread_name_prefix="sweep") as pool:
+            futures = {
+                pool.submit(engine.execute_sql, local_sql[key], timeout_seconds=timeout_seconds): v
+                for key, v in pending.items()
+            }
+            for future in as_completed(futures):
+                variant = futures[future]
+                variant.result = future.result()
+                if on_result:
+                    on_result(variant)
+        return variants
+
+    import asyncio
+
+    from scripts.dune_async import AsyncDuneClient, ExecutionJob
+
+    async def _main() -> None:
+        async with AsyncDuneClient(max_in_flight=max_in_flight) as client:
+            jobs = [ExecutionJob(key, sql=v.sql, timeout_seconds=timeout_seconds) for key, v in pending.items()]
+            async for key, result in client.iter_completed(jobs):
+                pending[key].result = result
+                if on_result:
+                    on_result(pending[key])
+
+    asyncio.run(_main())
+    return variants
+
+
+def print_sweep(variants: list[SweepVariant]) -> None:
+    """Print one row per variant: cardinality, time, credits and scan estimate."""
+    headers = ["Variant", "Status", "Rows", "Time", "Credits", "Est. GB"]
+    labels = [("* " if v.is_baseline else "") + v.key for v in variants]
+    widths = [max([len(headers[0]), *map(len, labels)]), 8, 12, 8, 8, 8]
+    header_row = " | ".join(h.ljust(w) for h, w in zip(headers, widths))
+    print(header_row)
+    print("-" * len(header_row))
+    for label, v in zip(labels, variants):
+        result = v.result
+        if v.skipped:
+            status = "SKIP"
+        elif result is None:
+            status = "-"
+        else:
+            status = "OK" if result.success else "FAIL"
+        row = [
+            label,
+            status,
+            "-" if v.row_count is None else f"{v.row_count:,}",
+            "-" if result is None or result.execution_time_ms is None else f"{result.execution_time_ms / 1000:.1f}s",
+            "-" if result is None or result.credits is None else f"{result.credits:.2f}",
+            "-" if v.estimated_gb is None else f"{v.estimated_gb:,.1f}",
+        ]
+        print(" | ".join(val.ljust(w) for val, w in zip(row, widths)))
+
+    finished = [v.result for v in variants if v.result is not None]
+    credits = [r.credits for r in finished if r.credits is not None]
+    print("-" * len(header_row))
+    print(
+        f"{len(finished)} executed, {sum(1 for v in variants if v.skipped)} skipped"
+        + (f", {sum(credits):.2f} credits" if credits else "")
+    )
+    for v in variants:
+        if v.skipped:
+            print(f"  [skip] {v.key}: {v.skipped}")
+        elif v.result is not None and not v.result.success:
+            print(f"  [fail] {v.key}: {v.result.error}")
+    if any(v.is_baseline for v in variants):
+        print("\n* = current chain config")
+
+
+def main() -> int:
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(
+        description="Sweep templated query constants and compare the variants",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.sweep lending_flow_stitching --vary stitch_window=1m,2m,5m
+  python -m scripts.sweep lending_loop_detection --vary loop_continuation_window=30m,1h,2h
+  python -m scripts.sweep lending_flow_stitching --chain ethereum \\
+      --vary stitch_window=1m,2m --vary lookback_window=1d,2d --max-gb 50
+        """,
+    )
+    parser.add_argument("template", help="Template name under queries/templates/lending")
+    parser.add_argument(
+        "--chain",
+        default="ethereum",
+        help="Chain config to start from (default: ethereum)",
+    )
+    parser.add_argument(
+        "--vary",
+        action="append",
+        required=True,
+        metavar="NAME=V1,V2",
+        help="Constant and candidate values (durations like 30s/2m/1h/2d expand to INTERVALs; repeatable)",
+    )
+    parser.add_argument(
+        "--rows",
+        action="store_true",
+        help="Fetch full results instead of wrapping each variant in SELECT COUNT(*)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=8,
+        help="Variants executing at once (default: 8)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=600,
+        help="Timeout in seconds per variant (default: 600)",
+    )
+    parser.add_argument(
+        "--max-gb",
+        type=float,
+        dest="max_gb",
+        help="Skip variants whose static scan estimate exceeds this many GB",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Append per-phase execution timings of each variant to a JSON-lines file",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=["jsonl", "otel"],
+        default="jsonl",
+        help="Trace records: flat records or OpenTelemetry-style spans (default: jsonl)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["dune", "local"],
+        default="dune",
+        help="Execution backend: Dune API or local DuckDB over fixtures (default: dune)",
+    )
+    parser.add_argument(
+        "--fixtures",
+        help="Fixture directory for --engine local (default: tests/fixtures)",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        grid = parse_grid(args.vary)
+        variants = build_variants(args.template, args.chain, grid, counts=not args.rows)
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    apply_budget(variants, args.max_gb)
+
+    engine = None
+    if args.engine == "local":
+        from scripts.local_engine import DEFAULT_FIXTURES_DIR, LocalEngine
+
+        engine = LocalEngine(args.fixtures or DEFAULT_FIXTURES_DIR)
+
+    print(f"\nSweeping {args.template} ({args.chain}): {len(variants)} variant(s)")
+    try:
+        run_sweep(
+            variants,
+            timeout_seconds=args.timeout,
+            max_in_flight=args.jobs,
+            engine=engine,
+            on_result=lambda v: print(f"  [{'+' if v.result.success else 'X'}] {v.key}"),
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}")
+        return 1
+    print()
+    print_sweep(variants)
+    if args.trace:
+        from scripts.tracing import TraceWriter
+
+        tracer = TraceWriter(args.trace, args.trace_format)
+        for v in variants:
+            if v.result is not None:
+                tracer.write(args.template, v.result, {"sweep.variant": v.key, "sweep.chain": args.chain})
+    return 0 if all(v.skipped or (v.result and v.result.success) for v in variants) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
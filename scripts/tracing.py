@@ -0,0 +1,165 @@
+"""
+Execution traces written to a local file.
+
+Every ``ExecutionResult`` carries an ``ExecutionTiming`` with submit, wait,
+queue, engine and fetch phases. ``TraceWriter`` appends them to a JSON-lines
+file in one of two shapes:
+
+- ``jsonl``: one flat record per execution.
+- ``otel``: OpenTelemetry-style spans, one per line. Each execution is a
+  ``dune.execution`` root span with ``submit``, ``wait`` and ``fetch``
+  children; ``queue`` and ``execute`` children sit under ``wait`` when the
+  API reported them. Those are laid out backwards from the end of the wait
+  using the reported durations (the API clock is not the local one), and
+  the untrimmed value is kept as ``dune.reported_ms``.
+"""
+
+import dataclasses
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from scripts.dune_client import ExecutionResult
+
+TRACE_FORMATS = ("jsonl", "otel")
+
+
+def _span_id(bits: int = 64) -> str:
+    return os.urandom(bits // 8).hex()
+
+
+def _nanos(seconds: float) -> int:
+    return int(seconds * 1_000_000_000)
+
+
+def trace_record(name: str, result: ExecutionResult, attributes: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Flat per-execution record (the ``jsonl`` format)."""
+    timing = result.timing
+    return {
+        "name": name,
+        "execution_id": result.execution_id,
+        "state": result.state,
+        "success": result.success,
+        "cached": result.cached,
+        "row_count": result.row_count,
+        "credits": result.credits,
+        "execution_time_ms": result.execution_time_ms,
+        "error": result.error,
+        "timing": dataclasses.asdict(timing) if timing is not None else None,
+        **(attributes or {}),
+    }
+
+
+def trace_spans(name: str, result: ExecutionResult, attributes: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+    """OpenTelemetry-style spans for one execution (the ``otel`` format)."""
+    timing = result.timing
+    start = timing.started_at if timing is not None and timing.started_at is not None else time.time()
+    total_ms = result.execution_time_ms or 0
+    trace_id = _span_id(128)
+    root_id = _span_id()
+    status = {"code": "OK"} if result.success else {"code": "ERROR", "message": result.error or result.state}
+
+    root_attributes = {
+        "query.name": name,
+        "dune.execution_id": result.execution_id,
+        "dune.state": result.state,
+        "dune.cached": result.cached,
+        "dune.row_count": result.row_count,
+        "dune.credits": result.credits,
+        **(attributes or {}),
+    }
+    if timing is not None:
+        root_attributes.update({
+            "dune.poll_count": timing.poll_count,
+            "http.request_count": timing.request_count,
+            "http.request.body.size": timing.bytes_sent,
+            "http.response.body.size": timing.bytes_received,
+            "json.decode_ms": round(timing.decode_ms, 3),
+        })
+
+    def span(span_name: str, begin_ms: float, duration_ms: float, parent: str, attrs: dict | None = None) -> dict:
+        return {
+            "traceId": trace_id,
+            "spanId": _span_id(),
+            "parentSpanId": parent,
+            "name": span_name,
+            "kind": "SPAN_KIND_CLIENT",
+            "startTimeUnixNano": _nanos(start + begin_ms / 1000),
+            "endTimeUnixNano": _nanos(start + (begin_ms + duration_ms) / 1000),
+            "attributes": attrs or {},
+            "status": {"code": "UNSET"},
+        }
+
+    root = {
+        "traceId": trace_id,
+        "spanId": root_id,
+        "parentSpanId": None,
+        "name": "dune.execution",
+        "kind": "SPAN_KIND_CLIENT",
+        "startTimeUnixNano": _nanos(start),
+        "endTimeUnixNano": _nanos(start + total_ms / 1000),
+        "attributes": root_attributes,
+        "status": status,
+    }
+    spans = [root]
+    if timing is None:
+        return spans
+
+    offset = 0.0
+    if timing.submit_ms is not None:
+        spans.append(span("submit", offset, timing.submit_ms, root_id))
+        offset += timing.submit_ms
+    if timing.wait_ms is not None:
+        wait = span("wait", offset, timing.wait_ms, root_id, {"dune.poll_count": timing.poll_count})
+        spans.append(wait)
+        # The engine finished just before the terminal status poll, so lay
+        # execute then queue out backwards from the end of the wait.
+        inner_end = offset + timing.wait_ms
+        phases = []
+        for phase, reported in (("execute", timing.engine_ms), ("queue", timing.queue_ms)):
+            if reported is not None:
+                begin = max(inner_end - reported, offset)
+                phases.append(span(phase, begin, inner_end - begin, wait["spanId"], {"dune.reported_ms": reported}))
+                inner_end = begin
+        spans.extend(reversed(phases))
+        offset += timing.wait_ms
+    if timing.fetch_ms is not None:
+        spans.append(span("fetch", offset, timing.fetch_ms, root_id, {
+            "http.response.body.size": timing.bytes_received,
+            "json.decode_ms": round(timing.decode_ms, 3),
+        }))
+    return spans
+
+
+class TraceWriter:
+    """
+    Thread-safe appender of execution traces.
+
+    Args:
+        path: JSON-lines file to append to (parent directories are created).
+        fmt: ``jsonl`` for flat records or ``otel`` for spans.
+
+    Raises:
+        ValueError: If ``fmt`` is not a known trace format.
+    """
+
+    def __init__(self, path: Path | str, fmt: str = "jsonl"):
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format '{fmt}', expected one of {TRACE_FORMATS}")
+        self.path = Path(path)
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name: str, result: ExecutionResult, attributes: dict[str, Any] | None = None) -> None:
+        """Append the trace of one execution."""
+        if self.fmt == "otel":
+            entries = trace_spans(name, result, attributes)
+        else:
+            entries = [trace_record(name, result, attributes)]
+        text = "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+        with self._lock, open(self.path, "a") as f:
+            f.write(text)
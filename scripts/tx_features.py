@@ -0,0 +1,684 @@
+"""
+Vectorized recomputation of ``bitcoin_tx_features_daily`` classifiers.
+
+Recomputes the query's per-transaction features offline from exported
+``bitcoin.inputs``/``bitcoin.outputs`` rows, one day at a time:
+
+- aggregates: input/output counts and values, fee, dust and round-value
+  counts, ``avg_days_held``;
+- classifiers: ``human_factor_score``, ``score_band``, ``cohort``,
+  ``intent``, ``has_address_reuse`` and ``output_type_mismatch``.
+
+All CASE expressions are evaluated with NumPy over whole batches. Their
+thresholds and weights live in ``ScoringRules``, so history can be
+re-scored under new rules without a full-history rescan on Dune. Rules that
+only need the aggregates can also be applied to the exported query result
+itself (``--rescore``), without the raw inputs and outputs.
+
+``avg_days_held`` follows Trino's decimal semantics: ``blocks / 144.0``
+keeps one decimal place and ``AVG`` rounds half up to one decimal. The
+1-day and 365-day boundaries therefore fall where they do on Dune, not
+where float division would put them.
+"""
+
+import argparse
+import dataclasses
+import datetime
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from scripts.flow_stitcher import hex_text
+from scripts.loop_detector import to_micros
+
+INPUT_COLUMNS = [
+    "block_time",
+    "tx_id",
+    "block_height",
+    "spent_block_height",
+    "value",
+    "address",
+    "type",
+    "is_coinbase",
+]
+
+OUTPUT_COLUMNS = ["block_time", "tx_id", "value", "address", "type"]
+
+FEATURE_COLUMNS = [
+    "day",
+    "tx_id",
+    "input_count",
+    "output_count",
+    "total_input_btc",
+    "total_output_btc",
+    "fee_btc",
+    "dust_output_count",
+    "round_value_count",
+    "avg_days_held",
+    "human_factor_score",
+    "score_band",
+    "score_band_order",
+    "cohort",
+    "cohort_order",
+    "intent",
+    "has_address_reuse",
+    "output_type_mismatch",
+]
+
+CLASSIFIER_COLUMNS = [
+    "human_factor_score",
+    "score_band",
+    "cohort",
+    "intent",
+    "has_address_reuse",
+    "output_type_mismatch",
+]
+
+# Aggregates ``classify`` needs; the exported query result has all of them.
+AGGREGATE_COLUMNS = [
+    "input_count",
+    "output_count",
+    "total_input_btc",
+    "dust_output_count",
+    "round_value_count",
+    "avg_days_held",
+]
+
+# Rules applied to output values, which the query result only has as counts.
+RAW_ONLY_RULES = ("dust_btc", "round_unit_btc")
+
+COHORT_NAMES = ["Shrimps", "Crab", "Octopus", "Fish", "Dolphin", "Shark", "Whale", "Humpback"]
+
+BLOCKS_PER_DAY = 144
+_DAY_US = 86_400_000_000
+
+
+@dataclass(frozen=True)
+class ScoringRules:
+    """Thresholds and weights of the query's CASE expressions (defaults match the SQL)."""
+
+    base_score: int = 50
+    high_fan_in_inputs: int = 50
+    high_fan_out_outputs: int = 50
+    high_fan_in_weight: int = -15
+    high_fan_out_weight: int = -15
+    round_values_weight: int = -5
+    dust_weight: int = -10
+    simple_structure_weight: int = 10
+    no_round_values_weight: int = 5
+    held_weight: int = 10
+    long_held_weight: int = 15
+    held_min_days: float = 1.0
+    long_held_days: float = 365.0
+    dust_btc: float = 0.00000546
+    round_unit_btc: float = 0.001
+    consolidation_min_inputs: int = 10
+    fan_out_min_outputs: int = 10
+    coinjoin_min_io: int = 5
+    band_edges: tuple[int, ...] = (10, 20, 30, 40, 50, 60, 70, 80, 90)
+    cohort_edges_btc: tuple[float, ...] = (1.0, 10.0, 50.0, 100.0, 500.0, 1000.0, 5000.0)
+
+    def __post_init__(self) -> None:
+        for name in ("band_edges", "cohort_edges_btc"):
+            edges = getattr(self, name)
+            if list(edges) != sorted(set(edges)):
+                raise ValueError(f"{name} must be strictly increasing")
+        if len(self.cohort_edges_btc) != len(COHORT_NAMES) - 1:
+            raise ValueError(f"cohort_edges_btc needs {len(COHORT_NAMES) - 1} edges, one per cohort boundary")
+
+    @property
+    def score_bands(self) -> list[str]:
+        """Band labels in ``score_band_order`` order ('0-10' ... '90-100')."""
+        bounds = [0, *self.band_edges, 100]
+        return [f"{lo}-{hi}" for lo, hi in zip(bounds, bounds[1:])]
+
+    @property
+    def cohorts(self) -> list[str]:
+        """Cohort labels in ``cohort_order`` order ('Shrimps (<1 BTC)' ...)."""
+        edges = [_btc(e) for e in self.cohort_edges_btc]
+        middle = [f"{name} ({lo}-{hi} BTC)" for name, lo, hi in zip(COHORT_NAMES[1:-1], edges, edges[1:])]
+        return [f"{COHORT_NAMES[0]} (<{edges[0]} BTC)", *middle, f"{COHORT_NAMES[-1]} (>{edges[-1]} BTC)"]
+
+    def replace(self, overrides: dict[str, str]) -> "ScoringRules":
+        """
+        Copy with ``NAME=VALUE`` overrides parsed to each field's type.
+
+        Raises:
+            ValueError: If a name is unknown or a value does not parse.
+        """
+        fields = {f.name: f for f in dataclasses.fields(self)}
+        changes: dict[str, Any] = {}
+        for name, value in overrides.items():
+            if name not in fields:
+                raise ValueError(f"Unknown rule '{name}', expected one of: {', '.join(fields)}")
+            current = getattr(self, name)
+            try:
+                if isinstance(current, tuple):
+                    changes[name] = tuple(type(current[0])(v) for v in value.split(","))
+                else:
+                    changes[name] = type(current)(value)
+            except ValueError as e:
+                raise ValueError(f"Invalid value '{value}' for rule '{name}'") from e
+        return dataclasses.replace(self, **changes)
+
+
+def _btc(value: float) -> str:
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,}"
+
+
+DEFAULT_RULES = ScoringRules()
+SCORE_BANDS = DEFAULT_RULES.score_bands
+COHORTS = DEFAULT_RULES.cohorts
+
+
+def parse_rules(specs: list[str], rules: ScoringRules = DEFAULT_RULES) -> ScoringRules:
+    """
+    Apply ``NAME=VALUE`` specs (lists as ``NAME=V1,V2,...``) to ``rules``.
+
+    Raises:
+        ValueError: If a spec is malformed or names an unknown rule.
+    """
+    overrides = {}
+    for spec in specs:
+        name, sep, value = spec.partition("=")
+        if not sep or not name.strip() or not value.strip():
+            raise ValueError(f"Invalid rule '{spec}', expected NAME=VALUE")
+        overrides[name.strip()] = value.strip()
+    return rules.replace(overrides)
+
+
+def _round_half_up(numerator: np.ndarray, denominator: np.ndarray | int) -> np.ndarray:
+    """``numerator / denominator`` rounded half away from zero, in integers (denominator > 0)."""
+    return np.sign(numerator) * ((np.abs(numerator) * 2 + denominator) // (2 * denominator))
+
+
+def _counts(codes: np.ndarray, size: int, weights: np.ndarray | None = None) -> np.ndarray:
+    counts = np.bincount(codes, weights=weights, minlength=size)
+    return counts if weights is None else counts.astype(np.float64)
+
+
+def _sorted_codes(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Codes of ``values`` in sorted order (-1 for null) and the sorted distinct values."""
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=object)
+    order = np.argsort(uniques)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return np.where(codes >= 0, rank[codes], -1), uniques[order]
+
+
+def _distinct_per_tx(codes: np.ndarray, values: pd.Series, size: int) -> np.ndarray:
+    """Distinct non-null ``values`` per transaction code (``COUNT(DISTINCT ...)``)."""
+    value_codes = pd.factorize(values)[0]
+    valid = value_codes >= 0
+    span = int(value_codes.max()) + 1 if len(value_codes) else 1
+    pairs = np.sort(codes[valid].astype(np.int64) * span + value_codes[valid])
+    distinct = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+    return _counts(distinct // span, size)
+
+
+def tx_aggregates(inputs: pd.DataFrame, outputs: pd.DataFrame, rules: ScoringRules = DEFAULT_RULES) -> pd.DataFrame:
+    """
+    Per-transaction aggregates of ``bitcoin.inputs``/``bitcoin.outputs`` rows.
+
+    Transactions are keyed by (day of ``block_time``, ``tx_id``). Coinbase
+    inputs are dropped, and only transactions with inputs are kept, as in the
+    query's ``tx_input_stats LEFT JOIN tx_output_stats``.
+
+    Returns:
+        One row per transaction, ordered by day and tx_id, with ``day``,
+        ``tx_id``, ``AGGREGATE_COLUMNS``, ``total_output_btc``, ``fee_btc``,
+        ``has_address_reuse`` and ``output_type_mismatch``.
+
+    Raises:
+        ValueError: If columns are missing.
+    """
+    for label, frame, required in (("Input", inputs, INPUT_COLUMNS), ("Output", outputs, OUTPUT_COLUMNS)):
+        missing = [c for c in required if c not in frame.columns]
+        if missing:
+            raise ValueError(f"{label} rows are missing columns: {missing}")
+    # is_coinbase = FALSE drops NULLs too.
+    inputs = inputs.loc[inputs["is_coinbase"].astype("boolean").eq(False).fillna(False).to_numpy(dtype=bool), INPUT_COLUMNS]
+
+    # Transaction keys: (day, tx_id) over both sides, tx_id codes in byte order.
+    tx_codes, tx_ids = _sorted_codes(pd.concat([inputs["tx_id"], outputs["tx_id"]], ignore_index=True))
+    span = int(tx_codes.max()) + 2 if len(tx_codes) else 1
+    days = np.concatenate([to_micros(inputs["block_time"]), to_micros(outputs["block_time"])]) // _DAY_US
+    keys = days * span + tx_codes + 1
+    n_in = len(inputs)
+    tx_keys, in_code = np.unique(keys[:n_in], return_inverse=True)
+    size = len(tx_keys)
+    out_pos = np.minimum(np.searchsorted(tx_keys, keys[n_in:]), max(size - 1, 0))
+    matched = tx_keys[out_pos] == keys[n_in:] if size else np.zeros(len(outputs), dtype=bool)
+    outputs = outputs.loc[matched, OUTPUT_COLUMNS]
+    out_code = out_pos[matched]
+
+    # Inputs: count, value (NULL when every value is NULL), Trino-decimal days held.
+    input_count = _counts(in_code, size).astype(np.int64)
+    in_value = inputs["value"].to_numpy(dtype=np.float64, na_value=np.nan)
+    known = ~np.isnan(in_value)
+    total_input = _counts(in_code, size, np.where(known, in_value, 0.0))
+    total_input[_counts(in_code[known], size) == 0] = np.nan
+    height = inputs["block_height"].to_numpy(dtype=np.float64, na_value=np.nan)
+    spent = inputs["spent_block_height"].to_numpy(dtype=np.float64, na_value=np.nan)
+    held = ~(np.isnan(height) | np.isnan(spent))
+    tenths = _round_half_up((height[held] - spent[held]).astype(np.int64) * 10, BLOCKS_PER_DAY)
+    held_count = _counts(in_code[held], size).astype(np.int64)
+    held_sum = _counts(in_code[held], size, tenths.astype(np.float64)).astype(np.int64)
+    avg_tenths = _round_half_up(held_sum, np.maximum(held_count, 1))
+    avg_days_held = np.where(held_count > 0, avg_tenths / 10, np.nan)
+
+    # Outputs: count, value, dust and round values, distinct script types.
+    output_count = _counts(out_code, size).astype(np.int64)
+    out_value = outputs["value"].to_numpy(dtype=np.float64, na_value=np.nan)
+    total_output = _counts(out_code, size, np.nan_to_num(out_value))
+    with np.errstate(invalid="ignore"):
+        dust = out_value < rules.dust_btc
+        scaled = out_value / rules.round_unit_btc
+        round_value = (out_value > 0) & (np.abs(scaled - np.round(scaled)) < 0.0000001)
+    out_types = _distinct_per_tx(out_code, outputs["type"], size)
+
+    # Address reuse: any non-null output address equal to an input address of the tx.
+    addresses = pd.concat([inputs["address"], outputs["address"]], ignore_index=True)
+    address_codes, _ = pd.factorize(addresses)
+    address_span = int(address_codes.max()) + 1 if len(address_codes) else 1
+    in_address, out_address = address_codes[:n_in], address_codes[n_in:]
+    in_pairs = in_code[in_address >= 0].astype(np.int64) * address_span + in_address[in_address >= 0]
+    out_pairs = out_code.astype(np.int64) * address_span + out_address
+    in_pairs.sort()
+    hit = np.minimum(np.searchsorted(in_pairs, out_pairs), max(len(in_pairs) - 1, 0))
+    reused = (out_address >= 0) & (in_pairs[hit] == out_pairs) if len(in_pairs) else np.zeros(len(out_pairs), dtype=bool)
+
+    return pd.DataFrame(
+        {
+            "day": pd.to_datetime(tx_keys // span, unit="D").date,
+            "tx_id": tx_ids[tx_keys % span - 1],
+            "input_count": input_count,
+            "output_count": output_count,
+            "total_input_btc": total_input,
+            "total_output_btc": total_output,
+            "fee_btc": total_input - total_output,
+            "dust_output_count": _counts(out_code, size, dust.astype(np.float64)).astype(np.int64),
+            "round_value_count": _counts(out_code, size, round_value.astype(np.float64)).astype(np.int64),
+            "avg_days_held": avg_days_held,
+            "has_address_reuse": _counts(out_code[reused], size) > 0,
+            "output_type_mismatch": (output_count == 2) & (out_types > 1),
+        }
+    )
+
+
+def classify(aggregates: pd.DataFrame, rules: ScoringRules = DEFAULT_RULES) -> pd.DataFrame:
+    """
+    Add the score, band, cohort and intent columns to per-transaction aggregates.
+
+    Works on ``tx_aggregates`` output and on exported query results alike
+    (``has_address_reuse``/``output_type_mismatch`` are passed through).
+
+    Returns:
+        ``aggregates`` with the classifier columns, in ``FEATURE_COLUMNS``
+        order where present.
+
+    Raises:
+        ValueError: If aggregate columns are missing.
+    """
+    missing = [c for c in AGGREGATE_COLUMNS if c not in aggregates.columns]
+    if missing:
+        raise ValueError(f"Transaction rows are missing columns: {missing}")
+    inputs = aggregates["input_count"].to_numpy(dtype=np.int64)
+    outputs = aggregates["output_count"].to_numpy(dtype=np.int64)
+    total_input = aggregates["total_input_btc"].to_numpy(dtype=np.float64, na_value=np.nan)
+    held = aggregates["avg_days_held"].to_numpy(dtype=np.float64, na_value=np.nan)
+    has_round = aggregates["round_value_count"].to_numpy(dtype=np.int64) > 0
+    has_dust = aggregates["dust_output_count"].to_numpy(dtype=np.int64) > 0
+    simple = (inputs == 1) & ((outputs == 1) | (outputs == 2))
+
+    with np.errstate(invalid="ignore"):
+        score = (
+            rules.base_score
+            + rules.high_fan_in_weight * (inputs > rules.high_fan_in_inputs)
+            + rules.high_fan_out_weight * (outputs > rules.high_fan_out_outputs)
+            + rules.round_values_weight * has_round
+            + rules.dust_weight * has_dust
+            + rules.simple_structure_weight * simple
+            + rules.no_round_values_weight * ~has_round
+            + rules.held_weight * ((held >= rules.held_min_days) & (held < rules.long_held_days))
+            + rules.long_held_weight * (held >= rules.long_held_days)
+        )
+    score = np.clip(score, 0, 100).astype(np.int64)
+    band = np.searchsorted(np.asarray(rules.band_edges), score, side="right")
+    # NaN totals sort past every edge, into the last cohort, like the SQL's ELSE.
+    cohort = np.searchsorted(np.asarray(rules.cohort_edges_btc, dtype=np.float64), total_input, side="right")
+    intent = np.select(
+        [
+            outputs == 0,
+            (inputs >= rules.consolidation_min_inputs) & (outputs <= 2),
+            (inputs <= 2) & (outputs >= rules.fan_out_min_outputs),
+            (inputs >= rules.coinjoin_min_io) & (outputs >= rules.coinjoin_min_io) & (np.abs(inputs - outputs) <= 1),
+            (inputs == 1) & (outputs == 1),
+            (outputs == 2) & (inputs >= 2),
+        ],
+        ["malformed_no_outputs", "consolidation", "fan_out_batch", "coinjoin_like", "self_transfer", "change_like_2_outputs"],
+        "other",
+    )
+
+    scored = aggregates.copy()
+    scored["human_factor_score"] = score
+    scored["score_band"] = np.asarray(rules.score_bands, dtype=object)[band]
+    scored["score_band_order"] = band + 1
+    scored["cohort"] = np.asarray(rules.cohorts, dtype=object)[cohort]
+    scored["cohort_order"] = cohort + 1
+    scored["intent"] = intent.astype(object)
+    ordered = [c for c in FEATURE_COLUMNS if c in scored.columns]
+    return scored[ordered + [c for c in scored.columns if c not in ordered]]
+
+
+def tx_features(inputs: pd.DataFrame, outputs: pd.DataFrame, rules: ScoringRules = DEFAULT_RULES) -> pd.DataFrame:
+    """``bitcoin_tx_features_daily`` rows (``FEATURE_COLUMNS``) for raw inputs and outputs."""
+    return classify(tx_aggregates(inputs, outputs, rules), rules)[FEATURE_COLUMNS]
+
+
+@dataclass
+class FeatureComparison:
+    """Row-for-row comparison of recomputed features with a reference result."""
+
+    matched: int = 0
+    missing: int = 0
+    extra: int = 0
+    mismatches: dict[str, int] = field(default_factory=dict)
+    examples: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra or any(self.mismatches.values()))
+
+    def add(self, other: "FeatureComparison", max_examples: int = 10) -> None:
+        """Accumulate another batch's comparison."""
+        self.matched += other.matched
+        self.missing += other.missing
+        self.extra += other.extra
+        for column, count in other.mismatches.items():
+            self.mismatches[column] = self.mismatches.get(column, 0) + count
+        self.examples.extend(other.examples[: max(max_examples - len(self.examples), 0)])
+
+
+def _keyed(features: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    keyed = features[columns].copy()
+    keyed.insert(0, "_day", features["day"].astype(str).str[:10].to_numpy())
+    keyed.insert(1, "_tx", features["tx_id"].map(hex_text).str.lower().to_numpy())
+    return keyed
+
+
+def compare_features(
+    local: pd.DataFrame,
+    reference: pd.DataFrame,
+    columns: list[str] = CLASSIFIER_COLUMNS,
+    max_examples: int = 10,
+) -> FeatureComparison:
+    """
+    Compare ``columns`` of recomputed and reference rows matched on (day, tx_id).
+
+    ``tx_id`` may be bytes or ``0x`` text on either side.
+    """
+    merged = _keyed(local, columns).merge(
+        _keyed(reference, columns), on=["_day", "_tx"], how="outer", suffixes=("", "_ref"), indicator=True
+    )
+    both = merged[merged["_merge"] == "both"]
+    comparison = FeatureComparison(
+        missing=int((merged["_merge"] == "right_only").sum()),
+        extra=int((merged["_merge"] == "left_only").sum()),
+    )
+    differs = np.zeros(len(both), dtype=bool)
+    for column in columns:
+        ours = both[column].to_numpy(dtype=object)
+        theirs = both[f"{column}_ref"].to_numpy(dtype=object)
+        if column in ("has_address_reuse", "output_type_mismatch"):
+            ours, theirs = ours.astype(bool), theirs.astype(bool)
+        elif column in ("human_factor_score", "score_band_order", "cohort_order"):
+            ours, theirs = ours.astype(np.int64), theirs.astype(np.int64)
+        else:
+            ours, theirs = ours.astype(str), theirs.astype(str)
+        column_differs = ours != theirs
+        comparison.mismatches[column] = int(column_differs.sum())
+        differs |= column_differs
+    comparison.matched = int((~differs).sum())
+    for _, row in both[differs].head(max_examples).iterrows():
+        comparison.examples.append(
+            {"day": row["_day"], "tx_id": row["_tx"], **{c: (row[c], row[f"{c}_ref"]) for c in columns if row[c] != row[f"{c}_ref"]}}
+        )
+    return comparison
+
+
+def _open_raw(path: Path) -> Any:
+    try:
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("Reading exported rows requires pyarrow. Install it with: pip install -e .[local]") from e
+    if not path.exists():
+        raise FileNotFoundError(f"No exported rows at {path}")
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def _day_filter(data: Any, day: datetime.date) -> Any:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    type_ = data.schema.field("block_time").type
+    start = pa.scalar(datetime.datetime.combine(day, datetime.time()), type=pa.timestamp("us")).cast(type_)
+    end = pa.scalar(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time()), type=pa.timestamp("us")).cast(type_)
+    return (ds.field("block_time") >= start) & (ds.field("block_time") < end)
+
+
+def day_range(inputs_path: Path) -> tuple[datetime.date, datetime.date]:
+    """First and last day of ``block_time`` in exported input rows."""
+    import pyarrow.compute as pc
+
+    bounds = pc.min_max(_open_raw(inputs_path).to_table(columns=["block_time"])["block_time"]).as_py()
+    if bounds["min"] is None:
+        raise ValueError(f"No input rows under {inputs_path}")
+    return bounds["min"].date(), bounds["max"].date()
+
+
+def _days(start: datetime.date, end: datetime.date) -> Iterator[datetime.date]:
+    for offset in range((end - start).days + 1):
+        yield start + datetime.timedelta(days=offset)
+
+
+def iter_features(
+    inputs_path: Path,
+    outputs_path: Path,
+    start: datetime.date,
+    end: datetime.date,
+    rules: ScoringRules = DEFAULT_RULES,
+) -> Iterator[tuple[datetime.date, pd.DataFrame]]:
+    """
+    Recompute features one day at a time from exported raw rows.
+
+    ``inputs_path``/``outputs_path`` are Parquet files or directories (Hive
+    partitioning allowed) with at least ``INPUT_COLUMNS``/``OUTPUT_COLUMNS``.
+    Days are read with a ``block_time`` filter, so row groups outside the day
+    are skipped.
+
+    Yields:
+        Tuples of (day, feature rows) for every day in the range.
+    """
+    inputs, outputs = _open_raw(inputs_path), _open_raw(outputs_path)
+    for day in _days(start, end):
+        day_inputs = inputs.to_table(columns=INPUT_COLUMNS, filter=_day_filter(inputs, day)).to_pandas()
+        day_outputs = outputs.to_table(columns=OUTPUT_COLUMNS, filter=_day_filter(outputs, day)).to_pandas()
+        yield day, tx_features(day_inputs, day_outputs, rules)
+
+
+def iter_rescored(
+    name: str,
+    start: datetime.date,
+    end: datetime.date,
+    rules: ScoringRules = DEFAULT_RULES,
+    data_dir: Path | str | None = None,
+) -> Iterator[tuple[datetime.date, pd.DataFrame, pd.DataFrame]]:
+    """
+    Re-score the exported query result one day at a time.
+
+    Yields:
+        Tuples of (day, re-scored rows, exported rows) for every day in the range.
+    """
+    from scripts.result_export import DEFAULT_DATA_DIR, load
+
+    for day in _days(start, end):
+        exported = load(name, start=day, end=day, data_dir=data_dir or DEFAULT_DATA_DIR).to_pandas()
+        yield day, classify(exported.drop(columns=["chain"], errors="ignore"), rules)[FEATURE_COLUMNS], exported
+
+
+def exported_days(manifest: dict[str, Any]) -> list[str]:
+    """Sorted day partitions of an export manifest, across chains."""
+    from scripts.result_export import NULL_PARTITION
+
+    labels = {label for state in manifest["chains"].values() for label in state.get("partitions", {})}
+    return sorted(labels - {"", NULL_PARTITION})
+
+
+def _parse_day(value: str | None) -> datetime.date | None:
+    return datetime.date.fromisoformat(value) if value else None
+
+
+def main() -> int:
+    """CLI entry point."""
+    from scripts.result_export import DEFAULT_DATA_DIR, load, read_manifest
+
+    parser = argparse.ArgumentParser(
+        description="Recompute bitcoin_tx_features_daily classifiers locally",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m scripts.tx_features --start 2026-01-01 --end 2026-01-31 --compare
+  python -m scripts.tx_features --rescore --compare
+  python -m scripts.tx_features --rescore --rule long_held_days=180 --output rescored.parquet
+  python -m scripts.tx_features --rule dust_btc=0.00001 --rule band_edges=20,40,60,80
+
+Raw rows are Parquet exports of bitcoin.inputs and bitcoin.outputs under
+<data-dir>/bitcoin/inputs and <data-dir>/bitcoin/outputs. --rescore reads
+the exported bitcoin_tx_features_daily result instead
+(python -m scripts.result_export export bitcoin_tx_features_daily).
+        """,
+    )
+    parser.add_argument(
+        "--rescore",
+        action="store_true",
+        help="Re-score the exported query result from its own aggregates instead of raw rows",
+    )
+    parser.add_argument(
+        "--rule",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Override a scoring rule, e.g. long_held_days=180 (repeatable)",
+    )
+    parser.add_argument("--start", help="First day to process (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last day to process (YYYY-MM-DD)")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare classifiers row-for-row with the exported bitcoin_tx_features_daily result",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write the recomputed rows to a Parquet file",
+    )
+    parser.add_argument("--inputs", help="Exported bitcoin.inputs rows (default: <data-dir>/bitcoin/inputs)")
+    parser.add_argument("--outputs", help="Exported bitcoin.outputs rows (default: <data-dir>/bitcoin/outputs)")
+    parser.add_argument(
+        "--data-dir",
+        default=str(DEFAULT_DATA_DIR),
+        help="Export data directory (default: .cache/data)",
+    )
+
+    args = parser.parse_args()
+    data_dir = Path(args.data_dir)
+    name = "bitcoin_tx_features_daily"
+    try:
+        rules = parse_rules(args.rule)
+        start, end = _parse_day(args.start), _parse_day(args.end)
+        if args.rescore or args.compare:
+            manifest = read_manifest(name, data_dir)
+            if manifest is None:
+                raise ValueError(f"No export found for '{name}' under {data_dir}")
+            days = exported_days(manifest)
+            if not days:
+                raise ValueError(f"'{name}' has no exported day partitions")
+        if args.rescore:
+            start = start or datetime.date.fromisoformat(days[0])
+            end = end or datetime.date.fromisoformat(days[-1])
+            batches = iter_rescored(name, start, end, rules, data_dir)
+        else:
+            inputs_path = Path(args.inputs) if args.inputs else data_dir / "bitcoin" / "inputs"
+            outputs_path = Path(args.outputs) if args.outputs else data_dir / "bitcoin" / "outputs"
+            if start is None or end is None:
+                first, last = day_range(inputs_path)
+                start, end = start or first, end or last
+            batches = ((day, features, None) for day, features in iter_features(inputs_path, outputs_path, start, end, rules))
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    changed = {k: v for k, v in dataclasses.asdict(rules).items() if v != getattr(DEFAULT_RULES, k)}
+    if args.rescore and set(changed) & set(RAW_ONLY_RULES):
+        print(f"Error: rules {', '.join(sorted(set(changed) & set(RAW_ONLY_RULES)))} need raw rows (drop --rescore)")
+        return 1
+    source = "exported bitcoin_tx_features_daily" if args.rescore else "raw inputs/outputs"
+    print(f"Recomputing {start} .. {end} from {source}" + (f" with {changed}" if changed else ""))
+
+    writer = None
+    comparison = FeatureComparison()
+    total = 0
+    bands = np.zeros(len(rules.score_bands), dtype=np.int64)
+    started = time.perf_counter()
+    try:
+        for day, features, exported in batches:
+            total += len(features)
+            bands += np.bincount(features["score_band_order"].to_numpy() - 1, minlength=len(bands))
+            if args.output:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(features, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(args.output, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            if args.compare:
+                if exported is None:
+                    exported = load(name, start=day, end=day, data_dir=data_dir).to_pandas()
+                comparison.add(compare_features(features, exported))
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"  {total:,} transactions in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} tx/s)")
+    for label, count in zip(rules.score_bands, bands):
+        print(f"    {label:>7}  {count:>12,}  {count / total if total else 0:6.1%}")
+    if not args.compare:
+        return 0
+
+    print(
+        f"\n{comparison.matched:,} rows identical, {comparison.missing:,} missing locally, "
+        f"{comparison.extra:,} extra locally"
+    )
+    for column, count in comparison.mismatches.items():
+        if count:
+            print(f"  {column}: {count:,} differ")
+    for example in comparison.examples:
+        print(f"  - {example}")
+    return 0 if comparison.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
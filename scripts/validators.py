@@ -2,11 +2,20 @@
 Result validation functions for smoke tests.
 
 Provides validation checks to verify query results meet expectations.
+
+Column-level checks (value ranges, nulls) run as NumPy-vectorized kernels over
+columnar data. ``ValidationPlan`` compiles a set of checks so each needed
+column is converted once and every check is evaluated in a single pass,
+either over a whole result or batch-by-batch over a ``ResultStream``.
 """
 
+from collections.abc import Iterable
 from dataclasses import dataclass
 from typing import Any
 
+import numpy as np
+
+from scripts.columnar import ColumnarResult, ColumnarTable
 from scripts.dune_client import ExecutionResult
 
 
@@ -154,6 +163,167 @@ def validate_min_rows(
         )
 
 
+class _RangeCheck:
+    """Incremental, vectorized state for one value-range check."""
+
+    MAX_VIOLATIONS = 10
+
+    def __init__(self, column: str, min_value: float | None, max_value: float | None):
+        self.column = column
+        self.min_value = min_value
+        self.max_value = max_value
+        self.count = 0
+        self.total = 0
+        self.actual_min: float | None = None
+        self.actual_max: float | None = None
+        self.violations: list[dict[str, Any]] = []
+
+    def update(self, values: np.ndarray, nulls: np.ndarray) -> None:
+        present = values[~nulls]
+        if len(present) == 0:
+            return
+
+        if present.dtype == object:
+            numeric, not_numeric = _coerce_float(present)
+        else:
+            numeric = present.astype(np.float64, copy=False)
+            not_numeric = np.zeros(len(present), dtype=bool)
+
+        ok = ~not_numeric
+        below = ok & (numeric < self.min_value) if self.min_value is not None else np.zeros(len(present), dtype=bool)
+        above = ok & (numeric > self.max_value) if self.max_value is not None else np.zeros(len(present), dtype=bool)
+
+        self.total += int(not_numeric.sum() + below.sum() + above.sum())
+        if ok.any():
+            batch_min = float(numeric[ok].min())
+            batch_max = float(numeric[ok].max())
+            self.actual_min = batch_min if self.actual_min is None else min(self.actual_min, batch_min)
+            self.actual_max = batch_max if self.actual_max is None else max(self.actual_max, batch_max)
+
+        if len(self.violations) < self.MAX_VIOLATIONS:
+            for i in np.flatnonzero(not_numeric | below | above):
+                val = present[i].item() if hasattr(present[i], "item") else present[i]
+                if not_numeric[i]:
+                    self.violations.append({"row": self.count + int(i), "value": val, "issue": "not numeric"})
+                if below[i]:
+                    self.violations.append({"row": self.count + int(i), "value": val, "issue": f"< {self.min_value}"})
+                if above[i]:
+                    self.violations.append({"row": self.count + int(i), "value": val, "issue": f"> {self.max_value}"})
+                if len(self.violations) >= self.MAX_VIOLATIONS:
+                    break
+            del self.violations[self.MAX_VIOLATIONS:]
+
+        self.count += len(present)
+
+    def result(self, columns: list[str]) -> ValidationResult:
+        column = self.column
+        if column not in columns:
+            return ValidationResult(
+                passed=False,
+                check_name="value_range",
+                message=f"Column '{column}' not found in results",
+                details={"column": column, "available_columns": columns},
+            )
+
+        if self.count == 0:
+            return ValidationResult(
+                passed=True,
+                check_name="value_range",
+                message=f"Column '{column}' has no non-null values to check",
+                details={"column": column, "value_count": 0},
+            )
+
+        if self.total == 0:
+            return ValidationResult(
+                passed=True,
+                check_name="value_range",
+                message=f"All {self.count} values in '{column}' within range",
+                details={
+                    "column": column,
+                    "value_count": self.count,
+                    "actual_min": self.actual_min,
+                    "actual_max": self.actual_max,
+                    "expected_min": self.min_value,
+                    "expected_max": self.max_value,
+                },
+            )
+
+        return ValidationResult(
+            passed=False,
+            check_name="value_range",
+            message=f"{self.total} values in '{column}' out of range",
+            details={
+                "column": column,
+                "violations": self.violations,  # Limited to first 10
+                "total_violations": self.total,
+                "expected_min": self.min_value,
+                "expected_max": self.max_value,
+            },
+        )
+
+
+class _NullCheck:
+    """Incremental, vectorized state for a no-nulls check over several columns."""
+
+    def __init__(self, columns: list[str]):
+        self.columns = columns
+        self.counts = {col: 0 for col in columns}
+
+    def update(self, table: ColumnarTable) -> None:
+        for col in self.columns:
+            if col in table.nulls:
+                self.counts[col] += int(table.nulls[col].sum())
+
+    def result(self, columns: list[str]) -> ValidationResult:
+        missing_cols = [c for c in self.columns if c not in columns]
+        null_cols = {c: n for c, n in self.counts.items() if n > 0 and c in columns}
+
+        if not missing_cols and not null_cols:
+            return ValidationResult(
+                passed=True,
+                check_name="no_nulls",
+                message=f"No null values in {len(self.columns)} checked columns",
+                details={"columns": self.columns},
+            )
+
+        issues = []
+        if missing_cols:
+            issues.append(f"missing columns: {missing_cols}")
+        if null_cols:
+            issues.append(f"null values: {null_cols}")
+
+        return ValidationResult(
+            passed=False,
+            check_name="no_nulls",
+            message=f"Null check failed: {'; '.join(issues)}",
+            details={
+                "missing_columns": missing_cols,
+                "null_counts": null_cols,
+            },
+        )
+
+
+def _coerce_float(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Convert an object array to float64, flagging entries that are not numeric."""
+    out = np.empty(len(values), dtype=np.float64)
+    bad = np.zeros(len(values), dtype=bool)
+    for i, val in enumerate(values):
+        try:
+            out[i] = float(val)
+        except (ValueError, TypeError):
+            out[i] = np.nan
+            bad[i] = True
+    return out, bad
+
+
+def _column_table(result: ExecutionResult, columns: list[str]) -> ColumnarTable:
+    """Columnar view of a result, converting only the given columns from rows."""
+    if isinstance(result, ColumnarResult):
+        return result.table
+    wanted = [c for c in columns if c in result.columns]
+    return ColumnarTable.from_rows(result.rows, wanted)
+
+
 def validate_value_in_range(
     result: ExecutionResult,
     column: str,
@@ -172,64 +342,11 @@ def validate_value_in_range(
     Returns:
         ValidationResult indicating pass/fail.
     """
-    if column not in result.columns:
-        return ValidationResult(
-            passed=False,
-            check_name="value_range",
-            message=f"Column '{column}' not found in results",
-            details={"column": column, "available_columns": result.columns},
-        )
-
-    values = [row.get(column) for row in result.rows if row.get(column) is not None]
-
-    if not values:
-        return ValidationResult(
-            passed=True,
-            check_name="value_range",
-            message=f"Column '{column}' has no non-null values to check",
-            details={"column": column, "value_count": 0},
-        )
-
-    violations = []
-    for i, val in enumerate(values):
-        try:
-            num_val = float(val)
-            if min_value is not None and num_val < min_value:
-                violations.append({"row": i, "value": val, "issue": f"< {min_value}"})
-            if max_value is not None and num_val > max_value:
-                violations.append({"row": i, "value": val, "issue": f"> {max_value}"})
-        except (ValueError, TypeError):
-            violations.append({"row": i, "value": val, "issue": "not numeric"})
-
-    if not violations:
-        actual_min = min(float(v) for v in values)
-        actual_max = max(float(v) for v in values)
-        return ValidationResult(
-            passed=True,
-            check_name="value_range",
-            message=f"All {len(values)} values in '{column}' within range",
-            details={
-                "column": column,
-                "value_count": len(values),
-                "actual_min": actual_min,
-                "actual_max": actual_max,
-                "expected_min": min_value,
-                "expected_max": max_value,
-            },
-        )
-    else:
-        return ValidationResult(
-            passed=False,
-            check_name="value_range",
-            message=f"{len(violations)} values in '{column}' out of range",
-            details={
-                "column": column,
-                "violations": violations[:10],  # Limit to first 10
-                "total_violations": len(violations),
-                "expected_min": min_value,
-                "expected_max": max_value,
-            },
-        )
+    check = _RangeCheck(column, min_value, max_value)
+    if column in result.columns:
+        table = _column_table(result, [column])
+        check.update(table.data[column], table.nulls[column])
+    return check.result(result.columns)
 
 
 def validate_no_nulls(
@@ -246,43 +363,98 @@ def validate_no_nulls(
     Returns:
         ValidationResult indicating pass/fail.
     """
-    null_counts: dict[str, int] = {}
-
-    for col in columns:
-        if col not in result.columns:
-            null_counts[col] = -1  # Column missing
-            continue
+    check = _NullCheck(columns)
+    check.update(_column_table(result, columns))
+    return check.result(result.columns)
 
-        null_count = sum(1 for row in result.rows if row.get(col) is None)
-        if null_count > 0:
-            null_counts[col] = null_count
 
-    if not null_counts:
-        return ValidationResult(
-            passed=True,
-            check_name="no_nulls",
-            message=f"No null values in {len(columns)} checked columns",
-            details={"columns": columns},
-        )
-    else:
-        missing_cols = [c for c, n in null_counts.items() if n == -1]
-        null_cols = {c: n for c, n in null_counts.items() if n > 0}
+class ValidationPlan:
+    """
+    A compiled set of checks evaluated in a single pass over columnar data.
 
-        issues = []
-        if missing_cols:
-            issues.append(f"missing columns: {missing_cols}")
-        if null_cols:
-            issues.append(f"null values: {null_cols}")
+    Args:
+        expected_columns: Optional list of columns that should be present.
+        min_rows: Minimum number of rows expected (default 1).
+        value_ranges: Optional dict mapping column names to (min, max) tuples.
+        non_null_columns: Optional list of columns that should not have nulls.
+    """
 
-        return ValidationResult(
-            passed=False,
-            check_name="no_nulls",
-            message=f"Null check failed: {'; '.join(issues)}",
-            details={
-                "missing_columns": missing_cols,
-                "null_counts": null_cols,
-            },
+    def __init__(
+        self,
+        expected_columns: list[str] | None = None,
+        min_rows: int = 1,
+        value_ranges: dict[str, tuple[float | None, float | None]] | None = None,
+        non_null_columns: list[str] | None = None,
+    ):
+        self.expected_columns = expected_columns
+        self.min_rows = min_rows
+        self.value_ranges = value_ranges or {}
+        self.non_null_columns = non_null_columns or []
+        # Each needed column is converted once and shared by all checks.
+        self.needed_columns = list(dict.fromkeys([*self.value_ranges, *self.non_null_columns]))
+
+    def _new_checks(self) -> tuple[list[_RangeCheck], _NullCheck | None]:
+        ranges = [_RangeCheck(col, lo, hi) for col, (lo, hi) in self.value_ranges.items()]
+        nulls = _NullCheck(self.non_null_columns) if self.non_null_columns else None
+        return ranges, nulls
+
+    @staticmethod
+    def _update(table: ColumnarTable, ranges: list[_RangeCheck], nulls: _NullCheck | None) -> None:
+        for check in ranges:
+            if check.column in table.data:
+                check.update(table.data[check.column], table.nulls[check.column])
+        if nulls is not None:
+            nulls.update(table)
+
+    def _finish(
+        self,
+        summary: ExecutionResult,
+        ranges: list[_RangeCheck],
+        nulls: _NullCheck | None,
+    ) -> list[ValidationResult]:
+        validations = [
+            validate_execution_success(summary),
+            validate_min_rows(summary, self.min_rows),
+        ]
+        if self.expected_columns:
+            validations.append(validate_columns(summary, self.expected_columns))
+        validations.extend(check.result(summary.columns) for check in ranges)
+        if nulls is not None:
+            validations.append(nulls.result(summary.columns))
+        return validations
+
+    def run(self, result: ExecutionResult) -> list[ValidationResult]:
+        """Validate a materialized (row or columnar) result."""
+        ranges, nulls = self._new_checks()
+        if self.needed_columns:
+            self._update(_column_table(result, self.needed_columns), ranges, nulls)
+        return self._finish(result, ranges, nulls)
+
+    def run_stream(self, stream: Iterable[list[dict[str, Any]]]) -> list[ValidationResult]:
+        """Validate a stream of row batches, converting each batch once."""
+        ranges, nulls = self._new_checks()
+        row_count = 0
+        seen_columns: list[str] = []
+        for batch in stream:
+            if not batch:
+                continue
+            if not seen_columns:
+                seen_columns = list(batch[0].keys())
+            row_count += len(batch)
+            if self.needed_columns:
+                wanted = [c for c in self.needed_columns if c in batch[0]]
+                self._update(ColumnarTable.from_rows(batch, wanted), ranges, nulls)
+
+        summary = ExecutionResult(
+            success=bool(getattr(stream, "success", True)),
+            execution_id=getattr(stream, "execution_id", None),
+            state=str(getattr(stream, "state", "QUERY_STATE_COMPLETED")),
+            rows=[],
+            columns=list(getattr(stream, "columns", None) or seen_columns),
+            row_count=row_count,
+            error=getattr(stream, "error", None),
         )
+        return self._finish(summary, ranges, nulls)
 
 
 def run_all_validations(
@@ -305,25 +477,33 @@ def run_all_validations(
     Returns:
         List of ValidationResult objects for each check performed.
     """
-    validations = []
-
-    # Always check execution success
-    validations.append(validate_execution_success(result))
+    plan = ValidationPlan(expected_columns, min_rows, value_ranges, non_null_columns)
+    return plan.run(result)
 
-    # Check non-empty (using min_rows)
-    validations.append(validate_min_rows(result, min_rows))
 
-    # Check columns if specified
-    if expected_columns:
-        validations.append(validate_columns(result, expected_columns))
+def run_streaming_validations(
+    stream: Iterable[list[dict[str, Any]]],
+    expected_columns: list[str] | None = None,
+    min_rows: int = 1,
+    value_ranges: dict[str, tuple[float | None, float | None]] | None = None,
+    non_null_columns: list[str] | None = None,
+) -> list[ValidationResult]:
+    """
+    Run the ``run_all_validations`` checks over a stream of row batches.
 
-    # Check value ranges if specified
-    if value_ranges:
-        for col, (min_val, max_val) in value_ranges.items():
-            validations.append(validate_value_in_range(result, col, min_val, max_val))
+    Each batch is inspected once and discarded, so memory stays bounded by
+    the page size rather than the result size.
 
-    # Check for nulls if specified
-    if non_null_columns:
-        validations.append(validate_no_nulls(result, non_null_columns))
+    Args:
+        stream: A ``ResultStream`` (or any iterable of row-dict batches with
+            ``success``/``state``/``execution_id``/``error`` attributes).
+        expected_columns: Optional list of columns that should be present.
+        min_rows: Minimum number of rows expected (default 1).
+        value_ranges: Optional dict mapping column names to (min, max) tuples.
+        non_null_columns: Optional list of columns that should not have nulls.
 
-    return validations
+    Returns:
+        List of ValidationResult objects for each check performed.
+    """
+    plan = ValidationPlan(expected_columns, min_rows, value_ranges, non_null_columns)
+    return plan.run_stream(stream)